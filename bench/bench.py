@@ -1,6 +1,8 @@
 """This script runs a benchmark study on the form files found in the
-current directory. It relies on the regression test script for
-timings."""
+current directory using the benchmark suite ffc.bench. The results
+are written to bench.json, and the time of tabulate_tensor for each
+form file and set of options is written to bench.log (for plot.py).
+Use 'python -m ffc.bench --compare' to compare two bench.json files."""
 
 # Copyright (C) 2010 Anders Logg
 #
@@ -20,10 +22,13 @@ timings."""
 # along with FFC. If not, see <http://www.gnu.org/licenses/>.
 #
 # First added:  2010-05-11
-# Last changed: 2010-05-11
+# Last changed: 2014-10-18
 
-import os, glob
+from __future__ import print_function
+
+import glob, json
 from utils import print_table
+from ffc.bench import run_benchmarks
 
 # Test options
 test_options = ["-r tensor", "-r tensor -O", "-r quadrature", "-r quadrature -O"]
@@ -31,25 +36,20 @@ test_options = ["-r tensor", "-r tensor -O", "-r quadrature", "-r quadrature -O"
 # Get list of test cases
 test_cases = sorted([f.split(".")[0] for f in glob.glob("*.ufl")])
 
-# Open logfile
-logfile = open("bench.log", "w")
+# Run benchmarks
+results = run_benchmarks([f + ".ufl" for f in test_cases], test_options)
+with open("bench.json", "w") as f:
+    json.dump(results, f, indent=1, sort_keys=True)
 
-# Iterate over options
-os.chdir("../test/regression")
+# Collect total time of tabulate_tensor over all integrals
+logfile = open("bench.log", "w")
 table = {}
-for (j, test_option) in enumerate(test_options):
-
-    # Run benchmark
-    print "\nUsing options %s\n" % test_option
-    os.system("python test.py --bench %s" % test_option)
-
-    # Collect results
-    for (i, test_case) in enumerate(test_cases):
-        output = open("output/%s.out" % test_case).read()
-        lines = [line for line in output.split("\n") if "bench" in line]
-        if not len(lines) == 1:
+for (i, test_case) in enumerate(test_cases):
+    for (j, test_option) in enumerate(test_options):
+        result = results["results"][test_case][test_option]
+        if not "runtime" in result:
             raise RuntimeError("Unable to extract benchmark data for test case %s" % test_case)
-        timing = float(lines[0].split(":")[-1])
+        timing = sum(t["median"] for t in result["runtime"].values())
         table[(i, j)] = (test_case, test_option, timing)
         logfile.write("%s, %s, %g\n" % (test_case, test_option, timing))
 
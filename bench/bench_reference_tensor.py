@@ -0,0 +1,107 @@
+"""This script benchmarks the computation of reference tensors for
+tensor representation (compiler stage 2) on the MassH1_2D_* and
+Poisson_2D_* forms. It compares the contraction by numpy.einsum in
+monomialintegration._compute_product against the previous
+implementation which loops over quadrature points and internal
+indices in Python, and checks that both give the same tensors."""
+
+# Copyright (C) 2014 The FFC authors
+#
+# This file is part of FFC.
+#
+# FFC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# FFC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with FFC. If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import print_function
+
+import glob
+import numpy
+from time import time
+
+from ufl.algorithms import load_ufl_file
+
+from ffc.parameters import default_parameters
+from ffc.analysis import analyze_forms
+from ffc.representation import compute_ir
+from ffc.log import set_level, ERROR
+from ffc.tensor import monomialintegration
+from ffc.tensor.multiindex import build_indices
+
+# Number of repetitions, the best timing is reported
+num_repetitions = 3
+
+def _compute_product_loop(psis, weights):
+    "Reference implementation looping over points and internal indices."
+    (shape, indices) = monomialintegration._compute_shape(psis)
+    A0 = numpy.zeros(shape)
+    bshape = monomialintegration._compute_internal_shape(psis)
+    bindices = build_indices([list(range(b)) for b in bshape]) or [[]]
+    for q in range(len(weights)):
+        for b in bindices:
+            B = weights[q]
+            for (Psi, index, bpart) in psis:
+                B = numpy.multiply.outer(B, Psi[tuple([q] + [b[i] for i in bpart])])
+            numpy.add(A0, B, A0)
+    (rearrangement, num_indices) = monomialintegration._compute_rearrangement(indices)
+    return numpy.transpose(A0, rearrangement)
+
+def _reference_tensors(ir):
+    "Extract all reference tensors from the integral representations."
+    tensors = []
+    def extract(AK):
+        if isinstance(AK, list) and AK and isinstance(AK[0], tuple):
+            tensors.extend(A0.A0 for (A0, GK, dummy) in AK)
+        elif isinstance(AK, list):
+            for a in AK:
+                extract(a)
+    for itg_ir in ir[2]:
+        extract(itg_ir["AK"])
+    return tensors
+
+def _time_stage2(forms, parameters, compute_product):
+    "Compute representation with given product and return best time."
+    monomialintegration._compute_product = compute_product
+    best = None
+    for i in range(num_repetitions):
+        analysis = analyze_forms(forms, parameters)
+        t = time()
+        ir = compute_ir(analysis, parameters)
+        t = time() - t
+        best = t if best is None else min(best, t)
+    return best, _reference_tensors(ir)
+
+def main():
+    set_level(ERROR)
+    parameters = default_parameters()
+    parameters["representation"] = "tensor"
+
+    vectorized = monomialintegration._compute_product
+    filenames = sorted(glob.glob("MassH1_2D_*.ufl")) + \
+                sorted(glob.glob("Poisson_2D_*.ufl"))
+
+    print("%-20s %12s %12s %8s" % ("Form", "loop (s)", "einsum (s)", "speedup"))
+    try:
+        for filename in filenames:
+            forms = load_ufl_file(filename).forms
+            t_loop, A_loop = _time_stage2(forms, parameters, _compute_product_loop)
+            t_vec, A_vec = _time_stage2(forms, parameters, vectorized)
+            for (a, b) in zip(A_loop, A_vec):
+                if not numpy.allclose(a, b, rtol=1e-12, atol=1e-14):
+                    raise RuntimeError("Reference tensors differ for %s" % filename)
+            print("%-20s %12.4g %12.4g %8.1f" % (filename.split(".")[0], t_loop,
+                                                t_vec, t_loop / t_vec))
+    finally:
+        monomialintegration._compute_product = vectorized
+
+if __name__ == "__main__":
+    main()
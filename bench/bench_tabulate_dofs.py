@@ -0,0 +1,149 @@
+"""This script benchmarks the generated code for tabulate_dofs on mixed
+Lagrange elements of increasing degree on tetrahedra, comparing the
+unrolled code (one assignment per dof) against the table-driven code
+generated for local dimensions above -fdof_table_threshold. For each
+element it reports the number of generated lines, the time to compile
+the code with g++ and the time for tabulating the dofs of many cells,
+and checks that both variants give the same dofs."""
+
+# Copyright (C) 2014 The FFC authors
+#
+# This file is part of FFC.
+#
+# FFC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# FFC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with FFC. If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import print_function
+
+import os
+import shutil
+import subprocess
+import tempfile
+from time import time
+
+from ffc.codegeneration import _tabulate_dofs
+
+# Mixed elements (vector degree, scalar degree) of Taylor-Hood type
+degrees = [(2, 1), (3, 2), (4, 3), (5, 4), (6, 5)]
+
+# Number of cells to tabulate dofs for
+num_cells = 1000000
+
+# Compiler and flags
+cxx = os.environ.get("CXX", "g++")
+cxxflags = ["-O2"]
+
+# Path to ufc.h
+ufc_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir, "ufc")
+
+code_template = """\
+#include <cstdio>
+#include <ctime>
+#include <ufc.h>
+
+void tabulate_dofs(std::size_t* dofs,
+                   const std::vector<std::size_t>& num_global_entities,
+                   const ufc::cell& c)
+{
+%(code)s
+}
+
+int main()
+{
+  std::vector<std::size_t> num_global_entities(4);
+  num_global_entities[0] = 1000; num_global_entities[1] = 7000;
+  num_global_entities[2] = 12000; num_global_entities[3] = 6000;
+
+  ufc::cell c;
+  c.entity_indices.resize(4);
+  c.entity_indices[0].resize(4);
+  c.entity_indices[1].resize(6);
+  c.entity_indices[2].resize(4);
+  c.entity_indices[3].resize(1);
+
+  std::vector<std::size_t> dofs(%(dimension)d);
+  std::size_t checksum = 0;
+  std::clock_t t = std::clock();
+  for (std::size_t i = 0; i < %(num_cells)d; i++)
+  {
+    for (std::size_t d = 0; d < 4; d++)
+      for (std::size_t k = 0; k < c.entity_indices[d].size(); k++)
+        c.entity_indices[d][k] = (i*(d + 3) + 7*k) %% num_global_entities[d];
+    tabulate_dofs(&dofs[0], num_global_entities, c);
+    for (std::size_t r = 0; r < dofs.size(); r++)
+      checksum = 31*checksum + dofs[r];
+  }
+  std::printf("%%g %%lu\\n", double(std::clock() - t)/CLOCKS_PER_SEC,
+              (unsigned long) checksum);
+  return 0;
+}
+"""
+
+def lagrange_dofs(q, offset=0):
+    "Entity dofs of the degree q Lagrange element on a tetrahedron."
+    sizes = [1, q - 1, (q - 1)*(q - 2)//2, (q - 1)*(q - 2)*(q - 3)//6]
+    num_entities = [4, 6, 4, 1]
+    dofs = []
+    for (dim, size) in enumerate(sizes):
+        dofs.append([list(range(offset + k*size, offset + (k + 1)*size))
+                     for k in range(num_entities[dim])])
+        offset += num_entities[dim]*size
+    return dofs, offset
+
+def taylor_hood_ir(q):
+    "Representation for tabulate_dofs of a [P_q]^3 x P_(q - 1) element."
+    dofs_per_element = []
+    num_dofs_per_element = []
+    for degree in [q, q, q, q - 1]:
+        dofs, dimension = lagrange_dofs(degree)
+        dofs_per_element.append(dofs)
+        num_dofs_per_element.append(dimension)
+    return (dofs_per_element, num_dofs_per_element, None, True,
+            [False]*len(dofs_per_element))
+
+def run(code, dimension, tmpdir, name):
+    "Compile and run benchmark, return lines, compile and run times."
+    source = os.path.join(tmpdir, name + ".cpp")
+    binary = os.path.join(tmpdir, name)
+    with open(source, "w") as f:
+        f.write(code_template % {"code": code, "dimension": dimension,
+                                 "num_cells": num_cells})
+    t = time()
+    subprocess.check_call([cxx] + cxxflags + ["-I", ufc_dir, "-o", binary, source])
+    t_compile = time() - t
+    output = subprocess.check_output([binary]).decode().split()
+    return len(code.split("\n")), t_compile, float(output[0]), output[1]
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print("%8s %6s %14s %14s %14s %14s" %
+              ("element", "dim", "lines", "compile (s)", "run (s)", "speedup"))
+        for (q, p) in degrees:
+            ir = taylor_hood_ir(q)
+            dimension = sum(ir[1])
+            unrolled = run(_tabulate_dofs(ir), dimension, tmpdir, "unrolled")
+            table = run(_tabulate_dofs(ir, 1), dimension, tmpdir, "table")
+            if unrolled[3] != table[3]:
+                raise RuntimeError("Dofs differ for P%d-P%d" % (q, p))
+            element = "P%d-P%d" % (q, p)
+            print("%8s %6d %6d/%-7d %6.2f/%-7.2f %6.3f/%-7.3f %14.2f" %
+                  (element, dimension, unrolled[0], table[0],
+                   unrolled[1], table[1], unrolled[2], table[2],
+                   unrolled[2] / table[2]))
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+    main()
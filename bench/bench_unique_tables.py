@@ -0,0 +1,109 @@
+"""This script benchmarks the deduplication of psi tables in
+quadratureutils.unique_tables on synthetic sets of tables of
+increasing size, against the previous implementation which compares
+all pairs of tables, and checks that both give the same name maps."""
+
+# Copyright (C) 2014 The FFC authors
+#
+# This file is part of FFC.
+#
+# FFC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# FFC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with FFC. If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import print_function
+
+import copy
+import numpy
+from time import time
+
+from ffc.cpp import format, set_float_formatting
+from ffc.parameters import FFC_PARAMETERS
+from ffc.quadrature.quadratureutils import unique_tables
+
+# Number of tables in each synthetic set
+sizes = [100, 200, 400, 800, 1600, 3200]
+
+# Skip the pairwise implementation above this number of tables
+max_pairwise_size = 1600
+
+def unique_tables_pairwise(tables):
+    "Reference implementation comparing all pairs of tables."
+    format_epsilon = format["epsilon"]
+    name_map = {}
+    inverse_name_map = {}
+    names = sorted(tables.keys())
+    mapped = []
+    for i in range(len(names)):
+        name0 = names[i]
+        if name0 in mapped:
+            continue
+        val0 = numpy.array(tables[name0])
+        for j in range(i + 1, len(names)):
+            name1 = names[j]
+            if name1 in mapped:
+                continue
+            val1 = numpy.array(tables[name1])
+            if numpy.shape(val0) == numpy.shape(val1):
+                if len(val0) > 0 and abs(val0 - val1).max() < format_epsilon:
+                    mapped.append(name1)
+                    del tables[name1]
+                    name_map.setdefault(name0, []).append(name1)
+                    inverse_name_map[name1] = name0
+    for name in tables:
+        if not name in inverse_name_map:
+            inverse_name_map[name] = name
+    return (name_map, inverse_name_map)
+
+def synthetic_tables(num_tables, seed=0):
+    """Create tables resembling those of mixed elements with many
+    derivative components: a few shapes, and many tables which are
+    copies of others up to round-off."""
+    rng = numpy.random.RandomState(seed)
+    shapes = [(6, 3), (6, 6), (12, 10), (24, 15)]
+    originals = [rng.uniform(-1, 1, shapes[i % len(shapes)])
+                 for i in range(num_tables // 4)]
+    tables = {}
+    for i in range(num_tables):
+        if i < len(originals):
+            values = originals[i]
+        else:
+            values = originals[rng.randint(len(originals))]
+            values = values + rng.uniform(-1e-16, 1e-16, values.shape)
+        tables["FE%d_C%d_D%03d" % (i % 7, i % 3, i)] = values
+    return tables
+
+def main():
+    set_float_formatting(FFC_PARAMETERS["precision"])
+    print("%8s %14s %14s %8s" % ("tables", "pairwise (s)", "indexed (s)", "speedup"))
+    for size in sizes:
+        tables = synthetic_tables(size)
+
+        t = time()
+        result = unique_tables(copy.deepcopy(tables))
+        t_indexed = time() - t
+
+        if size > max_pairwise_size:
+            print("%8d %14s %14.4g %8s" % (size, "-", t_indexed, "-"))
+            continue
+
+        t = time()
+        reference = unique_tables_pairwise(copy.deepcopy(tables))
+        t_pairwise = time() - t
+
+        if result != reference:
+            raise RuntimeError("Name maps differ for %d tables" % size)
+        print("%8d %14.4g %14.4g %8.1f" % (size, t_pairwise, t_indexed,
+                                           t_pairwise / t_indexed))
+
+if __name__ == "__main__":
+    main()
@@ -16,7 +16,9 @@
 # along with FFC. If not, see <http://www.gnu.org/licenses/>.
 #
 # First added:  2010-05-11
-# Last changed: 2010-05-11
+# Last changed: 2014-10-18
+
+from __future__ import print_function
 
 def print_table(values, title):
     "Print nicely formatted table."
@@ -46,13 +48,10 @@ def print_table(values, title):
     column_sizes = [max([len(table[i][j]) for i in range(m)]) for j in range(n)]
     row_size = sum(column_sizes) + 3*(len(column_sizes) - 1) + 2
 
-    print ""
+    print("")
     for i in range(m):
-        print " " + "-"*row_size
-        print "|",
-        for j in range(n):
-            print table[i][j] + " "*(column_sizes[j] - len(table[i][j])),
-            print "|",
-        print ""
-    print " " + "-"*row_size
-    print ""
+        print(" " + "-"*row_size)
+        print("| " + " | ".join(table[i][j] + " "*(column_sizes[j] - len(table[i][j]))
+                                for j in range(n)) + " |")
+    print(" " + "-"*row_size)
+    print("")
@@ -39,8 +39,10 @@ from ffc.log import log, info, begin, end, warning, debug, error, ffc_assert, wa
 from ffc.utils import all_equal
 from ffc.quadratureelement import default_quadrature_degree
 from ffc.utils import all_equal
-from ffc.tensor import estimate_cost
+from ffc.costmodel import select_representation
+from ffc.profiling import profiled, profile_section
 
+@profiled("stage 1: analysis", count_objects=True)
 def analyze_forms(forms, parameters):
     """
     Analyze form(s), returning
@@ -53,8 +55,11 @@ def analyze_forms(forms, parameters):
     begin("Compiler stage 1: Analyzing form(s)")
 
     # Analyze forms
-    form_datas = tuple(_analyze_form(form,
-                                     parameters) for form in forms)
+    form_datas = []
+    for (i, form) in enumerate(forms):
+        with profile_section("analyze_form", form=i):
+            form_datas.append(_analyze_form(form, parameters))
+    form_datas = tuple(form_datas)
 
     # Extract unique elements accross all forms
     unique_elements = []
@@ -73,6 +78,7 @@ def analyze_forms(forms, parameters):
 
     return form_datas, unique_elements, element_numbers
 
+@profiled("stage 1: analysis", count_objects=True)
 def analyze_elements(elements, parameters):
 
     begin("Compiler stage 1: Analyzing form(s)")
@@ -165,7 +171,10 @@ def _attach_integral_metadata(form_data, parameters):
             if r == "auto":
                 r = _auto_select_representation(integral,
                                                 form_data.unique_sub_elements,
-                                                form_data.function_replace_map)
+                                                form_data.function_replace_map,
+                                                form_data.element_replace_map,
+                                                integral_metadata["quadrature_degree"],
+                                                parameters)
                 info("representation:    auto --> %s" % r)
             elif r in ("quadrature", "tensor", "uflacs"):
                 info("representation:    %s" % r)
@@ -279,7 +288,9 @@ def _get_sub_elements(element):
             sub_elements += _get_sub_elements(e)
     return sub_elements
 
-def _auto_select_representation(integral, elements, function_replace_map):
+def _auto_select_representation(integral, elements, function_replace_map,
+                                element_replace_map, quadrature_degree,
+                                parameters):
     """
     Automatically select a suitable representation for integral.
     Note that the selection is made for each integral, not for
@@ -306,19 +317,23 @@ def _auto_select_representation(integral, elements, function_replace_map):
     #if len([e for e in sub_elements if isinstance(e, ufl.RestrictedElement) and isinstance(e.cell_restriction(), Measure)]):
     #    return "quadrature"
 
-    # Estimate cost of tensor representation
-    tensor_cost = estimate_cost(integral, function_replace_map)
-    debug("Estimated cost of tensor representation: " + str(tensor_cost))
+    # Get quadrature degree used by quadrature representation
+    if quadrature_degree in ("auto", -1):
+        quadrature_degree = _auto_select_quadrature_degree(integral.integrand(),
+                                                           "quadrature",
+                                                           elements,
+                                                           element_replace_map)
+    quadrature_degree = int(quadrature_degree)
+
+    # Select representation of least predicted (or measured) run time
+    r = select_representation(integral, function_replace_map,
+                              quadrature_degree, parameters)
 
     # Use quadrature if tensor representation is not possible
-    if tensor_cost == -1:
+    if r is None:
         return "quadrature"
 
-    # Otherwise, select quadrature when cost is high
-    if tensor_cost <= 3:
-        return "tensor"
-    else:
-        return "quadrature"
+    return r
 
 def _auto_select_quadrature_degree(integrand, representation, elements, element_replace_map):
     "Automatically select a suitable quadrature degree for integrand."
@@ -0,0 +1,10 @@
+"""Code generation for standalone assembly drivers of UFC forms.
+
+The generated drivers assemble the global tensor of each form over a
+simplex mesh given by its cell-vertex connectivity and vertex
+coordinates, without DOLFIN. The cells are assembled in parallel by
+OpenMP threads, either by cell colouring or into thread-private
+buffers. The assembler itself is implemented by the header-only
+library ufc_assembly.h, installed together with ufc.h."""
+
+from .driver import generate_assembly_code
@@ -0,0 +1,89 @@
+# Copyright (C) 2014 The FFC authors
+#
+# This file is part of FFC.
+#
+# FFC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# FFC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with FFC. If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["generate_assembly_code"]
+
+assembly_tag = "// Assembly drivers"
+
+assembly_includes = """\
+// Assembly driver includes
+#include <vector>
+#include <ufc_assembly.h>"""
+
+# Global tensor and assembly call for each rank
+tensors = {0: ("double", None, "return assembler.assemble(w);"),
+           1: ("void", "std::vector<double>& b", "assembler.assemble(b, w, s);"),
+           2: ("void", "ufc_assembly::csr_matrix& A", "assembler.assemble(A, w, s);")}
+
+assembler_template = """\
+// Assembler for form %(name)s (%(coefficients)s)
+typedef ufc_assembly::assembler<%(classname)s> Assembler_%(name)s;
+
+/// Assemble form %(name)s over mesh, where w holds the global dof values
+/// of the coefficients
+inline %(return_type)s assemble_%(name)s(%(arguments)s)
+{
+  Assembler_%(name)s assembler(mesh);
+  %(call)s
+}
+"""
+
+#-------------------------------------------------------------------------------
+def generate_assembly_code(prefix, forms):
+    """Generate assembly drivers for given forms.
+
+    @param prefix:
+        String, prefix for all form names.
+    @param forms:
+        List of UFCFormNames instances.
+    """
+
+    # Generate drivers for forms of rank 0, 1 and 2
+    code = [generate_assembler(form) for form in forms if form.rank in tensors]
+
+    # Wrap code in namespace block
+    code = "\nnamespace %s_assembly\n{\n\n%s\n}" % (prefix, "\n".join(code))
+
+    # Return code
+    return "\n".join([assembly_tag, assembly_includes, code])
+
+#-------------------------------------------------------------------------------
+def generate_assembler(form):
+    "Generate assembly driver for a single form."
+
+    # Describe coefficients in order
+    if form.num_coefficients:
+        coefficients = "coefficients " + ", ".join(form.coefficient_names)
+    else:
+        coefficients = "no coefficients"
+
+    # Arguments of assembly function
+    return_type, tensor, call = tensors[form.rank]
+    arguments = ["ufc_assembly::mesh& mesh",
+                 "const std::vector<const double*>& w=std::vector<const double*>()"]
+    if tensor:
+        arguments = [tensor] + arguments + ["ufc_assembly::strategy s=ufc_assembly::colored"]
+    indent = " "*len("inline %s assemble_%s(" % (return_type, form.name))
+
+    args = {"name":         form.name,
+            "coefficients": coefficients,
+            "classname":    form.ufc_form_classname,
+            "return_type":  return_type,
+            "arguments":    (",\n" + indent).join(arguments),
+            "call":         call}
+
+    return assembler_template % args
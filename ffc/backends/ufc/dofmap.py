@@ -80,6 +80,19 @@ public:
 %(tabulate_dofs)s
   }
 
+  /// Return the local dof-to-entity incidence (four values per dof)
+  virtual const std::size_t* dof_entity_incidence() const
+  {
+%(dof_entity_incidence)s
+  }
+
+  /// Tabulate the offsets of the global indices of the local dofs
+  virtual void tabulate_dof_offsets(std::size_t* offsets,
+                                    const std::vector<std::size_t>& num_global_entities) const
+  {
+%(tabulate_dof_offsets)s
+  }
+
   /// Tabulate the local-to-local mapping from facet dofs to cell dofs
   virtual void tabulate_facet_dofs(std::size_t* dofs,
                                    std::size_t facet) const
@@ -166,6 +179,13 @@ public:
                              const std::vector<std::size_t>& num_global_entities,
                              const ufc::cell& c) const;
 
+  /// Return the local dof-to-entity incidence (four values per dof)
+  virtual const std::size_t* dof_entity_incidence() const;
+
+  /// Tabulate the offsets of the global indices of the local dofs
+  virtual void tabulate_dof_offsets(std::size_t* offsets,
+                                    const std::vector<std::size_t>& num_global_entities) const;
+
   /// Tabulate the local-to-local mapping from facet dofs to cell dofs
   virtual void tabulate_facet_dofs(std::size_t* dofs,
                                    std::size_t facet) const;
@@ -260,6 +280,19 @@ void %(classname)s::tabulate_dofs(std::size_t* dofs,
 %(tabulate_dofs)s
 }
 
+/// Return the local dof-to-entity incidence (four values per dof)
+const std::size_t* %(classname)s::dof_entity_incidence() const
+{
+%(dof_entity_incidence)s
+}
+
+/// Tabulate the offsets of the global indices of the local dofs
+void %(classname)s::tabulate_dof_offsets(std::size_t* offsets,
+                                         const std::vector<std::size_t>& num_global_entities) const
+{
+%(tabulate_dof_offsets)s
+}
+
 /// Tabulate the local-to-local mapping from facet dofs to cell dofs
 void %(classname)s::tabulate_facet_dofs(std::size_t* dofs,
                                         std::size_t facet) const
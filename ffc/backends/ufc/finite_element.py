@@ -102,6 +102,26 @@ public:
     _evaluate_basis_all(values, x, vertex_coordinates, cell_orientation);
   }
 
+  /// Evaluate all basis functions at given points in cell (actual implementation)
+  static void _evaluate_basis_all_points(std::size_t num_points,
+                                         double* values,
+                                         const double* points,
+                                         const double* vertex_coordinates,
+                                         int cell_orientation)
+  {
+%(evaluate_basis_all_points)s
+  }
+
+  /// Evaluate all basis functions at given points in cell (non-static member function)
+  void evaluate_basis_all_points(std::size_t num_points,
+                                 double* values,
+                                 const double* points,
+                                 const double* vertex_coordinates,
+                                 int cell_orientation) const
+  {
+    _evaluate_basis_all_points(num_points, values, points, vertex_coordinates, cell_orientation);
+  }
+
   /// Evaluate order n derivatives of basis function i at given point x in cell (actual implementation)
   static void _evaluate_basis_derivatives(std::size_t i,
                                           std::size_t n,
@@ -277,6 +297,23 @@ public:
     _evaluate_basis_all(values, x, vertex_coordinates, cell_orientation);
   }
 
+  /// Evaluate all basis functions at given points in cell (actual implementation)
+  static void _evaluate_basis_all_points(std::size_t num_points,
+                                         double* values,
+                                         const double* points,
+                                         const double* vertex_coordinates,
+                                         int cell_orientation);
+
+  /// Evaluate all basis functions at given points in cell (non-static member function)
+  void evaluate_basis_all_points(std::size_t num_points,
+                                 double* values,
+                                 const double* points,
+                                 const double* vertex_coordinates,
+                                 int cell_orientation) const
+  {
+    _evaluate_basis_all_points(num_points, values, points, vertex_coordinates, cell_orientation);
+  }
+
   /// Evaluate order n derivatives of basis function i at given point x in cell (actual implementation)
   static void _evaluate_basis_derivatives(std::size_t i,
                                           std::size_t n,
@@ -431,6 +468,16 @@ void %(classname)s::_evaluate_basis_all(double* values,
 %(evaluate_basis_all)s
 }
 
+/// Evaluate all basis functions at given points in cell
+void %(classname)s::_evaluate_basis_all_points(std::size_t num_points,
+                                               double* values,
+                                               const double* points,
+                                               const double* vertex_coordinates,
+                                               int cell_orientation)
+{
+%(evaluate_basis_all_points)s
+}
+
 /// Evaluate order n derivatives of basis function i at given point x in cell
 void %(classname)s::_evaluate_basis_derivatives(std::size_t i,
                                                 std::size_t n,
@@ -0,0 +1,391 @@
+"""This module provides a benchmark suite for FFC. For each form file
+and each configuration of compiler options, it measures the time
+spent in each compiler stage (from the profiling sections of the
+compiler) and the run time of tabulate_tensor for each integral of
+the JIT-compiled forms on each facet (or pair of facets, or vertex)
+of a reference cell, using the ufc_benchmark module if available.
+Each measurement is repeated and summarised by its minimum, median,
+mean and standard deviation. Run times also include the number of
+cycles per call and the rate of floating-point operations, from the
+operation counts of the generated code. The results are written as
+JSON, and two result files may be compared to flag regressions.
+
+Usage:
+
+  python -m ffc.bench [options] [files or directories]
+  python -m ffc.bench --compare old.json new.json
+
+Options:
+
+  -c, --configuration=options  compiler options, e.g. "-r quadrature -O"
+                               (may be repeated)
+  -n, --repetitions=n          number of repetitions (samples) of each
+                               measurement
+  -o, --output=file            JSON file for results (default bench.json)
+      --no-compile             skip timing of the compiler stages
+      --no-runtime             skip timing of tabulate_tensor
+      --compare                compare two result files
+  -t, --threshold=t            relative change of the median flagged as a
+                               regression or improvement (default 0.1)
+
+If no files are given, the form files of the bench and demo
+directories of the FFC source tree are used."""
+
+# Copyright (C) 2014 The FFC authors
+#
+# This file is part of FFC.
+#
+# FFC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# FFC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with FFC. If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import print_function
+
+__all__ = ["default_configurations", "parse_configuration", "run_benchmarks",
+           "benchmark_compile", "benchmark_runtime", "operation_counts",
+           "compare_results"]
+
+# Python modules
+import os
+import sys
+import json
+import glob
+import shutil
+import getopt
+import tempfile
+import numpy
+from time import time
+
+# UFL modules
+from ufl.algorithms import load_ufl_file
+
+# FFC modules
+from ffc.log import error, ERROR
+from ffc.constants import FFC_VERSION
+from ffc.parameters import default_parameters
+from ffc.compiler import compile_form
+from ffc.jitcompiler import jit
+from ffc.profiling import start_profiling, stop_profiling
+
+# The benchmark module for UFC is optional
+try:
+    import ufc_benchmark
+except ImportError:
+    ufc_benchmark = None
+
+# Default configurations of compiler options
+default_configurations = ["-r tensor",
+                          "-r tensor -O",
+                          "-r quadrature",
+                          "-r quadrature -O",
+                          "-r quadrature -O -fprecompute_basis_const",
+                          "-r quadrature -O -fsum_factorization",
+                          "-r quadrature -fblas"]
+
+# Default directories of form files (relative to the source tree)
+_source_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+default_directories = [os.path.join(_source_dir, "bench"),
+                       os.path.join(_source_dir, "demo")]
+
+# Minimum time (in seconds) of each sample of tabulate_tensor
+_sample_time = 0.01
+
+def parse_configuration(configuration):
+    """Return compiler parameters for a string of command-line options
+    (-r, -q, -O and -f) as accepted by the ffc script."""
+    parameters = {}
+    words = configuration.split()
+    i = 0
+    while i < len(words):
+        option = words[i]
+        if option in ("-r", "-q") and i + 1 < len(words):
+            key = {"-r": "representation", "-q": "quadrature_rule"}[option]
+            parameters[key] = words[i + 1]
+            i += 1
+        elif option == "-O":
+            parameters["optimize"] = True
+        elif option.startswith("-f") and len(option) > 2:
+            if "=" in option:
+                key, value = option[2:].split("=", 1)
+                parameters[key] = value
+            else:
+                parameters[option[2:]] = True
+        else:
+            error("Unable to parse option '%s' of configuration '%s'." % \
+                  (option, configuration))
+        i += 1
+    return parameters
+
+def _statistics(samples):
+    "Return statistics of list of timings."
+    samples = numpy.array(samples, dtype=float)
+    return {"min": float(samples.min()),
+            "median": float(numpy.median(samples)),
+            "mean": float(samples.mean()),
+            "stddev": float(samples.std()),
+            "samples": [float(t) for t in samples]}
+
+def _form_files(paths):
+    "Return sorted list of form files for given files and directories."
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += glob.glob(os.path.join(path, "*.ufl"))
+        else:
+            files.append(path)
+    return sorted(files)
+
+def _compile(ufd, prefix, parameters):
+    """Compile the forms of a loaded form file in a temporary directory
+    with profiling turned on. Return the total time and the report."""
+    output_dir = tempfile.mkdtemp()
+    parameters = parameters.copy()
+    parameters["output_dir"] = output_dir
+    parameters["compile_cache_dir"] = ""
+    parameters["profile"] = False
+    report = start_profiling(prefix)
+    try:
+        t = time()
+        compile_form(ufd.forms, ufd.object_names, prefix, parameters)
+        t = time() - t
+    finally:
+        stop_profiling()
+        shutil.rmtree(output_dir)
+    return t, report
+
+def benchmark_compile(ufd, prefix, parameters, repetitions):
+    """Compile the forms of a loaded form file repeatedly and return
+    statistics of the total time and the time of each compiler stage."""
+    timings = {}
+    for i in range(repetitions):
+        t, report = _compile(ufd, prefix, parameters)
+        timings.setdefault("total", []).append(t)
+        for (name, entry) in report.summary()["sections"].items():
+            if name.startswith("stage"):
+                timings.setdefault(name, []).append(entry["time"])
+    return dict((name, _statistics(samples)) for (name, samples) in timings.items())
+
+def operation_counts(ufd, prefix, parameters):
+    """Return the number of floating-point operations of tabulate_tensor
+    for each integral of the forms of a loaded form file, as recorded
+    by the code generators. The counts are returned as one dictionary
+    per form, keyed by integral type and subdomain."""
+    t, report = _compile(ufd, prefix, parameters)
+    counts = [{} for form in ufd.forms]
+    for section in report.sections:
+        if section["name"] != "generate_integral_code" or \
+           "num_operations" not in section.get("values", {}):
+            continue
+        labels = section["labels"]
+        key = (labels["integral_type"], labels["subdomain_id"])
+        counts[labels["form"]][key] = section["values"]["num_operations"]
+    return counts
+
+def _entity_name(integral_type, entity):
+    "Return name of the facet, pair of facets or vertex of a timing."
+    if entity is None:
+        return ""
+    if integral_type == "interior_facet":
+        return " facets %d,%d" % tuple(entity)
+    if integral_type == "point":
+        return " vertex %d" % entity
+    return " facet %d" % entity
+
+def benchmark_runtime(ufd, prefix, parameters, repetitions):
+    """JIT-compile the forms of a loaded form file and return
+    statistics of the time for tabulate_tensor of each integral on
+    each facet (or pair of facets, or vertex) of a reference cell,
+    keyed by form number, integral type, subdomain and entity. The
+    statistics include the median number of cycles per call and, if
+    known, the number of floating-point operations and their rate at
+    the median time."""
+    counts = operation_counts(ufd, prefix, parameters)
+    timings = {}
+    for (i, form) in enumerate(ufd.forms):
+        compiled_form, module, form_prefix = jit(form, parameters)
+        result = ufc_benchmark.benchmark_forms([compiled_form], [counts[i]],
+                                               repetitions, _sample_time)[0]
+        for timing in result:
+            key = "form %d/%s %s%s" % (i, timing["integral_type"], timing["subdomain_id"],
+                                       _entity_name(timing["integral_type"],
+                                                    timing["entity"]))
+            timings[key] = dict((name, value) for (name, value) in timing.items()
+                                if not name in ("integral_type", "subdomain_id", "entity"))
+    return timings
+
+def run_benchmarks(files, configurations=default_configurations,
+                   repetitions=5, compile_time=True, runtime=True):
+    """Run benchmarks for the given form files and configurations and
+    return results as a dictionary suitable for JSON output. Progress
+    is printed, as the log level of FFC is set to ERROR for the
+    compiler and the JIT compiler."""
+    if runtime and ufc_benchmark is None:
+        print("Unable to import ufc_benchmark, skipping timing of tabulate_tensor.")
+        runtime = False
+
+    results = {}
+    for filename in files:
+        name = os.path.splitext(os.path.basename(filename))[0]
+        ufd = load_ufl_file(filename)
+        if not ufd.forms:
+            print("Skipping %s (no forms)" % name)
+            continue
+        for configuration in configurations:
+            print("Benchmarking %s with options '%s'" % (name, configuration))
+            parameters = default_parameters()
+            parameters["log_level"] = ERROR
+            parameters.update(parse_configuration(configuration))
+            result = {}
+            try:
+                if compile_time:
+                    result["compile"] = benchmark_compile(ufd, name, parameters,
+                                                          repetitions)
+                if runtime:
+                    result["runtime"] = benchmark_runtime(ufd, name, parameters,
+                                                          repetitions)
+            except Exception as exception:
+                print("Benchmark of %s with options '%s' failed: %s" % \
+                      (name, configuration, str(exception)))
+                result["error"] = str(exception)
+            results.setdefault(name, {})[configuration] = result
+
+    return {"ffc_version": FFC_VERSION,
+            "repetitions": repetitions,
+            "configurations": list(configurations),
+            "results": results}
+
+def _measurements(results):
+    "Return dictionary of statistics keyed by (file, configuration, kind, name)."
+    measurements = {}
+    for (name, configurations) in results["results"].items():
+        for (configuration, result) in configurations.items():
+            for kind in ("compile", "runtime"):
+                for (key, statistics) in result.get(kind, {}).items():
+                    measurements[(name, configuration, kind, key)] = statistics
+    return measurements
+
+def compare_results(old, new, threshold=0.1):
+    """Compare the medians of the measurements found in both of two
+    results. Return lists of regressions and improvements, where each
+    item is (file, configuration, kind, name, old median, new median)
+    and the relative change of the median exceeds the threshold. A
+    change is only flagged if it also exceeds the standard deviations
+    of both measurements."""
+    old_measurements = _measurements(old)
+    new_measurements = _measurements(new)
+    regressions = []
+    improvements = []
+    for key in sorted(set(old_measurements) & set(new_measurements)):
+        a = old_measurements[key]
+        b = new_measurements[key]
+        change = b["median"] - a["median"]
+        if abs(change) <= threshold*a["median"] or \
+           abs(change) <= max(a["stddev"], b["stddev"]):
+            continue
+        item = key + (a["median"], b["median"])
+        if change > 0:
+            regressions.append(item)
+        else:
+            improvements.append(item)
+    return regressions, improvements
+
+def _print_results(results):
+    "Print table of median times."
+    rows = [("file", "options", "kind", "measurement", "median (s)", "stddev (s)")]
+    for (key, statistics) in sorted(_measurements(results).items()):
+        rows.append(key + ("%.4g" % statistics["median"], "%.2g" % statistics["stddev"]))
+    _print_table(rows)
+
+def _print_comparison(items, title):
+    "Print table of changed measurements."
+    print("%s (%d):" % (title, len(items)))
+    if not items:
+        return
+    rows = [("file", "options", "kind", "measurement", "old (s)", "new (s)", "change")]
+    for item in items:
+        old, new = item[4:]
+        rows.append(item[:4] + ("%.4g" % old, "%.4g" % new,
+                                "%+.1f%%" % (100.0*(new - old)/old)))
+    _print_table(rows)
+
+def _print_table(rows):
+    "Print rows of strings as table."
+    sizes = [max(len(row[j]) for row in rows) for j in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(value.ljust(size) for (value, size) in zip(row, sizes)))
+
+def main(argv):
+    "Main function."
+    try:
+        opts, args = getopt.getopt(argv, "hc:n:o:t:",
+                                   ["help", "configuration=", "repetitions=",
+                                    "output=", "no-compile", "no-runtime",
+                                    "compare", "threshold="])
+    except getopt.GetoptError:
+        print(__doc__)
+        return 1
+
+    configurations = []
+    repetitions = 5
+    output = "bench.json"
+    compile_time = True
+    runtime = True
+    compare = False
+    threshold = 0.1
+    for (opt, arg) in opts:
+        if opt in ("-h", "--help"):
+            print(__doc__)
+            return 0
+        elif opt in ("-c", "--configuration"):
+            configurations.append(arg)
+        elif opt in ("-n", "--repetitions"):
+            repetitions = int(arg)
+        elif opt in ("-o", "--output"):
+            output = arg
+        elif opt == "--no-compile":
+            compile_time = False
+        elif opt == "--no-runtime":
+            runtime = False
+        elif opt == "--compare":
+            compare = True
+        elif opt in ("-t", "--threshold"):
+            threshold = float(arg)
+
+    # Compare two result files
+    if compare:
+        if len(args) != 2:
+            print(__doc__)
+            return 1
+        with open(args[0]) as f:
+            old = json.load(f)
+        with open(args[1]) as f:
+            new = json.load(f)
+        regressions, improvements = compare_results(old, new, threshold)
+        _print_comparison(regressions, "Regressions")
+        _print_comparison(improvements, "Improvements")
+        return 1 if regressions else 0
+
+    # Run benchmarks
+    files = _form_files(args or [d for d in default_directories if os.path.isdir(d)])
+    if not files:
+        print("No form files found.")
+        return 1
+    results = run_benchmarks(files, configurations or default_configurations,
+                             repetitions, compile_time, runtime)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+    _print_results(results)
+    print("Wrote benchmark results to file %s" % output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,148 @@
+"""This module implements a persistent on-disk cache for the code
+generated by compiler stages 2-4. Each entry holds the generated code
+bodies for all elements, dofmaps, integrals and forms of a compilation
+unit and is keyed by the signatures of the forms, the prefix and the
+compiler parameters. When the total size of the cache exceeds the
+given limit, entries are evicted in least-recently-used order."""
+
+# Copyright (C) 2014 The FFC authors
+#
+# This file is part of FFC.
+#
+# FFC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# FFC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with FFC. If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["CodeCache", "create_code_cache", "compute_cache_key"]
+
+# Python modules
+import os
+import pickle
+import tempfile
+from hashlib import sha1
+
+# FFC modules
+from ffc.log import debug, warning
+from ffc.constants import FFC_VERSION
+from ffc.jitobject import ufc_signature, _parameters_signature
+
+# Parameters that do not influence the code generated by stages 2-4
+_ignored_parameters = ["log_level", "log_prefix", "output_dir", "cache_dir",
+                       "compile_cache_dir", "compile_cache_size", "profile",
+                       "num_processes", "tabulation_cache_size",
+                       "tabulation_cache_dir"]
+
+# Suffix of cache entry files
+_suffix = ".ffccache"
+
+class CodeCache:
+    """A directory of pickled code entries with a bound on the total
+    size. The modification time of an entry file is used as its last
+    access time."""
+
+    def __init__(self, cache_dir, max_size):
+        "Create cache in given directory with maximum size in bytes."
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get(self, key):
+        "Return cached value for key, or None if not in cache."
+        filename = self._filename(key)
+        try:
+            with open(filename, "rb") as f:
+                value = pickle.load(f)
+        except (IOError, OSError):
+            return None
+        except Exception:
+            warning("Ignoring corrupt compile cache entry %s." % filename)
+            self._remove(filename)
+            return None
+
+        # Mark entry as recently used
+        try:
+            os.utime(filename, None)
+        except OSError:
+            pass
+
+        return value
+
+    def put(self, key, value):
+        "Store value for key and evict old entries if necessary."
+
+        # Write to a temporary file first, so that concurrent
+        # compilations never see a partially written entry
+        fd, tmpname = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmpname, self._filename(key))
+        except Exception:
+            self._remove(tmpname)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        "Remove least recently used entries until cache fits max size."
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(_suffix):
+                continue
+            filename = os.path.join(self.cache_dir, name)
+            try:
+                s = os.stat(filename)
+            except OSError:
+                continue
+            entries.append((s.st_mtime, s.st_size, filename))
+
+        total_size = sum(e[1] for e in entries)
+        for (mtime, size, filename) in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            debug("Evicting compile cache entry %s" % filename)
+            self._remove(filename)
+            total_size -= size
+
+    def _filename(self, key):
+        return os.path.join(self.cache_dir, key + _suffix)
+
+    def _remove(self, filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+def create_code_cache(parameters):
+    "Create code cache from parameters, or return None if disabled."
+    cache_dir = parameters.get("compile_cache_dir")
+    if not cache_dir:
+        return None
+    max_size = int(float(parameters.get("compile_cache_size", 256))*1024**2)
+    return CodeCache(os.path.expanduser(cache_dir), max_size)
+
+def compute_cache_key(forms, prefix, parameters):
+    "Compute cache key for forms compiled with given prefix and parameters."
+
+    parameters = parameters.copy()
+    for ignore in _ignored_parameters:
+        if ignore in parameters:
+            del parameters[ignore]
+
+    signatures = [form.signature() for form in forms]
+    signatures += [prefix,
+                   _parameters_signature(parameters),
+                   str(FFC_VERSION),
+                   ufc_signature]
+
+    return sha1(";".join(signatures).encode("utf-8")).hexdigest()
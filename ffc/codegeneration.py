@@ -33,9 +33,12 @@ UFC function from an (optimized) intermediate representation (OIR).
 from ffc.log import info, begin, end, debug_code
 from ffc.cpp import format, indent
 from ffc.cpp import set_exception_handling
+from ffc.utils import parallel_map
+from ffc.profiling import profiled, profile_section
 
 # FFC code generation modules
 from ffc.evaluatebasis import _evaluate_basis, _evaluate_basis_all
+from ffc.evaluatebasis import _evaluate_basis_all_points
 from ffc.evaluatebasisderivatives import _evaluate_basis_derivatives
 from ffc.evaluatebasisderivatives import _evaluate_basis_derivatives_all
 from ffc.evaluatedof import evaluate_dof_and_dofs, affine_weights
@@ -52,6 +55,7 @@ def _not_implemented(function_name, return_null=False):
     return body
 
 
+@profiled("stage 4: code generation", count_objects=True)
 def generate_code(ir, prefix, parameters):
     "Generate code from intermediate representation."
 
@@ -79,8 +83,9 @@ def generate_code(ir, prefix, parameters):
 
     # Generate code for integrals
     info("Generating code for integrals")
-    code_integrals = [_generate_integral_code(ir, prefix, parameters)
-                      for ir in ir_integrals]
+    generate = lambda ir: _generate_integral_code(ir, prefix, parameters)
+    code_integrals = parallel_map(generate, ir_integrals,
+                                  parameters["num_processes"])
 
     # Generate code for forms
     info("Generating code for forms")
@@ -126,6 +131,8 @@ def _generate_element_code(ir, prefix, parameters):
     code["value_dimension"] = _value_dimension(ir["value_dimension"])
     code["evaluate_basis"] = _evaluate_basis(ir["evaluate_basis"])
     code["evaluate_basis_all"] = _evaluate_basis_all(ir["evaluate_basis"])
+    code["evaluate_basis_all_points"] \
+        = _evaluate_basis_all_points(ir["evaluate_basis"])
     code["evaluate_basis_derivatives"] \
         = _evaluate_basis_derivatives(ir["evaluate_basis"])
     code["evaluate_basis_derivatives_all"] \
@@ -185,7 +192,11 @@ def _generate_dofmap_code(ir, prefix, parameters):
     code["num_entity_dofs"] \
         = switch(f_d, [ret(num) for num in ir["num_entity_dofs"]],
                  ret(f_int(0)))
-    code["tabulate_dofs"] = _tabulate_dofs(ir["tabulate_dofs"])
+    table_threshold = int(parameters["dof_table_threshold"])
+    code["tabulate_dofs"] = _tabulate_dofs(ir["tabulate_dofs"], table_threshold)
+    code["dof_entity_incidence"] = _dof_entity_incidence(ir["tabulate_dofs"])
+    code["tabulate_dof_offsets"] = _tabulate_dof_offsets(ir["tabulate_dofs"],
+                                                         table_threshold)
     code["tabulate_facet_dofs"] \
         = _tabulate_facet_dofs(ir["tabulate_facet_dofs"])
     code["tabulate_entity_dofs"] \
@@ -214,7 +225,12 @@ def _generate_integral_code(ir, prefix, parameters):
     r = pick_representation(ir["representation"])
 
     # Generate code
-    code = r.generate_integral_code(ir, prefix, parameters)
+    with profile_section("generate_integral_code",
+                         form=ir["form_id"],
+                         integral_type=ir["integral_type"],
+                         subdomain_id=ir["subdomain_id"],
+                         representation=ir["representation"]):
+        code = r.generate_integral_code(ir, prefix, parameters)
 
     # Indent code (unused variables should already be removed)
     # FIXME: Remove this quick hack
@@ -347,8 +363,9 @@ def _tabulate_facet_dofs(ir):
     return format["switch"](format["facet"](None), cases)
 
 
-def _tabulate_dofs(ir):
-    "Generate code for tabulate_dofs."
+def _tabulate_dofs(ir, table_threshold=0):
+    """Generate code for tabulate_dofs. The code is table-driven if the
+    local dimension is at least table_threshold (if nonzero)."""
 
     # Prefetch formats
     add = format["addition"]
@@ -368,6 +385,10 @@ def _tabulate_dofs(ir):
     (dofs_per_element, num_dofs_per_element, num_entities,
      need_offset, fakes) = ir
 
+    # Generate table-driven code for large local dimensions
+    if table_threshold and sum(num_dofs_per_element) >= table_threshold:
+        return _tabulate_dofs_table(ir)
+
     # Declare offset if needed
     code = []
     offset_name = "0"
@@ -411,6 +432,228 @@ def _tabulate_dofs(ir):
     return "\n".join(code)
 
 
+def _dof_entity_incidence(ir):
+    "Generate code for dof_entity_incidence."
+
+    # Prefetch formats
+    component = format["component"]
+    decl = format["declaration"]
+    size_t = format["static const size_t declaration"]
+    ret = format["return"]
+
+    # Global dofs are not associated with mesh entities
+    incidence = []
+    if ir is None:
+        incidence = [(0, 0, 0, 0)]
+    else:
+        # Extract representation
+        (dofs_per_element, num_dofs_per_element, num_entities,
+         need_offset, fakes) = ir
+
+        # Compute incidence of each dof (as in tabulate_dofs)
+        for (no, num_dofs) in enumerate(dofs_per_element):
+
+            # Handle fakes (Space of reals)
+            if fakes[no] and num_dofs_per_element[no] == 1:
+                incidence.append((0, 0, 0, 0))
+                continue
+
+            local_incidence = [(0, 0, 0, 0)]*num_dofs_per_element[no]
+            for (dim, num) in enumerate(num_dofs):
+                for (k, dofs) in enumerate(num):
+                    for (j, dof) in enumerate(dofs):
+                        local_incidence[dof] = (dim, k, len(dofs), j)
+            incidence += local_incidence
+
+    # Tabulate incidence as static array
+    values = format["list"]([v for i in incidence for v in i])
+    code = [decl(size_t, component("incidence", 4*len(incidence)), values)]
+    code += [ret("incidence")]
+
+    return "\n".join(code)
+
+
+def _tabulate_dof_offsets(ir, table_threshold=0):
+    """Generate code for tabulate_dof_offsets. The code is table-driven
+    if the local dimension is at least table_threshold (if nonzero)."""
+
+    # Prefetch formats
+    multiply = format["multiply"]
+    iadd = format["iadd"]
+    assign = format["assign"]
+    component = format["component"]
+    num_entities_format = format["num entities"]
+    unsigned_int = format["uint declaration"]
+    offsets_variable = format["argument offsets"]
+
+    if ir is None:
+        return assign(component(offsets_variable, 0), 0)
+
+    # Extract representation
+    (dofs_per_element, num_dofs_per_element, num_entities,
+     need_offset, fakes) = ir
+
+    # Generate table-driven code for large local dimensions
+    if table_threshold and sum(num_dofs_per_element) >= table_threshold:
+        code = _dof_table(ir, "block_offsets", False)
+        value = component("block_offsets", component("dof_blocks", "r"))
+        code += format["generate loop"]([assign(component(offsets_variable, "r"), value)],
+                                        [("r", 0, sum(num_dofs_per_element))])
+        return "\n".join(code)
+
+    # Declare offset if needed
+    code = []
+    offset_name = "0"
+    if need_offset:
+        offset_name = "offset"
+        code.append(format["declaration"](unsigned_int, offset_name, 0))
+
+    # Generate code for each element (offsets of tabulate_dofs)
+    i = 0
+    for (no, num_dofs) in enumerate(dofs_per_element):
+
+        # Handle fakes (Space of reals)
+        if fakes[no] and num_dofs_per_element[no] == 1:
+            code.append(assign(component(offsets_variable, i), offset_name))
+            if offset_name != "0":
+                code.append(iadd(offset_name, 1))
+            i += 1
+            continue
+
+        # Generate code for each degree of freedom for each dimension
+        for (dim, num) in enumerate(num_dofs):
+
+            # Ignore if no dofs for this dimension
+            if not num[0]:
+                continue
+
+            for dofs in num:
+                for dof in dofs:
+                    code.append(assign(component(offsets_variable, dof+i), offset_name))
+
+            # Update offset corresponding to mesh entity:
+            if need_offset:
+                addition = multiply([len(num[0]),
+                                     component(num_entities_format, dim)])
+                code.append(iadd("offset", addition))
+
+        i += num_dofs_per_element[no]
+
+    return "\n".join(code)
+
+
+def _dof_table(ir, name, entity_offsets=True):
+    """Generate code for computing the offset of each block of dofs
+    (the dofs of an element on a mesh entity, or a global dof) in an
+    array of the given name, followed by tables of the block and local
+    index of each dof. The offsets include the entity indices of the
+    cell if entity_offsets is True, and are otherwise the offsets of
+    tabulate_dof_offsets."""
+
+    # Prefetch formats
+    add = format["addition"]
+    iadd = format["iadd"]
+    multiply = format["multiply"]
+    assign = format["assign"]
+    component = format["component"]
+    entity_index = format["entity index"]
+    num_entities_format = format["num entities"]
+    unsigned_int = format["uint declaration"]
+
+    # Extract representation
+    (dofs_per_element, num_dofs_per_element, num_entities,
+     need_offset, fakes) = ir
+
+    # Declare offset if needed
+    code = []
+    offset_name = "0"
+    if need_offset:
+        offset_name = "offset"
+        code.append(format["declaration"](unsigned_int, offset_name, 0))
+
+    # Generate code for each block and tabulate block and local index
+    # of each dof
+    blocks = []
+    indices = []
+    num_blocks = 0
+    for (no, num_dofs) in enumerate(dofs_per_element):
+
+        # Handle fakes (Space of reals)
+        if fakes[no] and num_dofs_per_element[no] == 1:
+            code.append(assign(component(name, num_blocks), offset_name))
+            if offset_name != "0":
+                code.append(iadd(offset_name, 1))
+            blocks.append(num_blocks)
+            indices.append(0)
+            num_blocks += 1
+            continue
+
+        local_blocks = [0]*num_dofs_per_element[no]
+        local_indices = [0]*num_dofs_per_element[no]
+        for (dim, num) in enumerate(num_dofs):
+
+            # Ignore if no dofs for this dimension
+            if not num[0]:
+                continue
+
+            # One block per entity, or per dimension without entity
+            # indices
+            for (k, dofs) in enumerate(num):
+                if entity_offsets:
+                    v = multiply([len(num[k]), component(entity_index, (dim, k))])
+                    value = add([offset_name, v]) if offset_name != "0" else v
+                    code.append(assign(component(name, num_blocks), value))
+                    num_blocks += 1
+                elif k == 0:
+                    code.append(assign(component(name, num_blocks), offset_name))
+                    num_blocks += 1
+                for (j, dof) in enumerate(dofs):
+                    local_blocks[dof] = num_blocks - 1
+                    local_indices[dof] = j
+
+            # Update offset corresponding to mesh entity:
+            if need_offset:
+                addition = multiply([len(num[0]),
+                                     component(num_entities_format, dim)])
+                code.append(iadd("offset", addition))
+
+        blocks += local_blocks
+        indices += local_indices
+
+    # Declare block offsets and tables
+    decl = format["declaration"]
+    uint = format["static const uint declaration"]
+    code.insert(0, decl(format["size_t declaration"], component(name, num_blocks)))
+    code.append("")
+    code.append(format["comment"]("Block and local index of each dof"))
+    code.append(decl(uint, component("dof_blocks", len(blocks)),
+                     format["list"](blocks)))
+    if entity_offsets:
+        code.append(decl(uint, component("dof_indices", len(indices)),
+                         format["list"](indices)))
+
+    return code
+
+
+def _tabulate_dofs_table(ir):
+    "Generate table-driven code for tabulate_dofs."
+
+    # Prefetch formats
+    component = format["component"]
+    dofs_variable = format["argument dofs"]
+
+    # Compute offset of each block of dofs and fill in the dofs of
+    # each block from tables
+    code = _dof_table(ir, "block_offsets")
+    value = format["addition"]([component("block_offsets", component("dof_blocks", "r")),
+                                component("dof_indices", "r")])
+    num_dofs = sum(ir[1])
+    code += format["generate loop"]([format["assign"](component(dofs_variable, "r"), value)],
+                                    [("r", 0, num_dofs)])
+
+    return "\n".join(code)
+
+
 def _tabulate_coordinates(ir):
     "Generate code for tabulate_coordinates."
 
@@ -30,6 +30,9 @@
 __all__ = ["comment_ufc", "comment_dolfin", "header_h", "header_c", "footer",
            "compute_jacobian", "compute_jacobian_inverse",
            "eval_basis_decl", "eval_basis_init", "eval_basis", "eval_basis_quad_offset", "eval_basis_copy",
+           "eval_basis_points", "eval_basis_points_copy",
+           "eval_basis_workspace_check", "eval_basis_workspace_store",
+           "eval_basis_workspace_members",
            "eval_derivs_decl", "eval_derivs_init", "eval_derivs","eval_derivs_quad_offset", "eval_derivs_copy"]
 
 __old__ = ["evaluate_f",
@@ -775,11 +778,11 @@ max_facet_edge_length = {3: {3: _max_facet_edge_length_3D}}
 # Code snippets for runtime quadrature (calling evaluate_basis)
 
 eval_basis_decl = """\
-std::vector<std::vector<double> > %(table_name)s(num_quadrature_points);"""
+std::vector<std::vector<double> >& %(table_name)s = _%(table_name)s;"""
 
 eval_basis_init = """\
-for (std::size_t ip = 0; ip < num_quadrature_points; ip++)
-  %(table_name)s[ip].resize(%(table_size)s);"""
+if (%(table_name)s.size() < num_quadrature_points)
+  %(table_name)s.resize(num_quadrature_points, std::vector<double>(%(table_size)s));"""
 
 eval_basis = """\
 // Get current quadrature point and compute values of basis functions
@@ -798,12 +801,25 @@ eval_basis_copy = """\
 for (std::size_t i = 0; i < %(space_dim)s; i++)
   %(table_name)s[ip][%(table_offset)s + i] = %(eval_name)s[%(eval_stride)s*i + %(eval_offset)s];"""
 
+eval_basis_points = """\
+// Compute values of basis functions at all quadrature points
+std::vector<double>& %(eval_name)s = _%(eval_name)s;
+if (%(eval_name)s.size() < num_quadrature_points*%(eval_size)s)
+  %(eval_name)s.resize(num_quadrature_points*%(eval_size)s);
+if (num_quadrature_points > 0)
+  %(form_prefix)s_finite_element_%(element_number)s::_evaluate_basis_all_points(num_quadrature_points, &%(eval_name)s[0], %(points)s, vertex_coordinates + %(vertex_offset)s, cell_orientation);"""
+
+eval_basis_points_copy = """\
+// Copy values to table %(table_name)s
+for (std::size_t i = 0; i < %(space_dim)s; i++)
+  %(table_name)s[ip][%(table_offset)s + i] = %(eval_name)s[ip*%(eval_size)s + %(eval_stride)s*i + %(eval_offset)s];"""
+
 eval_derivs_decl = """\
-std::vector<std::vector<double> > %(table_name)s(num_quadrature_points);"""
+std::vector<std::vector<double> >& %(table_name)s = _%(table_name)s;"""
 
 eval_derivs_init = """\
-for (std::size_t ip = 0; ip < num_quadrature_points; ip++)
-  %(table_name)s[ip].resize(%(table_size)s);"""
+if (%(table_name)s.size() < num_quadrature_points)
+  %(table_name)s.resize(num_quadrature_points, std::vector<double>(%(table_size)s));"""
 
 eval_derivs = """\
 // Get current quadrature point and compute values of basis function derivatives
@@ -821,3 +837,35 @@ eval_derivs_copy = """\
 // Copy values to table %(table_name)s
 for (std::size_t i = 0; i < %(space_dim)s; i++)
   %(table_name)s[ip][%(table_offset)s + i] = %(eval_name)s[%(eval_stride)s*i + %(eval_offset)s];"""
+
+eval_basis_workspace_check = """\
+// Tabulate basis functions only if the quadrature points, vertex
+// coordinates or cell orientation differ from the previous call
+const std::size_t num_point_values = %(num_point_values)s;
+const std::size_t num_vertex_values = %(num_vertex_values)s;
+const bool tabulate = !(_tabulated_cell_orientation == cell_orientation &&
+                        _tabulated_points.size() == num_point_values &&
+                        _tabulated_vertex_coordinates.size() == num_vertex_values &&
+                        std::equal(quadrature_points, quadrature_points + num_point_values,
+                                   _tabulated_points.begin()) &&
+                        std::equal(vertex_coordinates, vertex_coordinates + num_vertex_values,
+                                   _tabulated_vertex_coordinates.begin()));"""
+
+eval_basis_workspace_store = """\
+// Remember input of tabulated basis functions
+_tabulated_points.assign(quadrature_points, quadrature_points + num_point_values);
+_tabulated_vertex_coordinates.assign(vertex_coordinates, vertex_coordinates + num_vertex_values);
+_tabulated_cell_orientation = cell_orientation;"""
+
+eval_basis_workspace_members = """
+  // Workspace for tables of basis functions at the quadrature points,
+  // reused across calls to tabulate_tensor. Note that tabulate_tensor
+  // may therefore not be called concurrently on the same object.
+%(tables)s
+
+  // Quadrature points, vertex coordinates and cell orientation for
+  // which the tables were last tabulated
+  mutable std::vector<double> _tabulated_points;
+  mutable std::vector<double> _tabulated_vertex_coordinates;
+  mutable int _tabulated_cell_orientation;
+"""
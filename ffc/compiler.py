@@ -117,6 +117,7 @@ The compiler stages are implemented by the following functions:
 __all__ = ["compile_form", "compile_element"]
 
 # Python modules
+import os
 from time import time
 
 # FFC modules
@@ -130,6 +131,8 @@ from ffc.optimization import optimize_ir
 from ffc.codegeneration import generate_code
 from ffc.formatting import format_code
 from ffc.wrappers import generate_wrapper_code
+from ffc.cache import create_code_cache, compute_cache_key
+from ffc.profiling import start_profiling, stop_profiling
 
 from IPython import embed
 
@@ -148,25 +151,46 @@ def compile_form(forms, object_names={}, prefix="Form",\
     parameters = _check_parameters(parameters)
     if not forms: return
 
-    # Stage 1: analysis
-    cpu_time = time()
-    analysis = analyze_forms(forms, parameters)
-    _print_timing(1, time() - cpu_time)
-    # embed()
-    # Stage 2: intermediate representation
-    cpu_time = time()
-    ir = compute_ir(analysis, parameters)
-    _print_timing(2, time() - cpu_time)
-    # embed()
-    # Stage 3: optimization
-    cpu_time = time()
-    oir = optimize_ir(ir, parameters)
-    _print_timing(3, time() - cpu_time)
-
-    # Stage 4: code generation
-    cpu_time = time()
-    code = generate_code(oir, prefix, parameters)
-    _print_timing(4, time() - cpu_time)
+    # Start profiling
+    if parameters["profile"]:
+        start_profiling(prefix)
+
+    # Look for previously generated code in the compile cache
+    cache = create_code_cache(parameters)
+    code = None
+    if cache is not None:
+        cache_key = compute_cache_key(forms, prefix, parameters)
+        code = cache.get(cache_key)
+        if code is not None:
+            info("Reusing generated code from compile cache, skipping stages 2-4.\n")
+
+    # Stage 1: analysis (only needed for wrappers if code is cached)
+    analysis = None
+    if code is None or parameters["format"] == "dolfin" or parameters["assembly_driver"]:
+        cpu_time = time()
+        analysis = analyze_forms(forms, parameters)
+        _print_timing(1, time() - cpu_time)
+
+    if code is None:
+        # embed()
+        # Stage 2: intermediate representation
+        cpu_time = time()
+        ir = compute_ir(analysis, parameters)
+        _print_timing(2, time() - cpu_time)
+        # embed()
+        # Stage 3: optimization
+        cpu_time = time()
+        oir = optimize_ir(ir, parameters)
+        _print_timing(3, time() - cpu_time)
+
+        # Stage 4: code generation
+        cpu_time = time()
+        code = generate_code(oir, prefix, parameters)
+        _print_timing(4, time() - cpu_time)
+
+        # Store generated code in the compile cache
+        if cache is not None:
+            cache.put(cache_key, code)
 
     # Stage 4.1: generate wrappers
     cpu_time = time()
@@ -178,6 +202,10 @@ def compile_form(forms, object_names={}, prefix="Form",\
     format_code(code, wrapper_code, prefix, parameters)
     _print_timing(5, time() - cpu_time)
 
+    # Write profiling report
+    if parameters["profile"]:
+        _write_profiling_report(prefix, parameters)
+
     info_green("FFC finished in %g seconds.", time() - cpu_time_0)
 
 def compile_element(elements, prefix="Element", parameters=default_parameters()):
@@ -194,6 +222,10 @@ def compile_element(elements, prefix="Element", parameters=default_parameters())
     parameters = _check_parameters(parameters)
     if not elements: return
 
+    # Start profiling
+    if parameters["profile"]:
+        start_profiling(prefix)
+
     # Stage 1: analysis
     cpu_time = time()
     analysis = analyze_elements(elements, parameters)
@@ -225,6 +257,10 @@ def compile_element(elements, prefix="Element", parameters=default_parameters())
     format_code(code, wrapper_code, prefix, parameters)
     _print_timing(5, time() - cpu_time)
 
+    # Write profiling report
+    if parameters["profile"]:
+        _write_profiling_report(prefix, parameters)
+
     info_green("FFC finished in %g seconds.", time() - cpu_time_0)
 
 def _check_forms(forms):
@@ -241,12 +277,24 @@ def _check_elements(elements):
 
 def _check_parameters(parameters):
     "Initial check of parameters."
-    if "blas" in parameters:
-        warning("BLAS mode unavailable (will return in a future version).")
     if "quadrature_points" in parameters:
         warning("Option 'quadrature_points' has been replaced by 'quadrature_degree'.")
+    if "autotune" in parameters and not parameters.get("tuning_database"):
+        warning("Autotuning without a tuning database (-ftuning_database), "
+                "measurements and decisions will not be reused.")
+    if parameters.get("profile") and int(parameters.get("num_processes", 1)) > 1:
+        warning("Profiling requires a single process, ignoring option 'num_processes'.")
+        parameters = parameters.copy()
+        parameters["num_processes"] = 1
     return parameters
 
 def _print_timing(stage, timing):
     "Print timing results."
     info("Compiler stage %s finished in %g seconds.\n" % (str(stage), timing))
+
+def _write_profiling_report(prefix, parameters):
+    "Write profiling report to file in JSON format."
+    report = stop_profiling()
+    filename = os.path.join(parameters["output_dir"], "%s_profile.json" % prefix)
+    report.write(filename)
+    info("Wrote profiling report to file %s" % filename)
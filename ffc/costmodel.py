@@ -0,0 +1,352 @@
+"""This module implements the automatic selection of representation
+for integrals by a cost model. The number of floating-point operations
+of tabulate_tensor is estimated for tensor and quadrature
+representation, from the dimensions of the elements, the number of
+quadrature points and the size of the reference tensor, and converted
+to a run time by a linear model (overhead per call plus time per
+operation) for each representation. The linear models are calibrated
+by least squares from a small on-disk database of run times measured
+with the ufc_benchmark module. No measurements are shipped with FFC;
+without measurements of both representations, the heuristic of
+previous versions is used (tensor representation if the estimated
+complexity of the integrand is low).
+
+In autotune mode (-fautotune), both representations are instead
+compiled and timed for each integral, and the measurements are added
+to the database. The same mode is used to select the fastest variant
+of other optimizations (see the function autotune). Decisions are
+remembered in the database, keyed by the signature of the integrals
+and the compiler parameters."""
+
+# Copyright (C) 2014 The FFC authors
+#
+# This file is part of FFC.
+#
+# FFC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# FFC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with FFC. If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["select_representation", "autotune", "predict_times", "calibrate",
+           "TuningDatabase", "open_tuning_database"]
+
+# Python modules
+import os
+import json
+import tempfile
+import numpy
+from hashlib import sha1
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# FFC modules
+from ffc.log import debug, info, warning
+from ffc.quadrature_schemes import create_quadrature
+from ffc.tensor import estimate_cost, estimate_flops
+from ffc.jitobject import _parameters_signature
+from ffc.cache import _ignored_parameters
+
+# Representations selected between
+_representations = ("tensor", "quadrature")
+
+# Time per floating-point operation (in seconds) of uncalibrated model
+_default_time_per_flop = 1e-9
+
+# Maximum estimated cost (see estimate_cost) of integrals in tensor
+# representation without calibrated model
+_max_tensor_cost = 3
+
+# Samples of each timing in autotune mode and minimum time per sample
+_num_samples = 5
+_sample_time = 0.005
+
+class TuningDatabase:
+    """A JSON file holding measured run times of tabulate_tensor and
+    autotuning decisions. Each measurement is a dict with the
+    representation, integral type, estimated number of operations and
+    measured time (in seconds per call). Decisions are stored by key
+    and kind (such as "representation")."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.measurements, self.decisions = self._load()
+
+        # Measurements and decisions added since the last save
+        self._new_measurements = []
+        self._new_decisions = []
+
+    def get_decision(self, kind, key):
+        "Return decision of given kind for key, or None if not found."
+        return self.decisions.get(kind, {}).get(key)
+
+    def add_decision(self, kind, key, value):
+        "Add decision of given kind for key."
+        self.decisions.setdefault(kind, {})[key] = value
+        self._new_decisions.append((kind, key, value))
+
+    def add_measurement(self, measurement):
+        "Add measurement."
+        self.measurements.append(measurement)
+        self._new_measurements.append(measurement)
+
+    def save(self):
+        """Write database to file (atomically). The measurements and
+        decisions added since the last save are merged with the current
+        contents of the file, which is locked meanwhile (if supported),
+        such that concurrent compilations do not overwrite each other."""
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with _FileLock(self.filename + ".lock"):
+            measurements, decisions = self._load()
+            measurements += self._new_measurements
+            for (kind, key, value) in self._new_decisions:
+                decisions.setdefault(kind, {})[key] = value
+            fd, tmpname = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, "w") as f:
+                json.dump({"measurements": measurements,
+                           "decisions": decisions}, f, indent=1, sort_keys=True)
+            os.rename(tmpname, self.filename)
+        self.measurements = measurements
+        self.decisions = decisions
+        self._new_measurements = []
+        self._new_decisions = []
+
+    def _load(self):
+        "Read measurements and decisions from file (empty if not found)."
+        if not os.path.isfile(self.filename):
+            return [], {}
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+            return data.get("measurements", []), data.get("decisions", {})
+        except (IOError, ValueError) as exception:
+            warning("Unable to read tuning database %s: %s" % (self.filename, str(exception)))
+            return [], {}
+
+class _FileLock:
+    """Exclusive lock of a file while in a with statement. Does nothing
+    on platforms without fcntl."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.file = open(self.filename, "a")
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        if self.file is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+
+def open_tuning_database(parameters):
+    "Open tuning database from parameters, or return None if disabled."
+    filename = parameters.get("tuning_database")
+    if not filename:
+        return None
+    return TuningDatabase(os.path.expanduser(filename))
+
+def calibrate(measurements):
+    """Fit the linear model (overhead per call plus time per operation)
+    of each representation to the given measurements by least squares.
+    Return a dictionary from representation to (overhead, time per
+    operation), or None unless all representations have measurements."""
+    models = {}
+    for representation in _representations:
+        data = [(m["num_operations"], m["time"]) for m in measurements
+                if m["representation"] == representation]
+        if not data:
+            return None
+        flops, times = numpy.array(data, dtype=float).T
+
+        # Fit overhead and time per operation if the number of
+        # operations varies, otherwise only time per operation
+        if len(set(flops)) > 1:
+            A = numpy.vstack((numpy.ones(len(flops)), flops)).T
+            overhead, time_per_flop = numpy.linalg.lstsq(A, times, rcond=None)[0]
+        else:
+            overhead, time_per_flop = 0.0, -1.0
+        if overhead < 0.0 or time_per_flop <= 0.0:
+            overhead = 0.0
+            time_per_flop = times.sum() / max(flops.sum(), 1.0)
+        models[representation] = (float(overhead), float(time_per_flop))
+    return models
+
+def predict_times(flops, models=None):
+    """Predict run time of tabulate_tensor for each representation from
+    the estimated number of operations, using calibrated models if
+    given."""
+    times = {}
+    for (representation, num_operations) in flops.items():
+        if models is None:
+            times[representation] = num_operations*_default_time_per_flop
+        else:
+            overhead, time_per_flop = models[representation]
+            times[representation] = overhead + num_operations*time_per_flop
+    return times
+
+def select_representation(integral, function_replace_map, quadrature_degree,
+                          parameters):
+    """Select the representation of least measured (in autotune mode)
+    or predicted run time for integral, or return None if the integral
+    can not be represented in tensor representation. Without
+    calibrated models, the representation is selected by the estimated
+    cost of tensor representation."""
+
+    # Estimate number of operations for each representation
+    flops = estimate_flops(integral, function_replace_map,
+                           _num_points(integral, quadrature_degree))
+    if flops is None:
+        return None
+    debug("Estimated number of operations: " + str(flops))
+
+    # Measure run times in autotune mode, unless already measured
+    database = open_tuning_database(parameters)
+    if "autotune" in parameters:
+        key = _decision_key([integral], integral.integral_type(), parameters)
+        if database is not None:
+            representation = database.get_decision("representation", key)
+            if representation is not None:
+                return representation
+        measured = _measure_times(integral, parameters)
+        if measured is not None:
+            info("Measured run time of tabulate_tensor: " + str(measured))
+            times = measured
+
+            # Add measurements and decision to database
+            if database is not None:
+                for r in _representations:
+                    database.add_measurement({"representation": r,
+                                              "integral_type": integral.integral_type(),
+                                              "num_operations": flops[r],
+                                              "time": measured[r]})
+                database.add_decision("representation", key,
+                                      min(_representations, key=lambda r: times[r]))
+                database.save()
+
+            return min(_representations, key=lambda r: times[r])
+
+    # Use estimated cost of tensor representation without measurements
+    models = calibrate(database.measurements) if database else None
+    if models is None:
+        tensor_cost = estimate_cost(integral, function_replace_map)
+        debug("Estimated cost of tensor representation: " + str(tensor_cost))
+        if tensor_cost <= _max_tensor_cost:
+            return "tensor"
+        return "quadrature"
+
+    # Predict run times from calibrated models
+    times = predict_times(flops, models)
+    debug("Predicted run time of tabulate_tensor: " + str(times))
+
+    return min(_representations, key=lambda r: times[r])
+
+def autotune(kind, integrals, integral_type, variants, parameters):
+    """Compile the integrals with the parameters of each variant (a
+    list of pairs of name and parameters), time tabulate_tensor and
+    return the name of the fastest variant (the first in case of a
+    tie). The decision is remembered in the tuning database (if any)
+    by the given kind. Return None if the ufc_benchmark module is not
+    available."""
+
+    # Check for previous decision
+    database = open_tuning_database(parameters)
+    key = _decision_key(integrals, integral_type, parameters)
+    if database is not None:
+        name = database.get_decision(kind, key)
+        if name in [n for (n, p) in variants]:
+            return name
+
+    # Measure run time of each variant
+    if not _benchmark_available():
+        return None
+    from ufl import Form
+    form = Form(integrals)
+    times = [_benchmark_form(form, p) for (n, p) in variants]
+    info("Measured run time of tabulate_tensor: " + \
+         str(dict((n, t) for ((n, p), t) in zip(variants, times))))
+    name = variants[times.index(min(times))][0]
+
+    # Add decision to database
+    if database is not None:
+        database.add_decision(kind, key, name)
+        database.save()
+
+    return name
+
+def _num_points(integral, quadrature_degree):
+    "Return number of quadrature points for integral."
+    cell = integral.domain().cell()
+    if integral.integral_type() == "cell":
+        cellname = cell.cellname()
+    else:
+        cellname = cell.facet_cellname()
+    points, weights = create_quadrature(cellname, quadrature_degree, "default")
+    return len(weights)
+
+def _decision_key(integrals, integral_type, parameters):
+    """Return key for autotuning decisions of integrals. The key does
+    not depend on the tuning database holding the decisions."""
+    from ufl import Form
+    parameters = dict((key, value) for (key, value) in parameters.items()
+                      if not key in _ignored_parameters + ["tuning_database"])
+    signature = ";".join([Form(integrals).signature(),
+                          integral_type,
+                          _parameters_signature(parameters)])
+    return sha1(signature.encode("utf-8")).hexdigest()
+
+def _measure_times(integral, parameters):
+    """Compile integral in each representation and return the run time
+    of tabulate_tensor, or None if the ufc_benchmark module is not
+    available."""
+    if not _benchmark_available():
+        warning("Unable to import ufc_benchmark, selecting representation without autotuning.")
+        return None
+
+    # Import here to avoid circular imports (the JIT compiler calls
+    # the analysis)
+    from ufl import Form
+
+    times = {}
+    for representation in _representations:
+        p = parameters.copy()
+        p["representation"] = representation
+        del p["autotune"]
+        metadata = dict(integral.metadata() or {})
+        metadata["representation"] = representation
+        form = Form([integral.reconstruct(metadata=metadata)])
+        times[representation] = _benchmark_form(form, p)
+    return times
+
+def _benchmark_available():
+    "Check if the ufc_benchmark module is available."
+    try:
+        import ufc_benchmark
+    except ImportError:
+        return False
+    return True
+
+def _benchmark_form(form, parameters):
+    """Compile form and return the median run time of tabulate_tensor
+    (mean over integrals and facets)."""
+    import ufc_benchmark
+    from ffc.jitcompiler import jit
+    compiled_form, module, prefix = jit(form, parameters)
+    timings = ufc_benchmark.benchmark_forms([compiled_form], None,
+                                            _num_samples, _sample_time)[0]
+    return float(numpy.mean([t["median"] for t in timings]))
@@ -29,6 +29,7 @@ import re, numpy, platform
 
 # FFC modules
 from ffc.log import debug, error
+from ffc.profiling import profiled
 from six.moves import zip
 
 # Mapping of restrictions
@@ -57,6 +58,7 @@ format.update({
     "if":             lambda c, v: "if (%s)\n{\n%s\n}\n" % (c, v),
     "loop":           lambda i, j, k: "for (unsigned int %s = %s; %s < %s; %s++)"% (i, j, i, k, i),
     "generate loop":  lambda v, w, _indent=0: _generate_loop(v, w, _indent),
+    "generate simd loop": lambda v, w, _indent=0: _generate_loop(v, w, _indent, True),
     "is equal":       " == ",
     "not equal":      " != ",
     "less than":      " < ",
@@ -75,7 +77,9 @@ format.update({
     "float declaration":              "double",
     "int declaration":                "int",
     "uint declaration":               "unsigned int",
+    "size_t declaration":             "std::size_t",
     "static const uint declaration":  "static const unsigned int",
+    "static const size_t declaration": "static const std::size_t",
     "static const float declaration": "static const double",
     "vector table declaration":       "std::vector< std::vector<double> >",
     "double array declaration":       "double*",
@@ -131,7 +135,8 @@ format.update({
 
 # Formatting used in tabulate_tensor
 format.update({
-    "geometry tensor": lambda j, a: "G%d_%s" % (j, "_".join(["%d" % i for i in a]))
+    "geometry tensor": lambda j, a: "G%d_%s" % (j, "_".join(["%d" % i for i in a])),
+    "geometry tensor combination": lambda i: "GC%d" % i
 })
 
 # Geometry related variable names (from code snippets).
@@ -166,6 +171,8 @@ format.update({
     "argument basis num":         "i",
     "argument derivative order":  "n",
     "argument values":            "values",
+    "argument num points":        "num_points",
+    "argument points":            "points",
     "argument coordinates":       "dof_coordinates",
     "facet":                      lambda r: "facet%s" % _choose_map(r),
     "vertex":                     "vertex",
@@ -174,6 +181,7 @@ format.update({
     "argument entity":            "i",
     "member global dimension":    "_global_dimension",
     "argument dofs":              "dofs",
+    "argument offsets":           "offsets",
     "argument dof num":           "i",
     "argument dof values":        "dof_values",
     "argument vertex values":     "vertex_values",
@@ -209,6 +217,7 @@ format.update({
     "dmats old":                  "dmats_old",
     "reference derivatives":      "derivatives",
     "dof values":                 "dof_values",
+    "point values":               "point_values",
     "dof map if":                 lambda i,j: "%d <= %s && %s <= %d"\
                                   % (i, format["argument basis num"], format["argument basis num"], j),
     "dereference pointer":        lambda n: "*%s" % n,
@@ -226,6 +235,13 @@ format.update({
     "ip constant":          lambda i: "I[%d]" % i,
     "basis constant":       lambda i: "B[%d]" % i,
     "conditional":          lambda i: "C[%d]" % i,
+    "staged values":        lambda i: "SF%s" % i,
+    "staged tensor":        lambda i: "AF%s" % i,
+    "gemm":                 lambda m, n, k, a, b, c: "ufc_gemm_tn(%d, %d, %d, %s, %s, %s);" % (m, n, k, a, b, c),
+    "gemm include":         "#include <ufc_gemm.h>",
+    "heap array declaration": lambda n, size: "std::vector<double> %s(%d);" % (n, size),
+    "simd pragma":          "UFC_SIMD",
+    "aligned":              lambda n: "UFC_ALIGNED(%d)" % n,
     "evaluate conditional": lambda i,j,k: "(%s) ? %s : %s" % (i,j,k),
 #    "geometry constant":   lambda i: "G%d" % i,
 #    "ip constant":         lambda i: "I%d" % i,
@@ -287,6 +303,11 @@ format.update({
     "eval_basis":               eval_basis,
     "eval_basis_quad_offset":               eval_basis_quad_offset,
     "eval_basis_copy":          eval_basis_copy,
+    "eval_basis_points":        eval_basis_points,
+    "eval_basis_points_copy":   eval_basis_points_copy,
+    "eval_basis_workspace_check":   eval_basis_workspace_check,
+    "eval_basis_workspace_store":   eval_basis_workspace_store,
+    "eval_basis_workspace_members": eval_basis_workspace_members,
     "eval_derivs_decl":         eval_derivs_decl,
     "eval_derivs_init":         eval_derivs_init,
     "eval_derivs":              eval_derivs,
@@ -505,8 +526,9 @@ def _tabulate_tensor(vals):
     else:
         error("Not an N-dimensional array:\n%s" % tensor)
 
-def _generate_loop(lines, loop_vars, _indent):
-    "This function generates a loop over a vector or matrix."
+def _generate_loop(lines, loop_vars, _indent, simd=False):
+    """This function generates a loop over a vector or matrix. If simd
+    is True, the innermost loop is marked for vectorisation."""
 
     # Prefetch formats to speed up code generation.
     f_loop     = format["loop"]
@@ -521,6 +543,9 @@ def _generate_loop(lines, loop_vars, _indent):
     for ls in loop_vars:
         # Get index and lower and upper bounds.
         index, lower, upper = ls
+        # Mark innermost loop for vectorisation.
+        if simd and index == loop_vars[-1][0]:
+            code.append(indent(format["simd pragma"], _indent))
         # Loop index.
         code.append(indent(f_loop(index, lower, upper), _indent))
         code.append(indent(f_begin, _indent))
@@ -734,6 +759,7 @@ types = [["double"],
 # Special characters and delimiters
 special_characters = ["+", "-", "*", "/", "=", ".", " ", ";", "(", ")", "\\", "{", "}", "[","]", "!"]
 
+@profiled("remove_unused")
 def remove_unused(code, used_set=set()):
     """
     Remove unused variables from a given C++ code. This is useful when
@@ -118,6 +118,139 @@ def _evaluate_basis_all(data):
     # Generate code (no need to remove unused).
     return "\n".join(code)
 
+def _evaluate_basis_all_points(data):
+    """Like evaluate_basis_all, but evaluate all basis functions at a
+    block of points. The Jacobian is computed once for all points, the
+    basisvalues once per point for each group of dofs sharing an
+    expansion set and the values of the dofs in a group as the product
+    of a dense table of coefficients and the basisvalues. The values at
+    point ip start at values[ip*space_dimension*physical_value_size]."""
+
+    if isinstance(data, str):
+        return format["exception"]("evaluate_basis_all_points: %s" % data)
+
+    # Prefetch formats.
+    f_assign    = format["assign"]
+    f_comment   = format["comment"]
+    f_component = format["component"]
+    f_decl      = format["declaration"]
+    f_iadd      = format["iadd"]
+    f_mul       = format["mul"]
+    f_loop      = format["generate loop"]
+    f_r, f_s, f_t = format["free indices"][:3]
+    f_table     = format["static const float declaration"]
+    f_tensor    = format["tabulate tensor"]
+    f_coefficients = format["coefficients"]
+    f_basisvalues  = format["basisvalues"]
+    f_float     = format["floating point"]
+    f_ip        = format["integration points"]
+    f_num_points   = format["argument num points"]
+    f_points       = format["argument points"]
+    f_point_values = format["point values"]
+    f_values    = format["argument values"]
+
+    # Initialise return code.
+    code = []
+
+    # Get the element cell name and geometric dimension.
+    element_cellname = data["cellname"]
+    gdim = data["geometric_dimension"]
+    tdim = data["topological_dimension"]
+    physical_value_size = data["physical_value_size"]
+    value_size = data["space_dimension"]*physical_value_size
+
+    # Get code snippets for Jacobian and inverse of Jacobian, which are
+    # the same for all points.
+    code += [format["compute_jacobian"](tdim, gdim)]
+    code += [format["compute_jacobian_inverse"](tdim, gdim)]
+    if data["needs_oriented"]:
+        code += [format["orientation"](tdim, gdim)]
+
+    # Group consecutive dofs with the same number of components, offset
+    # and mapping, and collect the groups by expansion set such that the
+    # basisvalues are computed once for all groups sharing them.
+    groups = []
+    for dof, dof_data in enumerate(data["dof_data"]):
+        key = (dof_data["embedded_degree"], dof_data["num_expansion_members"],
+               dof_data["num_components"], dof_data["offset"], dof_data["mapping"])
+        if groups and groups[-1][0] == key:
+            groups[-1][1].append(dof)
+        else:
+            groups.append((key, [dof]))
+    expansion_sets = []
+    for g, (key, dofs) in enumerate(groups):
+        for (expansion_set, group_numbers) in expansion_sets:
+            if expansion_set == key[:2]:
+                group_numbers.append(g)
+                break
+        else:
+            expansion_sets.append((key[:2], [g]))
+
+    # Tabulate coefficients of each group as a dense matrix with a row
+    # for each component of each dof.
+    for g, (key, dofs) in enumerate(groups):
+        coefficients = [c for dof in dofs for c in data["dof_data"][dof]["coeffs"]]
+        name = f_component(f_coefficients(g), [len(coefficients), key[1]])
+        code += ["", f_comment("Table of coefficients for dofs %d to %d" % (dofs[0], dofs[-1]))]
+        code += [f_decl(f_table, name, format["new line"] + f_tensor(coefficients))]
+
+    # Get current point, map to the reference (FIAT) element and reset
+    # values.
+    lines = [f_comment("Get current point and values")]
+    lines += [f_decl("const double*", "x", "%s + %s*%d" % (f_points, f_ip, gdim))]
+    lines += [f_decl("double*", f_point_values, "%s + %s*%d" % (f_values, f_ip, value_size))]
+    lines += ["", format["fiat coordinate map"](element_cellname, gdim)]
+    lines += ["", f_comment("Reset values")]
+    lines += f_loop([f_assign(f_component(f_point_values, f_r), f_float(0.0))],
+                    [(f_r, 0, value_size)])
+
+    # Compute basisvalues for each expansion set and values for each
+    # group of dofs.
+    for (expansion_set, group_numbers) in expansion_sets:
+        block = _compute_basisvalues(data, data["dof_data"][groups[group_numbers[0]][1][0]])
+        for g in group_numbers:
+            key, dofs = groups[g]
+            embedded_degree, num_mem, num_components, offset, mapping = key
+
+            # Index of component i of dof number r in group.
+            def component(i, first=dofs[0], offset=offset):
+                terms = [f_r if physical_value_size == 1 else "%d*%s" % (physical_value_size, f_r)]
+                constant = physical_value_size*first + offset
+                if isinstance(i, int):
+                    constant += i
+                else:
+                    terms.append(i)
+                if constant:
+                    terms.append(format["int"](constant))
+                return f_component(f_point_values, " + ".join(terms))
+
+            block += ["", f_comment("Compute values of dofs %d to %d" % (dofs[0], dofs[-1]))]
+            if num_components == 1:
+                row = f_r
+                loop_vars = [(f_r, 0, len(dofs)), (f_t, 0, num_mem)]
+                value = component(0)
+            else:
+                row = "%d*%s + %s" % (num_components, f_r, f_s)
+                loop_vars = [(f_r, 0, len(dofs)), (f_s, 0, num_components), (f_t, 0, num_mem)]
+                value = component(f_s)
+            product = f_mul([f_component(f_coefficients(g), [row, f_t]),
+                             f_component(f_basisvalues, f_t)])
+            block += f_loop([f_iadd(value, product)], loop_vars)
+
+            # Apply transformation if applicable.
+            mapping_code = _map_values(data, mapping, num_components, component)
+            if mapping_code:
+                block += f_loop(mapping_code, [(f_r, 0, len(dofs))])
+
+        lines += ["", format["block begin"], indent(remove_unused("\n".join(block)), 2),
+                  format["block end"]]
+
+    code += ["", f_comment("Loop points and compute values of all basis functions")]
+    code += f_loop(lines, [(f_ip, 0, f_num_points)])
+
+    # Remove unused variables (from transformations and mappings) in code.
+    return remove_unused("\n".join(code))
+
 # From FIAT_NEW.polynomial_set.tabulate()
 def _evaluate_basis(data):
     """Generate run time code to evaluate an element basisfunction at an
@@ -283,13 +416,38 @@ def _compute_values(data, dof_data):
     code += f_loop(lines, loop_vars)
 
     # Apply transformation if applicable.
-    mapping = dof_data["mapping"]
+    code += _map_values(data, dof_data["mapping"], num_components,
+                        lambda i: f_component(f_values, i + offset))
+
+    return code
+
+def _map_values(data, mapping, num_components, component):
+    """Generate code to apply the mapping of a basis function to its
+    values on the reference element. The function component gives
+    the name of component i of the values."""
+
+    # Prefetch formats to speed up code generation.
+    f_comment       = format["comment"]
+    f_detJ          = format["det(J)"]
+    f_inv           = format["inverse"]
+    f_mul           = format["mul"]
+    f_group         = format["grouping"]
+    f_tmp_ref       = format["tmp ref value"]
+    f_assign        = format["assign"]
+    f_const_float   = format["const float declaration"]
+    f_trans         = format["transform"]
+    f_inner         = format["inner product"]
+
+    tdim = data["topological_dimension"]
+    gdim = data["geometric_dimension"]
+
+    code = []
     if mapping == "affine":
         pass
     elif mapping == "contravariant piola":
         code += ["", f_comment("Using contravariant Piola transform to map values back to the physical element")]
         # Get temporary values before mapping.
-        code += [f_const_float(f_tmp_ref(i), f_component(f_values, i + offset))\
+        code += [f_const_float(f_tmp_ref(i), component(i))\
                   for i in range(num_components)]
         # Create names for inner product.
         basis_col = [f_tmp_ref(j) for j in range(tdim)]
@@ -300,12 +458,12 @@ def _compute_values(data, dof_data):
             # Create inner product and multiply by inverse of Jacobian.
             inner = f_group(f_inner(jacobian_row, basis_col))
             value = f_mul([f_inv(f_detJ(None)), inner])
-            name = f_component(f_values, i + offset)
+            name = component(i)
             code += [f_assign(name, value)]
     elif mapping == "covariant piola":
         code += ["", f_comment("Using covariant Piola transform to map values back to the physical element")]
         # Get temporary values before mapping.
-        code += [f_const_float(f_tmp_ref(i), f_component(f_values, i + offset))\
+        code += [f_const_float(f_tmp_ref(i), component(i))\
                   for i in range(num_components)]
         # Create names for inner product.
         tdim = data["topological_dimension"]
@@ -317,7 +475,7 @@ def _compute_values(data, dof_data):
 
             # Create inner product of basis values and inverse of Jacobian.
             value = f_group(f_inner(inv_jacobian_column, basis_col))
-            name = f_component(f_values, i + offset)
+            name = component(i)
             code += [f_assign(name, value)]
     else:
         error("Unknown mapping: %s" % mapping)
@@ -20,7 +20,11 @@
 # Modified by Martin Alnaes, 2013
 
 # Python modules
+import os
+import numpy
 from numpy import array
+from hashlib import sha1
+from collections import OrderedDict
 import six
 
 # UFL and FIAT modules
@@ -30,6 +34,9 @@ import FIAT
 
 # FFC modules
 from ffc.log import debug, error, ffc_assert
+from ffc.constants import FFC_VERSION
+from ffc.cache import CodeCache
+from ffc.utils import LRUCache
 from ffc.quadratureelement import QuadratureElement as FFCQuadratureElement
 
 from ffc.mixedelement import MixedElement
@@ -58,6 +65,18 @@ supported_families = ("Brezzi-Douglas-Marini",
 # Cache for computed elements
 _cache = {}
 
+# Cache for quadrature rules and for points mapped to facets, bounded
+# by the size of the tabulation cache
+_quadrature_cache = LRUCache(256*1024**2)
+_facet_points_cache = LRUCache(256*1024**2)
+
+# Cache for tabulated elements, bounded by the total size of the tables,
+# with an optional on-disk tier shared between compilations
+_tabulation_cache = OrderedDict()
+_tabulation_cache_bytes = 0
+_tabulation_cache_max_bytes = 256*1024**2
+_tabulation_disk_cache = None
+
 def reference_cell(dim):
     if isinstance(dim, int):
         return FIAT.ufc_simplex(dim)
@@ -168,10 +187,85 @@ def _create_fiat_element(ufl_element):
 
     return element
 
+def set_tabulation_cache_parameters(parameters):
+    """Set size and on-disk directory of tabulation cache from
+    parameters. The size also bounds the caches of quadrature rules and
+    of points mapped to facets."""
+    global _tabulation_cache_max_bytes, _tabulation_disk_cache
+    _tabulation_cache_max_bytes = int(float(parameters["tabulation_cache_size"])*1024**2)
+    _evict_tabulations()
+
+    # Import here to avoid circular import
+    from ffc import quadrature_schemes
+    for cache in (_quadrature_cache, _facet_points_cache, quadrature_schemes._cache):
+        cache.max_bytes = _tabulation_cache_max_bytes
+        cache.evict()
+
+    cache_dir = parameters["tabulation_cache_dir"]
+    if not cache_dir:
+        _tabulation_disk_cache = None
+    elif _tabulation_disk_cache is None or \
+         _tabulation_disk_cache.cache_dir != os.path.expanduser(cache_dir):
+        _tabulation_disk_cache = CodeCache(os.path.expanduser(cache_dir),
+                                           _tabulation_cache_max_bytes)
+
+def tabulate_element(ufl_element, order, points):
+    """Tabulate the FIAT element corresponding to given UFL element and
+    its derivatives up to given order in given points, reusing previous
+    tabulations of the same element, order and points. The entity of a
+    facet or vertex integral is determined by the (mapped) points. The
+    returned table is a copy and may be modified by the caller."""
+
+    # Compute key from element signature, order and points
+    points = numpy.asarray(points, dtype=float)
+    key = sha1(";".join([ufl_element.reconstruction_signature(),
+                         str(order),
+                         str(points.shape),
+                         sha1(points.tobytes()).hexdigest(),
+                         str(FFC_VERSION),
+                         str(getattr(FIAT, "__version__", ""))]).encode("utf-8")).hexdigest()
+
+    # Look in memory, then on disk, and tabulate if not found
+    table = _tabulation_cache.get(key)
+    if table is None and _tabulation_disk_cache is not None:
+        table = _tabulation_disk_cache.get(key)
+    if table is None:
+        table = create_element(ufl_element).tabulate(order, points)
+        if _tabulation_disk_cache is not None:
+            _tabulation_disk_cache.put(key, table)
+    else:
+        debug("Reusing tabulated element from cache")
+
+    # Store as most recently used
+    _store_tabulation(key, table)
+
+    return dict((derivs, numpy.array(values)) for (derivs, values) in six.iteritems(table))
+
+def _store_tabulation(key, table):
+    "Store table in memory as most recently used and evict old tables."
+    global _tabulation_cache_bytes
+    if key in _tabulation_cache:
+        _tabulation_cache_bytes -= _table_bytes(_tabulation_cache.pop(key))
+    _tabulation_cache[key] = table
+    _tabulation_cache_bytes += _table_bytes(table)
+    _evict_tabulations()
+
+def _evict_tabulations():
+    "Remove least recently used tables until cache fits max size."
+    global _tabulation_cache_bytes
+    while _tabulation_cache and _tabulation_cache_bytes > _tabulation_cache_max_bytes:
+        key, table = _tabulation_cache.popitem(last=False)
+        _tabulation_cache_bytes -= _table_bytes(table)
+
+def _table_bytes(table):
+    "Return size of table in bytes."
+    return sum(numpy.asarray(values).nbytes for values in table.values())
+
 def create_quadrature(shape, num_points):
     """
     Generate quadrature rule (points, weights) for given shape with
-    num_points points in each direction.
+    num_points points in each direction. The rule is computed once
+    and returned as read-only arrays.
     """
 
     if isinstance(shape, int) and shape == 0:
@@ -180,8 +274,18 @@ def create_quadrature(shape, num_points):
     if shape in cellname2dim and cellname2dim[shape] == 0:
         return ([()], array([1.0,]))
 
+    # Check cache
+    key = (shape, num_points)
+    rule = _quadrature_cache.get(key)
+    if rule is not None:
+        return rule
+
     quad_rule = FIAT.make_quadrature(reference_cell(shape), num_points)
-    return quad_rule.get_points(), quad_rule.get_weights()
+    points = _read_only(quad_rule.get_points())
+    weights = _read_only(quad_rule.get_weights())
+    _quadrature_cache.put(key, (points, weights))
+
+    return (points, weights)
 
 def map_facet_points(points, facet):
     """
@@ -190,14 +294,31 @@ def map_facet_points(points, facet):
     This may be used to transform points tabulated for example on the
     2D reference triangle to points on a given facet of the reference
     tetrahedron.
+
+    The points are mapped to all facets at once and the mapped points
+    are cached, so that calls for the remaining facets are lookups.
+    The mapped points are returned as a read-only array.
     """
 
+    # Check cache
+    points = numpy.asarray(points, dtype=float)
+    key = (points.shape, points.tobytes())
+    mapped_points = _facet_points_cache.get(key)
+    if mapped_points is None:
+        mapped_points = _map_points_to_facets(points)
+        _facet_points_cache.put(key, mapped_points)
+
+    return mapped_points[facet]
+
+def _map_points_to_facets(points):
+    "Map points to each facet of the reference simplex of one dimension higher."
+
     # Extract the geometric dimension of the points we want to map
-    dim = len(points[0]) + 1
+    dim = points.shape[1] + 1
 
     # Special case, don't need to map coordinates on vertices
     if dim == 1:
-        return [[(0.0,), (1.0,)][facet]]
+        return (_read_only([(0.0,)]), _read_only([(1.0,)]))
 
     # Get the FIAT reference cell for this dimension
     fiat_cell = reference_cell(dim)
@@ -217,15 +338,22 @@ def map_facet_points(points, facet):
     #    {2: ((1, 2), (0, 2), (0, 1)),
     #     3: ((1, 2, 3), (0, 2, 3), (0, 1, 3), (0, 1, 2))}
 
+    # Barycentric coordinates of the points
+    w = numpy.hstack((1.0 - points.sum(axis=1)[:, numpy.newaxis], points))
+
     # Compute coordinates and map the points
-    coordinates = [vertex_coordinates[v] for v in facet_vertices[facet]]
-    new_points = []
-    for point in points:
-        w = (1.0 - sum(point),) + tuple(point)
-        x = tuple(sum([w[i]*array(coordinates[i]) for i in range(len(w))]))
-        new_points += [x]
-
-    return new_points
+    mapped_points = []
+    for facet in sorted(facet_vertices):
+        coordinates = array([vertex_coordinates[v] for v in facet_vertices[facet]])
+        mapped_points.append(_read_only(numpy.dot(w, coordinates)))
+
+    return tuple(mapped_points)
+
+def _read_only(values):
+    "Return values as read-only array of floats."
+    values = numpy.array(values, dtype=float)
+    values.setflags(write=False)
+    return values
 
 def _extract_elements(ufl_element, domain=None):
     "Recursively extract un-nested list of (component) elements."
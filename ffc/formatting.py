@@ -37,7 +37,9 @@ from ffc.log import info, error, begin, end, dstr
 from ffc.constants import FFC_VERSION, UFC_VERSION
 from ffc.cpp import format
 from ffc.backends.ufc import templates
+from ffc.profiling import profiled
 
+@profiled("stage 5: formatting")
 def format_code(code, wrapper_code, prefix, parameters):
     "Format given code in UFC format."
 
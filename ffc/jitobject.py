@@ -18,6 +18,7 @@
 # Modified by Martin Alnaes, 2013
 
 # Python modules.
+import os
 from hashlib import sha1
 
 # UFL modules.
@@ -104,4 +105,19 @@ def _parameters_signature(parameters):
     for ignore in ignores:
         if ignore in parameters:
             del parameters[ignore]
+
+    # The generated code depends on the contents of the tuning
+    # database (the calibrated cost model and autotuning decisions)
+    if parameters.get("tuning_database"):
+        parameters["tuning_database"] = \
+            _file_signature(parameters["tuning_database"])
+
     return str(canonicalize_metadata(parameters))
+
+def _file_signature(filename):
+    "Return signature of the contents of file (empty if not found)."
+    try:
+        with open(os.path.expanduser(filename), "rb") as f:
+            return sha1(f.read()).hexdigest()
+    except (IOError, OSError):
+        return ""
@@ -31,7 +31,9 @@ representation.
 # FFC modules
 from ffc.log import info, begin, end
 from ffc.representation import pick_representation
+from ffc.profiling import profiled, profile_section
 
+@profiled("stage 3: optimization", count_objects=True)
 def optimize_ir(ir, parameters):
     "Optimize intermediate form representation."
 
@@ -60,6 +62,11 @@ def _optimize_integral_ir(ir, parameters):
     r = pick_representation(ir["representation"])
 
     # Optimize representation
-    oir = r.optimize_integral_ir(ir, parameters)
+    with profile_section("optimize_integral_ir",
+                         form=ir["form_id"],
+                         integral_type=ir["integral_type"],
+                         subdomain_id=ir["subdomain_id"],
+                         representation=ir["representation"]):
+        oir = r.optimize_integral_ir(ir, parameters)
 
     return oir
@@ -47,10 +47,35 @@ FFC_PARAMETERS = {
   "cpp_optimize_flags":             "-O2",   # optimization flags for the JIT compiler
   "optimize":                       False,   # optimise the code generation
   "restrict_keyword":               "",      # compiler specific "__restrict" or "__restrict__" keyword
+  "simd_width":                     0,       # vector width in doubles for aligned
+                                             # and padded tables and vectorised
+                                             # loops in quadrature code (disabled
+                                             # if 0)
   "log_level":                      INFO,    # log level, displaying only
                                              # messages with level >= log_level
   "log_prefix":                     "",      # log prefix
   "error_control":                  False,   # with error control
+  "profile":                        False,   # write profiling report
+  "compile_cache_dir":              "",      # cache dir for generated code,
+                                             # disabled if empty
+  "compile_cache_size":             256,     # maximum size of compile cache
+                                             # in megabytes
+  "num_processes":                  1,       # number of processes used for
+                                             # generating code for integrals
+  "tabulation_cache_size":          256,     # maximum size of in-memory caches
+                                             # of tabulated elements, quadrature
+                                             # rules and facet points in megabytes
+  "tabulation_cache_dir":           "",      # cache dir for tabulated elements,
+                                             # disabled if empty
+  "assembly_driver":                False,   # generate OpenMP assembly drivers
+                                             # for forms (see ufc_assembly.h)
+  "dof_table_threshold":            512,     # generate table-driven tabulate_dofs
+                                             # for local dimensions of at least
+                                             # this size (disabled if 0)
+  "tuning_database":                "",      # JSON file of measured run times
+                                             # for the cost model selecting
+                                             # representations and of autotuning
+                                             # decisions, disabled if empty
 }
 
 def default_parameters():
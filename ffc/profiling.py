@@ -0,0 +1,221 @@
+"""This module provides instrumentation of the compiler. When profiling
+is turned on (parameter 'profile' or the --profile flag), each compiler
+stage and each integral is recorded as a section, together with the
+time spent in FIAT tabulation, symbolic optimisation and removal of
+unused variables. Sections are labelled by form, integral type and
+quadrature degree. Nested sections inherit the labels of their
+enclosing sections. The collected report may be written as JSON.
+
+The memory used by each section is recorded as the increase of the
+peak resident memory of the process during the section, which is zero
+for sections that stay below an earlier peak. If the tracemalloc
+module is tracing (for example with PYTHONTRACEMALLOC=1), the peak of
+memory allocated by Python within each section is also recorded."""
+
+# Copyright (C) 2014 The FFC authors
+#
+# This file is part of FFC.
+#
+# FFC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# FFC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with FFC. If not, see <http://www.gnu.org/licenses/>.
+
+__all__ = ["ProfilingReport", "start_profiling", "stop_profiling",
+           "profile_section", "profile_record", "profiled"]
+
+# Python modules
+import gc
+import sys
+import json
+import functools
+from time import time
+from contextlib import contextmanager
+
+# The resource module is only available on Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# The tracemalloc module is only available for Python >= 3.4, and
+# resetting its peak for Python >= 3.9
+try:
+    import tracemalloc
+    tracemalloc.reset_peak
+except (ImportError, AttributeError):
+    tracemalloc = None
+
+# FFC modules
+from ffc.constants import FFC_VERSION
+
+# Labels used for grouping in the report summary
+_summary_labels = ["form", "integral_type", "quadrature_degree", "representation"]
+
+# The currently active report, if any
+_active_report = None
+
+def _peak_rss():
+    "Return peak resident memory of the process in megabytes."
+    if resource is None:
+        return None
+    # Note: ru_maxrss is given in bytes on Mac OS X and kilobytes otherwise
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return maxrss / 1048576.0
+    return maxrss / 1024.0
+
+def _tracing():
+    "Check if memory allocated by Python is traced."
+    return tracemalloc is not None and tracemalloc.is_tracing()
+
+class ProfilingReport:
+    "A list of timed and labelled compiler sections."
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self.sections = []
+        self._stack = []
+
+    def begin(self, name, labels, count_objects=False):
+        "Begin new section with given name and labels."
+        inherited = dict(self._stack[-1]["labels"]) if self._stack else {}
+        inherited.update(labels)
+        section = {"name": name,
+                   "labels": inherited,
+                   "own_labels": sorted(labels.keys()),
+                   "depth": len(self._stack)}
+        if count_objects:
+            section["num_objects_before"] = len(gc.get_objects())
+        section["_peak_rss"] = _peak_rss()
+        if _tracing():
+            current = self._update_python_peaks()
+            section["_python_memory"] = current
+            section["_python_peak"] = current
+        self.sections.append(section)
+        self._stack.append(section)
+        section["_start"] = time()
+
+    def end(self):
+        "End the current section."
+        section = self._stack[-1]
+        section["time"] = time() - section.pop("_start")
+        if "_python_peak" in section:
+            self._update_python_peaks()
+            section["python_peak_increase"] = (section.pop("_python_peak") -
+                                             section.pop("_python_memory")) / 1048576.0
+        self._stack.pop()
+        peak_rss = _peak_rss()
+        start_rss = section.pop("_peak_rss")
+        section["peak_rss_increase"] = None if peak_rss is None else peak_rss - start_rss
+        if "num_objects_before" in section:
+            section["num_objects"] = len(gc.get_objects())
+
+    def _update_python_peaks(self):
+        """Update the peak of memory allocated by Python for all open
+        sections, reset the peak and return the current memory."""
+        current, peak = tracemalloc.get_traced_memory()
+        for section in self._stack:
+            if "_python_peak" in section:
+                section["_python_peak"] = max(section["_python_peak"], peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def summary(self):
+        """Return total times and counts grouped by section name and by
+        each of the labels form, integral type, quadrature degree and
+        representation. A section is only counted for a label if the
+        label was set by the section itself, not inherited."""
+        by_name = {}
+        for section in self.sections:
+            entry = by_name.setdefault(section["name"], {"count": 0, "time": 0.0})
+            entry["count"] += 1
+            entry["time"] += section["time"]
+
+        summary = {"sections": by_name}
+        for label in _summary_labels:
+            groups = {}
+            for section in self.sections:
+                if label not in section["own_labels"]:
+                    continue
+                key = "%s/%s" % (str(section["labels"][label]), section["name"])
+                entry = groups.setdefault(key, {"count": 0, "time": 0.0})
+                entry["count"] += 1
+                entry["time"] += section["time"]
+            summary[label] = groups
+
+        return summary
+
+    def to_dict(self):
+        "Return report as a dictionary suitable for JSON output."
+        sections = []
+        for section in self.sections:
+            section = dict(section)
+            del section["own_labels"]
+            sections.append(section)
+        return {"ffc_version": FFC_VERSION,
+                "prefix": self.prefix,
+                "sections": sections,
+                "summary": self.summary()}
+
+    def write(self, filename):
+        "Write report to file in JSON format."
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=1, sort_keys=True,
+                      default=str)
+
+def start_profiling(prefix=""):
+    "Start collecting a new profiling report."
+    global _active_report
+    _active_report = ProfilingReport(prefix)
+    return _active_report
+
+def stop_profiling():
+    "Stop collecting and return the profiling report."
+    global _active_report
+    report = _active_report
+    _active_report = None
+    return report
+
+@contextmanager
+def profile_section(name, count_objects=False, **labels):
+    """Record the enclosed code as a section with given name and
+    labels. This does nothing unless profiling has been started."""
+    report = _active_report
+    if report is None:
+        yield
+        return
+    report.begin(name, labels, count_objects)
+    try:
+        yield
+    finally:
+        report.end()
+
+def profile_record(**values):
+    """Record values (such as operation counts) in the innermost
+    section of the active report. This does nothing unless profiling
+    has been started."""
+    report = _active_report
+    if report is None or not report._stack:
+        return
+    report._stack[-1].setdefault("values", {}).update(values)
+
+def profiled(name, count_objects=False):
+    "Decorator recording each call of the function as a section."
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _active_report is None:
+                return function(*args, **kwargs)
+            with profile_section(name, count_objects):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -21,7 +21,24 @@
 # Modified by Martin Alnaes 2013-2014
 
 # FFC modules
-from ffc.log import warning
+from ffc.log import info, warning
+from ffc.costmodel import autotune
+
+# Flags selecting the optimisations of -O
+_optimise_flags = ("eliminate_zeros", "simplify_expressions",
+                   "precompute_ip_const", "precompute_basis_const",
+                   "sum_factorization")
+
+# Combinations of flags timed in autotune mode (the first is the default)
+_optimise_variants = (("eliminate_zeros", "simplify_expressions"),
+                      ("simplify_expressions",),
+                      ("eliminate_zeros",),
+                      ("precompute_ip_const",),
+                      ("eliminate_zeros", "precompute_ip_const"),
+                      ("precompute_basis_const",),
+                      ("eliminate_zeros", "precompute_basis_const"),
+                      ("sum_factorization",),
+                      ("eliminate_zeros", "sum_factorization"))
 
 def parse_optimise_parameters(parameters, itg_data):
 
@@ -37,6 +54,11 @@ def parse_optimise_parameters(parameters, itg_data):
     if parameters["optimize"] and itg_data.integral_type == "custom":
         warning("Optimization not available for custom integrals, skipping optimization.")
     elif parameters["optimize"]:
+
+        # In autotune mode, use the flags of the fastest variant
+        if "autotune" in parameters and not "blas" in parameters:
+            parameters = _autotune_optimise_parameters(parameters, itg_data)
+
         optimise_parameters["ignore ones"]        = True
         optimise_parameters["remove zero terms"]  = True
         optimise_parameters["ignore zero tables"] = True
@@ -53,6 +75,8 @@ def parse_optimise_parameters(parameters, itg_data):
             optimise_parameters["optimisation"] = "precompute_ip_const"
         elif "precompute_basis_const" in parameters:
             optimise_parameters["optimisation"] = "precompute_basis_const"
+        elif "sum_factorization" in parameters:
+            optimise_parameters["optimisation"] = "sum_factorization"
         # The current default optimisation (for -O) is equal to
         # '-feliminate_zeros -fsimplify_expressions'.
         else:
@@ -62,4 +86,39 @@ def parse_optimise_parameters(parameters, itg_data):
                 optimise_parameters["eliminate zeros"] = True
                 optimise_parameters["optimisation"]    = "simplify_expressions"
 
+    # BLAS mode computes the element tensors of bilinear forms by matrix
+    # products, which requires simplified expressions. It implies the
+    # basic optimisations of -O.
+    if "blas" in parameters and itg_data.integral_type == "custom":
+        warning("BLAS mode not available for custom integrals, ignoring option 'blas'.")
+    elif "blas" in parameters:
+        optimise_parameters["ignore ones"]        = True
+        optimise_parameters["remove zero terms"]  = True
+        optimise_parameters["ignore zero tables"] = True
+        optimise_parameters["optimisation"]       = "blas"
+
     return optimise_parameters
+
+def _autotune_optimise_parameters(parameters, itg_data):
+    """Compile and time the integrals with each variant of the
+    optimisations and return the parameters of the fastest, or the
+    given parameters if the ufc_benchmark module is not available."""
+
+    # Parameters of each variant, replacing any flags given
+    base = dict((key, value) for (key, value) in parameters.items()
+                if not key in _optimise_flags + ("autotune",))
+    base["representation"] = "quadrature"
+    variants = []
+    for flags in _optimise_variants:
+        p = base.copy()
+        for flag in flags:
+            p[flag] = True
+        variants.append((",".join(flags), p))
+
+    name = autotune("optimise_parameters", itg_data.integrals,
+                    itg_data.integral_type, variants, parameters)
+    if name is None:
+        warning("Unable to import ufc_benchmark, skipping autotuning of optimisations.")
+        return parameters
+    info("Selected optimisations: " + name)
+    return dict(variants)[name]
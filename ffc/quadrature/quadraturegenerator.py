@@ -32,12 +32,14 @@ from ufl.utils.derivativetuples import compute_derivative_tuples
 
 # FFC modules
 from ffc.log import info, debug, ffc_assert, error, warning
-from ffc.cpp import format, remove_unused
+from ffc.cpp import format, remove_unused, indent
 
 from ffc.representationutils import initialize_integral_code
+from ffc.profiling import profile_record
 
 # Utility and optimization functions for quadraturegenerator
 from .symbolics import generate_aux_constants
+from .sumfactorization import stage_entry, gemm_entry
 
 def generate_integral_code(ir, prefix, parameters):
     "Generate code for integral from intermediate representation."
@@ -48,7 +50,10 @@ def generate_integral_code(ir, prefix, parameters):
     # Generate code
     code = initialize_integral_code(ir, prefix, parameters)
     code["num_cells"] = ret(ir["num_cells"])
-    code["tabulate_tensor"] = _tabulate_tensor(ir, prefix, parameters)
+    tabulate_tensor, members, initializer_list = _tabulate_tensor(ir, prefix, parameters)
+    code["tabulate_tensor"] = tabulate_tensor
+    code["members"] = members
+    code["initializer_list"] = initializer_list
     code["additional_includes_set"] = ir["additional_includes_set"]
 
     return code
@@ -83,13 +88,15 @@ def _tabulate_tensor(ir, prefix, parameters):
     element_data  = ir["element_data"]
     num_cells     = ir["num_cells"]
     special       = ir["special"]
+    simd_width    = int(parameters["simd_width"])
 
     # Create sets of used variables
     used_weights    = set()
     used_psi_tables = set()
     used_nzcs       = set()
     trans_set       = set()
-    sets = [used_weights, used_psi_tables, used_nzcs, trans_set]
+    used_includes   = set()
+    sets = [used_weights, used_psi_tables, used_nzcs, trans_set, used_includes]
 
     affine_tables = {} # TODO: This is not populated anywhere, remove?
     quadrature_weights = ir["quadrature_weights"]
@@ -101,7 +108,8 @@ def _tabulate_tensor(ir, prefix, parameters):
         tensor_code, mem_code, num_ops = _generate_element_tensor(integrals,
                                                                   sets,
                                                                   opt_par,
-                                                                  gdim)
+                                                                  gdim,
+                                                                  simd_width=simd_width)
         tensor_code = "\n".join(tensor_code)
 
         # Set operations equal to num_ops (for printing info on operations).
@@ -127,7 +135,8 @@ def _tabulate_tensor(ir, prefix, parameters):
         cases = [None for i in range(num_facets)]
         for i in range(num_facets):
             # Update transformer with facets and generate case code + set of used geometry terms.
-            c, mem_code, ops = _generate_element_tensor(integrals[i], sets, opt_par, gdim)
+            c, mem_code, ops = _generate_element_tensor(integrals[i], sets, opt_par, gdim,
+                                                        simd_width=simd_width)
             case = [f_comment("Total number of operations to compute element tensor (from this point): %d" % ops)]
             case += c
             cases[i] = "\n".join(case)
@@ -170,7 +179,8 @@ def _tabulate_tensor(ir, prefix, parameters):
                 c, mem_code, ops = _generate_element_tensor(integrals[i][j],
                                                             sets,
                                                             opt_par,
-                                                            gdim)
+                                                            gdim,
+                                                            simd_width=simd_width)
                 case = [f_comment("Total number of operations to compute element tensor (from this point): %d" % ops)]
                 case += c
                 cases[i][j] = "\n".join(case)
@@ -211,7 +221,8 @@ def _tabulate_tensor(ir, prefix, parameters):
             c, mem_code, ops = _generate_element_tensor(integrals[i],
                                                         sets,
                                                         opt_par,
-                                                        gdim)
+                                                        gdim,
+                                                        simd_width=simd_width)
             case = [f_comment("Total number of operations to compute element tensor (from this point): %d" % ops)]
             case += c
             cases[i] = "\n".join(case)
@@ -253,7 +264,8 @@ def _tabulate_tensor(ir, prefix, parameters):
                                                                   sets,
                                                                   opt_par,
                                                                   gdim,
-                                                                  generate_custom_facet_normal)
+                                                                  generate_custom_facet_normal,
+                                                                  simd_width)
 
         tensor_code = "\n".join(tensor_code)
 
@@ -290,10 +302,17 @@ def _tabulate_tensor(ir, prefix, parameters):
     # the unused transformations.
     common = [remove_unused(jacobi_code, trans_set)]
 
+    # Add includes needed by the element tensor code (BLAS mode).
+    ir["additional_includes_set"].update(used_includes)
+
     # FIXME: After introduction of custom integrals, the common code
     # here is not really common anymore. Think about how to
     # restructure this function.
 
+    # Members of the integral class (workspace for custom integrals)
+    members = ""
+    initializer_list = ""
+
     # Add common code except for custom integrals
     if integral_type != "custom":
         common += _tabulate_weights([quadrature_weights[p] for p in sorted(used_weights)])
@@ -302,17 +321,22 @@ def _tabulate_tensor(ir, prefix, parameters):
         name_map = ir["name_map"]
         tables = ir["unique_tables"]
         tables.update(affine_tables) # TODO: This is not populated anywhere, remove?
-        common += _tabulate_psis(tables, used_psi_tables, name_map, used_nzcs, opt_par, integral_type, gdim)
+        common += _tabulate_psis(tables, used_psi_tables, name_map, used_nzcs, opt_par, integral_type, gdim,
+                                 simd_width)
 
     # Add special tabulation code for custom integral
     else:
-        common += _evaluate_basis_at_quadrature_points(used_psi_tables,
-                                                       gdim,
-                                                       element_data,
-                                                       prefix,
-                                                       num_vertices,
-                                                       num_cells,
-                                                       special=="contact")
+        tabulation_code, members, initializer_list = \
+            _evaluate_basis_at_quadrature_points(used_psi_tables,
+                                                 gdim,
+                                                 element_data,
+                                                 prefix,
+                                                 num_vertices,
+                                                 num_cells,
+                                                 special=="contact")
+        common += tabulation_code
+        if members:
+            ir["additional_includes_set"].add("#include <algorithm>")
 
     # Reset the element tensor (array 'A' given as argument to tabulate_tensor() by assembler)
     # Handle functionals.
@@ -347,9 +371,22 @@ def _tabulate_tensor(ir, prefix, parameters):
         if isinstance(ops[-1], int):
             ops[-1] += geo_ops
 
-    return "\n".join(common) + "\n" + tensor_code
+    # Record operation counts for benchmarks: one count for cell and
+    # custom integrals, one per facet (vertex) for exterior facet
+    # (point) integrals and one per pair of facets for interior facets
+    if integral_type in ("cell", "custom"):
+        num_operations = operations[0][-1]
+    elif integral_type == "interior_facet":
+        num_operations = [[ops[-1] for ops in operations[i*num_facets:(i + 1)*num_facets]]
+                          for i in range(num_facets)]
+    else:
+        num_operations = [ops[-1] for ops in operations]
+    profile_record(num_operations=num_operations)
+
+    return ("\n".join(common) + "\n" + tensor_code, members, initializer_list)
 
-def _generate_element_tensor(integrals, sets, optimise_parameters, gdim, generate_custom_facet_normal=False):
+def _generate_element_tensor(integrals, sets, optimise_parameters, gdim, generate_custom_facet_normal=False,
+                             simd_width=0):
     "Construct quadrature code for element tensors."
 
     # Prefetch formats to speed up code generation.
@@ -430,13 +467,14 @@ def _generate_element_tensor(integrals, sets, optimise_parameters, gdim, generat
             ip_code += ip_const_code
 
         # Generate code to evaluate the element tensor.
-        integral_code, ops = _generate_integral_code(points, terms, sets, optimise_parameters)
+        integral_code, ops, (gemm_decl, gemm_ops, gemm_code) = \
+            _generate_integral_code(points, terms, sets, optimise_parameters, simd_width)
         num_ops += ops
         if points is None:
             quadrature_ops = "unknown"
             tensor_ops_count = "unknown"
         else:
-            quadrature_ops = num_ops*points
+            quadrature_ops = num_ops*points + gemm_ops
             tensor_ops_count += quadrature_ops
         ip_code += integral_code
         element_code.append(f_comment\
@@ -449,6 +487,9 @@ def _generate_element_tensor(integrals, sets, optimise_parameters, gdim, generat
                     ip_code = [format["facet_normal_custom"](gdim)] + ip_code
                     break
 
+        # Declare arrays for matrix products over IPs (BLAS mode).
+        element_code += gemm_decl
+
         # Loop code over all IPs.
         if points == 0:
             element_code.append(f_comment("Only 1 integration point, omitting IP loop."))
@@ -459,6 +500,11 @@ def _generate_element_tensor(integrals, sets, optimise_parameters, gdim, generat
         else:
             element_code += f_loop(ip_code, [(f_ip, 0, points)])
 
+        # Compute element tensor by matrix products over IPs (BLAS mode).
+        if gemm_code:
+            element_code += ["", f_comment("Number of operations for matrix products: %d" % gemm_ops)]
+            element_code += gemm_code
+
     return (element_code, members_code, tensor_ops_count)
 
 def _generate_functions(functions, sets):
@@ -524,8 +570,10 @@ def _generate_functions(functions, sets):
 
     return code, total_ops
 
-def _generate_integral_code(points, terms, sets, optimise_parameters):
-    "Generate code to evaluate the element tensor."
+def _generate_integral_code(points, terms, sets, optimise_parameters, simd_width=0):
+    """Generate code to evaluate the element tensor. If simd_width is
+    nonzero, the innermost loops over primary indices are marked for
+    vectorisation."""
 
     # Prefetch formats to speed up code generation.
     f_comment       = format["comment"]
@@ -534,16 +582,25 @@ def _generate_integral_code(points, terms, sets, optimise_parameters):
     f_iadd          = format["iadd"]
     f_add           = format["add"]
     f_A             = format["element tensor"]
-    f_loop          = format["generate loop"]
+    f_loop          = format["generate simd loop"] if simd_width else format["generate loop"]
     f_B             = format["basis constant"]
 
     # Initialise return values.
     code = []
     num_ops = 0
     loops = {}
+    stages = {}
+    num_staged = 0
+    gemm = [[], 0, []]
+
+    # Check if entries should be computed from staged values, or by
+    # matrix products over the integration points (BLAS mode).
+    optimisation = optimise_parameters["optimisation"]
+    sum_factorization = optimisation in ("sum_factorization", "blas")
+    blas = optimisation == "blas" and points is not None and points > 1
 
     # Extract sets.
-    used_weights, used_psi_tables, used_nzcs, trans_set = sets
+    used_weights, used_psi_tables, used_nzcs, trans_set, used_includes = sets
 
     # Loop terms and create code.
     for loop, (data, entry_vals) in sorted(terms.items()):
@@ -573,6 +630,34 @@ def _generate_integral_code(points, terms, sets, optimise_parameters):
         loops[loop] = [basis_const_ops, decl_code + basis_const_code]
 
         for entry, value, ops in entry_vals:
+            # Compute entries of bilinear forms by matrix products if requested.
+            if blas and len(loop) == 2:
+                product = gemm_entry(value, loop, entry, num_staged, points)
+                if product is not None:
+                    stage_ops, stage_code, gemm_decl, gemm_ops, gemm_code = product
+                    num_staged += 1
+                    if not loop in stages:
+                        stages[loop] = [0, []]
+                    stages[loop][0] += stage_ops
+                    stages[loop][1] += stage_code
+                    gemm[0] += gemm_decl
+                    gemm[1] += gemm_ops
+                    gemm[2] += gemm_code
+                    used_includes.add(format["gemm include"])
+                    continue
+
+            # Factorize entries of bilinear forms if requested.
+            if sum_factorization and len(loop) == 2:
+                staged = stage_entry(value, loop, num_staged)
+                if staged is not None:
+                    stage_ops, stage_code, value = staged
+                    ops = value.ops()
+                    num_staged += 1
+                    if not loop in stages:
+                        stages[loop] = [0, []]
+                    stages[loop][0] += stage_ops
+                    stages[loop][1] += stage_code
+
             # Compute number of operations to compute entry
             # (add 1 because of += in assignment).
             entry_ops = ops + 1
@@ -587,12 +672,21 @@ def _generate_integral_code(points, terms, sets, optimise_parameters):
     for loop, ops_lines in sorted(loops.items()):
         ops, lines = ops_lines
         prim_ops = functools.reduce(lambda i, j: i*j, [ops] + [l[2] for l in loop])
+        # Add code and number of operations for staged values.
+        if loop in stages:
+            stage_ops, stage_code = stages[loop]
+            num_ops += stage_ops
+            code += ["", f_comment("Number of operations to compute staged values: %d" % stage_ops)]
+            code += stage_code
+        # Skip loop if all entries are computed by matrix products.
+        if not lines:
+            continue
         # Add number of operations for current loop to total count.
         num_ops += prim_ops
         code += ["", f_comment("Number of operations for primary indices: %d" % prim_ops)]
         code += f_loop(lines, loop)
 
-    return code, num_ops
+    return code, num_ops, gemm
 
 def _tabulate_weights(quadrature_weights):
     "Generate table of quadrature weights."
@@ -669,8 +763,12 @@ def _tabulate_weights(quadrature_weights):
 
     return code
 
-def _tabulate_psis(tables, used_psi_tables, inv_name_map, used_nzcs, optimise_parameters, integral_type, gdim):
-    "Tabulate values of basis functions and their derivatives at quadrature points."
+def _tabulate_psis(tables, used_psi_tables, inv_name_map, used_nzcs, optimise_parameters, integral_type, gdim,
+                   simd_width=0):
+    """Tabulate values of basis functions and their derivatives at quadrature
+    points. If simd_width is nonzero, the tables are aligned to the vector
+    width and the rows are padded with zeros to a multiple of it, such that
+    each row starts on an aligned address."""
 
     # Prefetch formats to speed up code generation.
     f_comment      = format["comment"]
@@ -692,6 +790,10 @@ def _tabulate_psis(tables, used_psi_tables, inv_name_map, used_nzcs, optimise_pa
     f_eval_basis   = format["evaluate basis snippet"]
     f_eval_basis_quad_offset = format["eval_basis_quad_offset"]
     f_eval_derivs_quad_offset = format["eval_basis_quad_offset"]
+    f_aligned      = format["aligned"]
+
+    # The matrix products of BLAS mode assume unpadded tables.
+    pad = simd_width and optimise_parameters["optimisation"] != "blas"
 
     # FIXME: Check if we can simplify the tabulation
     code = []
@@ -733,13 +835,23 @@ def _tabulate_psis(tables, used_psi_tables, inv_name_map, used_nzcs, optimise_pa
 
         if not vals is None:
 
-            # Add declaration to name.
+            # Pad rows with zeros to a multiple of the vector width.
             ip, dofs = numpy.shape(vals)
+            if pad and dofs % simd_width:
+                padded = numpy.zeros((ip, dofs + simd_width - dofs % simd_width))
+                padded[:, :dofs] = vals
+                vals = padded
+                dofs = numpy.shape(vals)[1]
+
+            # Add declaration to name.
             decl_name = f_component(name, [ip, dofs])
+            decl_type = f_table
+            if simd_width:
+                decl_type = f_aligned(simd_width*8) + " " + decl_type
 
             # Generate array of values.
             value = f_tensor(vals)
-            code += [f_decl(f_table, decl_name, f_new_line + value), ""]
+            code += [f_decl(decl_type, decl_name, f_new_line + value), ""]
 
         # Tabulate non-zero indices.
         if optimise_parameters["eliminate zeros"]:
@@ -765,7 +877,10 @@ def _evaluate_basis_at_quadrature_points(psi_tables,
                                          num_vertices,
                                          num_cells,
                                          multi_quadrature_points=False):
-    "Generate code for calling evaluate basis (derivatives) at quadrature points"
+    """Generate code for calling evaluate basis (derivatives) at
+    quadrature points. The tables are stored in a workspace of the
+    integral object and only tabulated if the input differs from the
+    previous call. Returns a tuple (code, members, initializer_list)."""
 
     # Prefetch formats to speed up code generation
     f_comment          = format["comment"]
@@ -776,6 +891,11 @@ def _evaluate_basis_at_quadrature_points(psi_tables,
     f_eval_basis_init  = format["eval_basis_init"]
     f_eval_basis       = format["eval_basis"]
     f_eval_basis_copy  = format["eval_basis_copy"]
+    f_eval_basis_points      = format["eval_basis_points"]
+    f_eval_basis_points_copy = format["eval_basis_points_copy"]
+    f_workspace_check   = format["eval_basis_workspace_check"]
+    f_workspace_store   = format["eval_basis_workspace_store"]
+    f_workspace_members = format["eval_basis_workspace_members"]
     f_eval_derivs_decl = format["eval_derivs_decl"]
     f_eval_derivs_init = format["eval_derivs_init"]
     f_eval_derivs      = format["eval_derivs"]
@@ -784,6 +904,8 @@ def _evaluate_basis_at_quadrature_points(psi_tables,
     f_eval_derivs_quad_offset = format["eval_basis_quad_offset"]
 
     code = []
+    decl_code = []
+    workspace = []
 
     # Extract prefixes for tables
     prefixes = sorted(set(table.split("_")[0] for table in psi_tables))
@@ -826,10 +948,9 @@ def _evaluate_basis_at_quadrature_points(psi_tables,
             used_derivatives_and_components[prefix][n].add(c)
 
     # Generate code for setting quadrature weights
-    code += [f_comment("Set quadrature weights")]
-    code += [f_declaration("const double*", "W", "quadrature_weights")]
-    code += [""]
-    print "here"
+    weights_code = [f_comment("Set quadrature weights")]
+    weights_code += [f_declaration("const double*", "W", "quadrature_weights")]
+    weights_code += [""]
     # Generate code for calling evaluate_basis_[derivatives_]all
     for prefix in prefixes:
 
@@ -865,8 +986,9 @@ def _evaluate_basis_at_quadrature_points(psi_tables,
                         table_name = prefix + "_C%s" % c
 
                     # Generate code for declaration of table
-                    code += [f_comment("Create table %s for basis function values on all cells" % table_name)]
-                    code += [f_eval_basis_decl % {"table_name": table_name}]
+                    decl_code += [f_eval_basis_decl % {"table_name": table_name}]
+                    workspace += [("std::vector<std::vector<double> >", table_name)]
+                    code += [f_comment("Resize table %s for basis function values on all cells" % table_name)]
                     code += [f_eval_basis_init % {"table_name": table_name,
                                                   "table_size": table_size}]
                     code += [""]
@@ -881,23 +1003,15 @@ def _evaluate_basis_at_quadrature_points(psi_tables,
                     table_offset  = cell_number*space_dim
                     vertex_offset = cell_number*num_vertices*gdim
 
+                    # Get points of current cell
+                    if not multi_quadrature_points:
+                        eval_points = "quadrature_points"
+                    else:
+                        eval_points = "quadrature_points + %d*num_quadrature_points*%d" % (gdim, cell_number)
+
                     # Generate block of code for loop
                     block = []
 
-                    # Generate code for calling evaluate_basis_all
-                    if not multi_quadrature_points:
-                        block += [f_eval_basis % {"form_prefix":    form_prefix,
-                                              "element_number": element_number,
-                                              "eval_name":      eval_name,
-                                              "gdim":           gdim,
-                                              "vertex_offset":  vertex_offset}]
-                    else:
-                        block += [f_eval_basis_quad_offset % {"form_prefix":    form_prefix,
-                                              "element_number": element_number,
-                                              "eval_name":      eval_name,
-                                              "gdim":           gdim,
-                                              "vertex_offset":  vertex_offset,
-                                              "quad_offset": str(gdim)+"*num_quadrature_points*"+str(cell_number)}]
                     # Iterate over components and extract values
                     for c in components:
 
@@ -911,23 +1025,25 @@ def _evaluate_basis_at_quadrature_points(psi_tables,
 
                         # Generate code for copying values
                         block += [""]
-                        block += [f_eval_basis_copy % {"table_name":   table_name,
-                                                       "eval_name":    eval_name,
-                                                       "eval_stride":  eval_stride,
-                                                       "eval_offset":  eval_offset,
-                                                       "space_dim":    space_dim,
-                                                       "table_offset": table_offset}]
-
-                    # Generate code
+                        block += [f_eval_basis_points_copy % {"table_name":   table_name,
+                                                              "eval_name":    eval_name,
+                                                              "eval_size":    eval_size,
+                                                              "eval_stride":  eval_stride,
+                                                              "eval_offset":  eval_offset,
+                                                              "space_dim":    space_dim,
+                                                              "table_offset": table_offset}]
+
+                    # Generate code for calling evaluate_basis_all_points
+                    # once for all quadrature points
+                    workspace += [("std::vector<double>", eval_name)]
                     code += [f_comment("Evaluate basis functions on cell %d" % cell_number)]
-                    code += [f_static_array("double", eval_name, eval_size)]
-                    if  False:
-                        code += f_loop(block,
-                                       [("ip",
-                                        "num_quadrature_points*"+str(cell_number),
-                                        "num_quadrature_points*(1+"+str(cell_number)+")")])
-                    else:
-                        code += f_loop(block, [("ip", 0, "num_quadrature_points")])
+                    code += [f_eval_basis_points % {"form_prefix":    form_prefix,
+                                                    "element_number": element_number,
+                                                    "eval_name":      eval_name,
+                                                    "eval_size":      eval_size,
+                                                    "points":         eval_points,
+                                                    "vertex_offset":  vertex_offset}]
+                    code += f_loop(block, [("ip", 0, "num_quadrature_points")])
                     code += [""]
 
             # Code for evaluate_basis_derivatives_all (derivative of degree n > 0)
@@ -970,8 +1086,9 @@ def _evaluate_basis_at_quadrature_points(psi_tables,
                             table_name = prefix + "_C%s_D%s" % (c, d)
 
                         # Generate code for declaration of table
-                        code += [f_comment("Create table %s for basis function derivatives on all cells" % table_name)]
-                        code += [(f_eval_derivs_decl % {"table_name": table_name})]
+                        decl_code += [f_eval_derivs_decl % {"table_name": table_name}]
+                        workspace += [("std::vector<std::vector<double> >", table_name)]
+                        code += [f_comment("Resize table %s for basis function derivatives on all cells" % table_name)]
                         code += [(f_eval_derivs_init % {"table_name": table_name,
                                                         "table_size": table_size})]
                         code += [""]
@@ -1048,4 +1165,30 @@ def _evaluate_basis_at_quadrature_points(psi_tables,
                 # Add newline
                 code += [""]
 
-    return code
+    # Skip workspace if there are no tables
+    if not workspace:
+        return (weights_code, "", "")
+
+    # Number of values of quadrature points and vertex coordinates
+    if multi_quadrature_points:
+        num_point_values = "%d*num_quadrature_points*%d" % (num_cells, gdim)
+    else:
+        num_point_values = "num_quadrature_points*%d" % gdim
+    num_vertex_values = num_cells*num_vertices*gdim
+
+    # Use tables from workspace and tabulate only if needed
+    tabulate_code = code + [f_workspace_store]
+    code = weights_code
+    code += [f_comment("Tables of basis functions from workspace")]
+    code += decl_code + [""]
+    code += [f_workspace_check % {"num_point_values": num_point_values,
+                                  "num_vertex_values": num_vertex_values}]
+    code += ["if (tabulate)", format["block begin"], indent("\n".join(tabulate_code), 2),
+             format["block end"], ""]
+
+    # Generate declaration of workspace members
+    tables = "\n".join("  mutable %s _%s;" % member for member in workspace)
+    members = f_workspace_members % {"tables": tables}
+    initializer_list = ", _tabulated_cell_orientation(0)"
+
+    return (code, members, initializer_list)
@@ -23,6 +23,7 @@ from ufl.utils.sorting import sorted_by_key
 # FFC modules
 from ffc.log import info, error, warning
 from ffc.cpp import format
+from ffc.profiling import profiled
 from ffc.quadrature.symbolics import optimise_code, BASIS, IP, GEO, CONST
 from ffc.quadrature.symbolics import create_product, create_sum, create_symbol, create_fraction
 
@@ -81,6 +82,7 @@ def optimize_integral_ir(ir, parameters):
 
     return ir
 
+@profiled("symbolic optimisation")
 def _simplify_expression(integral, geo_consts, psi_tables_map):
     for points, terms, functions, ip_consts, coordinate, conditionals in integral:
         # NOTE: sorted is needed to pass the regression tests on the buildbots
@@ -105,6 +107,7 @@ def _simplify_expression(integral, geo_consts, psi_tables_map):
             terms[loop][0][2] = psi_tables
             terms[loop][1] = new_entry_vals
 
+@profiled("symbolic optimisation")
 def _precompute_expressions(integral, geo_consts, optimisation):
     for points, terms, functions, ip_consts, coordinate, conditionals in integral:
         for loop, (data, entry_vals) in sorted_by_key(terms):
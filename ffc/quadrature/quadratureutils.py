@@ -24,6 +24,7 @@
 # Modified by Anders Logg 2014
 
 # Python modules.
+import bisect
 import numpy
 
 # FFC modules.
@@ -144,13 +145,8 @@ def unique_psi_tables(tables, eliminate_zeros):
     # Set values to zero if they are lower than threshold.
     format_epsilon = format["epsilon"]
     for name in tables:
-        # Get values.
         vals = tables[name]
-        for r in range(numpy.shape(vals)[0]):
-            for c in range(numpy.shape(vals)[1]):
-                if abs(vals[r][c]) < format_epsilon:
-                    vals[r][c] = 0
-        tables[name] = vals
+        vals[abs(vals) < format_epsilon] = 0
 
     # Extract the column numbers that are non-zero.
     # If optimisation option is set
@@ -167,45 +163,17 @@ def unique_psi_tables(tables, eliminate_zeros):
             if len(vals) == 0:
                 continue
 
-            # Use the first row as reference.
-            non_zeros = list(vals[0].nonzero()[0])
+            # All rows (IPs) must have the same non-zero columns for the
+            # optimization to work, so use the union over all rows.
+            non_zeros = list(numpy.flatnonzero(numpy.any(vals != 0, axis=0)))
 
-            # If all columns in the first row are non zero, there's no point
-            # in continuing.
-            if len(non_zeros) == numpy.shape(vals)[1]:
-                continue
+            # Only add nonzeros if it results in a reduction of columns.
+            if non_zeros and len(non_zeros) != numpy.shape(vals)[1]:
+                non_zero_columns[name] = (i, non_zeros)
 
-            # If we only have one row (IP) we just need the nonzero columns.
-            if numpy.shape(vals)[0] == 1:
-                if list(non_zeros):
-                    non_zeros.sort()
-                    non_zero_columns[name] = (i, non_zeros)
-
-                    # Compress values.
-                    tables[name] = vals[:, non_zeros]
-                    i += 1
-
-            # Check if the remaining rows are nonzero in the same positions, else expand.
-            else:
-                for j in range(1, numpy.shape(vals)[0]):
-                    # All rows must have the same non-zero columns
-                    # for the optimization to work (at this stage).
-                    new_non_zeros = list(vals[j].nonzero()[0])
-                    if non_zeros != new_non_zeros:
-                        non_zeros = non_zeros + [c for c in new_non_zeros if not c in non_zeros]
-                        # If this results in all columns being non-zero, continue.
-                        if len(non_zeros) == numpy.shape(vals)[1]:
-                            continue
-
-                # Only add nonzeros if it results in a reduction of columns.
-                if len(non_zeros) != numpy.shape(vals)[1]:
-                    if list(non_zeros):
-                        non_zeros.sort()
-                        non_zero_columns[name] = (i, non_zeros)
-
-                        # Compress values.
-                        tables[name] = vals[:, non_zeros]
-                        i += 1
+                # Compress values.
+                tables[name] = vals[:, non_zeros]
+                i += 1
 
     # Check if we have some zeros in the tables.
     names_zeros = contains_zeros(tables)
@@ -282,40 +250,75 @@ def unique_tables(tables):
     results in:
     tables = {a:[0,1,2], b:[0,2,3]}
     name_map = {a:[c,d]}
-    inverse_name_map = {a:a, b:b, c:a, d:a}."""
+    inverse_name_map = {a:a, b:b, c:a, d:a}.
+
+    To avoid comparing all pairs of tables, tables are bucketed by
+    shape and sorted within each bucket by a projection of their
+    values onto fixed pseudo-random weights. Two tables that are equal
+    to within epsilon have projections that differ by less than a known
+    bound, so only tables within that window need to be compared."""
 
     format_epsilon = format["epsilon"]
 
     name_map = {}
     inverse_name_map = {}
     names = sorted(tables.keys())
-    mapped = []
+    mapped = set()
+
+    # Compute projections of all non-empty tables
+    weights = {}
+    entries = {}
+    for (i, name) in enumerate(names):
+        val = numpy.array(tables[name])
+        if len(val) == 0:
+            continue
+        if not val.size in weights:
+            weights[val.size] = numpy.random.RandomState(val.size).uniform(-1.0, 1.0, val.size)
+        w = weights[val.size]
+        key = float(numpy.dot(w, val.ravel()))
+        rounding = 2*val.size*numpy.finfo(float).eps*float(numpy.dot(abs(w), abs(val.ravel())))
+        entries[name] = (key, i, val, rounding)
+
+    # Bucket tables by shape and sort each bucket by projection
+    buckets = {}
+    for name in entries:
+        (key, i, val, rounding) = entries[name]
+        buckets.setdefault(numpy.shape(val), []).append((key, i, name))
+    windows = {}
+    for shape, bucket in buckets.items():
+        bucket.sort()
+        size = entries[bucket[0][2]][2].size
+        windows[shape] = format_epsilon*abs(weights[size]).sum() \
+                         + 2*max(entries[name][3] for (key, i, name) in bucket)
+    keys = dict((shape, [key for (key, i, name) in bucket])
+                for (shape, bucket) in buckets.items())
 
     # Loop all tables to see if some are redundant.
-    for i in range(len(names)):
-        name0 = names[i]
-        if name0 in mapped:
+    for name0 in names:
+        if name0 in mapped or not name0 in entries:
             continue
-        val0 = numpy.array(tables[name0])
-
-        for j in range(i + 1, len(names)):
-            name1 = names[j]
-            if name1 in mapped:
-                continue
-            val1 = numpy.array(tables[name1])
-
-            # Check if dimensions match.
-            if numpy.shape(val0) == numpy.shape(val1):
-                # Check if values are the same.
-                if len(val0) > 0 and abs(val0 - val1).max() < format_epsilon:
-                    mapped.append(name1)
-                    del tables[name1]
-                    if name0 in name_map:
-                        name_map[name0].append(name1)
-                    else:
-                        name_map[name0] = [name1]
-                    # Create inverse name map.
-                    inverse_name_map[name1] = name0
+        (key0, i, val0, rounding) = entries[name0]
+
+        # Find tables with projections in the window around this table
+        shape = numpy.shape(val0)
+        lo = bisect.bisect_left(keys[shape], key0 - windows[shape])
+        hi = bisect.bisect_right(keys[shape], key0 + windows[shape])
+        candidates = sorted((j, name1) for (key1, j, name1) in buckets[shape][lo:hi]
+                            if j > i and not name1 in mapped)
+
+        for (j, name1) in candidates:
+            val1 = entries[name1][2]
+
+            # Check if values are the same.
+            if abs(val0 - val1).max() < format_epsilon:
+                mapped.add(name1)
+                del tables[name1]
+                if name0 in name_map:
+                    name_map[name0].append(name1)
+                else:
+                    name_map[name0] = [name1]
+                # Create inverse name map.
+                inverse_name_map[name1] = name0
 
     # Add self.
     for name in tables:
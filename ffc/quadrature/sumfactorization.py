@@ -0,0 +1,221 @@
+"""Sum factorization of element tensor entries for quadrature
+representation.
+
+For bilinear forms, the optimised value of an entry of the element
+tensor inside the loop over integration points is a sum of products
+c*t[j]*u[k] of a coefficient c (depending on geometry, integration
+point and coefficient functions), a value t[j] of a test function table
+and a value u[k] of a trial function table. Grouping the terms by the
+trial function tables gives
+
+  A[j*n + k] += sum_g S_g[j]*u_g[k], where S_g[j] = sum_t c_gt*t[j],
+
+and the staged values S_g are computed in a loop over the test function
+index only. The entry then costs two operations per group instead of
+the number of operations of the full expression. The terms are grouped
+by the test function tables instead if there are fewer of those."""
+
+# Copyright (C) 2014 The FFC authors
+#
+# This file is part of FFC.
+#
+# FFC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# FFC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with FFC. If not, see <http://www.gnu.org/licenses/>.
+
+from ufl.utils.sorting import sorted_by_key
+
+# FFC modules
+from ffc.cpp import format
+from ffc.quadrature.symbolics import BASIS
+from ffc.quadrature.symbolics import create_product, create_sum, create_symbol
+
+def factorize_entry(value, loop):
+    """Factorize the value of an entry computed in a loop over a test
+    and a trial function index. Returns a tuple (stage, groups), where
+    stage is the position in loop of the index of the staged values and
+    groups is a sorted list of (factor, staged_value) such that value is
+    the sum of staged_value*factor. Returns None if the value is not a
+    sum of products of a coefficient and one or more basis function
+    values for each of the two indices."""
+
+    # Split each term into test function part, trial function part
+    # and coefficient
+    terms = value.expand().reduce_vartype(BASIS)
+    if not isinstance(terms, list):
+        terms = [terms]
+    split_terms = []
+    for basis, coefficient in terms:
+        if not basis:
+            return None
+        symbols = basis.vrs if basis._prec == 2 else [basis]
+        parts = ([], [])
+        for symbol in symbols:
+            if symbol._prec != 1 or symbol.t != BASIS:
+                return None
+            positions = [i for (i, (index, start, end)) in enumerate(loop)
+                         if _depends_on(symbol, index)]
+            if len(positions) != 1:
+                return None
+            parts[positions[0]].append(symbol)
+        if not (parts[0] and parts[1]):
+            return None
+        split_terms.append((_product(parts[0]), _product(parts[1]), coefficient))
+
+    # Stage the values in the loop over the index whose tables give the
+    # most groups, such that the entry has the fewest terms
+    num_groups = [len(set(t[i] for t in split_terms)) for i in range(2)]
+    stage = 0 if num_groups[1] <= num_groups[0] else 1
+
+    # Group terms by the table of the other index
+    groups = {}
+    for term in split_terms:
+        staged = create_product([term[2], term[stage]])
+        groups.setdefault(term[1 - stage], []).append(staged)
+    groups = [(factor, create_sum(staged).expand().reduce_ops() if len(staged) > 1 else staged[0])
+              for (factor, staged) in sorted_by_key(groups)]
+
+    return (stage, groups)
+
+def stage_entry(value, loop, number):
+    """Generate code for the staged values of a factorized entry, see
+    factorize_entry. Returns a tuple (ops, code, value), where ops is
+    the number of operations to compute the staged values, code is the
+    code that declares and computes them and value is the new value of
+    the entry. Returns None if the value cannot be factorized or if
+    factorization does not reduce the number of operations."""
+
+    # Prefetch formats to speed up code generation
+    f_comment   = format["comment"]
+    f_component = format["component"]
+    f_assign    = format["assign"]
+    f_decl      = format["declaration"]
+    f_double    = format["float declaration"]
+    f_loop      = format["generate loop"]
+    f_staged    = format["staged values"]
+
+    factorization = factorize_entry(value, loop)
+    if factorization is None:
+        return None
+    stage, groups = factorization
+    index, start, stage_range = loop[stage]
+
+    # Create new value of entry from staged values
+    name = f_staged(number)
+    terms = [create_product([create_symbol(f_component(name, [g, index]), BASIS), factor])
+             for (g, (factor, staged)) in enumerate(groups)]
+    new_value = create_sum(terms) if len(terms) > 1 else terms[0]
+
+    # Only use factorization if it reduces the number of operations
+    # (add 1 because of += in assignment)
+    num_entries = loop[0][2]*loop[1][2]
+    stage_ops = sum(staged.ops() for (factor, staged) in groups)*stage_range
+    if stage_ops + (new_value.ops() + 1)*num_entries >= (value.ops() + 1)*num_entries:
+        return None
+
+    # Generate code for staged values
+    code = [f_comment("Staged values for sum factorization of entry.")]
+    code += [f_decl(f_double, f_component(name, [len(groups), stage_range]))]
+    lines = [f_assign(f_component(name, [g, index]), staged)
+             for (g, (factor, staged)) in enumerate(groups)]
+    code += f_loop(lines, [loop[stage]])
+
+    return (stage_ops, code, new_value)
+
+def gemm_entry(value, loop, entry, number, num_points):
+    """Generate code for computing a factorized entry, see
+    factorize_entry, by matrix products over the integration points
+    (BLAS mode). The staged values are stored for each integration
+    point, and after the loop over integration points the block of the
+    element tensor is computed as the sum of S_g^T*U_g (or U_g^T*S_g)
+    over the groups, where U_g is the table of the factor of group g.
+    Returns a tuple (ops, code, decl_code, gemm_ops, gemm_code), where
+    ops and code compute the staged values in the loop over integration
+    points, decl_code declares the arrays before the loop and gemm_code
+    updates the element tensor after the loop. The arrays are allocated
+    on the heap (as flattened std::vector<double>) since they may be
+    large. Returns None if the value cannot be factorized or if a factor
+    is not a table value."""
+
+    # Prefetch formats to speed up code generation
+    f_comment   = format["comment"]
+    f_component = format["component"]
+    f_assign    = format["assign"]
+    f_heap_decl = format["heap array declaration"]
+    f_loop      = format["generate loop"]
+    f_iadd      = format["iadd"]
+    f_A         = format["element tensor"]
+    f_ip        = format["integration points"]
+    f_staged    = format["staged values"]
+    f_block     = format["staged tensor"]
+    f_gemm      = format["gemm"]
+
+    factorization = factorize_entry(value, loop)
+    if factorization is None:
+        return None
+    stage, groups = factorization
+    index, start, stage_range = loop[stage]
+    other_index = loop[1 - stage][0]
+
+    # Extract names of tables of factors
+    access = f_component("", [f_ip, other_index])
+    tables = []
+    for (factor, staged) in groups:
+        if factor._prec != 1 or not factor.v.endswith(access):
+            return None
+        tables.append(factor.v[:-len(access)])
+
+    # Declare staged values and block of element tensor (the names
+    # include the number of points since the arrays are declared outside
+    # the loop over integration points)
+    name = f_staged("%d_%d" % (num_points, number))
+    block = f_block("%d_%d" % (num_points, number))
+    (j, start, range_j), (k, start, range_k) = loop
+    decl_code = [f_comment("Staged values and element tensor block for matrix products.")]
+    decl_code += [f_heap_decl(name, len(groups)*num_points*stage_range)]
+    decl_code += [f_heap_decl(block, range_j*range_k)]
+
+    # Compute staged values in each integration point (the staged
+    # values of group g are stored in rows of length stage_range for
+    # each integration point)
+    lines = [f_assign(f_component(name, "%d + %s*%d + %s" % (g*num_points*stage_range,
+                                                            f_ip, stage_range, index)), staged)
+             for (g, (factor, staged)) in enumerate(groups)]
+    code = [f_comment("Staged values for matrix products.")]
+    code += f_loop(lines, [loop[stage]])
+    ops = sum(staged.ops() for (factor, staged) in groups)*stage_range
+
+    # Compute block of element tensor and add to element tensor
+    gemm_code = [f_comment("Compute element tensor block by matrix products.")]
+    block_data = "&%s" % f_component(block, 0)
+    for (g, table) in enumerate(tables):
+        staged = "&%s" % f_component(name, g*num_points*stage_range)
+        table = "&%s" % f_component(table, [0, 0])
+        if stage == 0:
+            gemm_code += [f_gemm(range_j, range_k, num_points, staged, table, block_data)]
+        else:
+            gemm_code += [f_gemm(range_j, range_k, num_points, table, staged, block_data)]
+    gemm_code += f_loop([f_iadd(f_A(entry), f_component(block, "%s*%d + %s" % (j, range_k, k)))],
+                        loop)
+    gemm_ops = (2*num_points*len(groups) + 1)*range_j*range_k
+
+    return (ops, code, decl_code, gemm_ops, gemm_code)
+
+def _product(symbols):
+    "Create product of symbols, or return the symbol if only one."
+    if len(symbols) == 1:
+        return symbols[0]
+    return create_product(symbols)
+
+def _depends_on(symbol, index):
+    "Check if basis symbol is accessed by given loop index."
+    return format["component"]("", index) in symbol.v
@@ -31,9 +31,10 @@ from ufl.algorithms import extract_unique_elements, extract_type, extract_elemen
 # FFC modules
 from ffc.log import ffc_assert, info, error, warning
 from ffc.utils import product
-from ffc.fiatinterface import create_element
+from ffc.fiatinterface import create_element, tabulate_element
 from ffc.fiatinterface import map_facet_points, reference_cell_vertices
 from ffc.quadrature_schemes import create_quadrature
+from ffc.profiling import profile_section
 
 def _create_quadrature_points_and_weights(integral_type, cellname, facet_cellname, degree, rule):
     if integral_type == "cell":
@@ -112,14 +113,14 @@ def _tabulate_empty_psi_table(tdim, deriv_order, element):
 
     return {None: table}
 
-def _tabulate_psi_table(integral_type, cellname, tdim, element, deriv_order, points):
+def _tabulate_psi_table(integral_type, cellname, tdim, ufl_element, deriv_order, points):
     "Tabulate psi table for different integral types."
     # MSA: I attempted to generalize this function, could this way of
     # handling domain types generically extend to other parts of the code?
 
     # Handle case when list of points is empty
     if points is None:
-        return _tabulate_empty_psi_table(tdim, deriv_order, element)
+        return _tabulate_empty_psi_table(tdim, deriv_order, create_element(ufl_element))
 
     # Otherwise, call FIAT to tabulate
     entity_dim = domain_to_entity_dim(integral_type, tdim)
@@ -129,7 +130,7 @@ def _tabulate_psi_table(integral_type, cellname, tdim, element, deriv_order, poi
         entity_points = _map_entity_points(cellname, tdim, points, entity_dim, entity)
         # TODO: Use 0 as key for cell and we may be able to generalize other places:
         key = None if integral_type == "cell" else entity
-        psi_table[key] = element.tabulate(deriv_order, entity_points)
+        psi_table[key] = tabulate_element(ufl_element, deriv_order, entity_points)
 
     return psi_table
 
@@ -242,11 +243,11 @@ def tabulate_basis(sorted_integrals, form_data, itg_data):
 
         # Loop FIAT elements and tabulate basis as usual.
         for ufl_element in ufl_elements:
-            fiat_element = create_element(ufl_element)
 
             # Tabulate table of basis functions and derivatives in points
-            psi_table = _tabulate_psi_table(integral_type, cellname, tdim, fiat_element,
-                                        num_derivatives[ufl_element], points)
+            with profile_section("FIAT tabulation", quadrature_degree=degree):
+                psi_table = _tabulate_psi_table(integral_type, cellname, tdim, ufl_element,
+                                                num_derivatives[ufl_element], points)
 
             # Insert table into dictionary based on UFL elements. (None=not averaged)
             psi_tables[len_weights][ufl_element] = { None: psi_table }
@@ -262,7 +263,6 @@ def tabulate_basis(sorted_integrals, form_data, itg_data):
             avg_integral_type = "exterior_facet"
 
         for element in avg_elements[avg]:
-            fiat_element = create_element(element)
 
             # Make quadrature rule and get points and weights.
             (points, weights) = _create_quadrature_points_and_weights(avg_integral_type, cellname,
@@ -271,7 +271,7 @@ def tabulate_basis(sorted_integrals, form_data, itg_data):
 
             # Tabulate table of basis functions and derivatives in points
             entity_psi_tables = _tabulate_psi_table(avg_integral_type, cellname, tdim,
-                                                fiat_element, 0, points)
+                                                    element, 0, points)
             rank = len(element.value_shape())
 
             # Hack, duplicating table with per-cell values for each facet in the case of cell_avg(f) in a facet integral
@@ -46,16 +46,24 @@ import ufl
 
 # FFC modules
 from ffc.log import debug, error
+from ffc.utils import LRUCache
 from ffc.fiatinterface import reference_cell
 from ffc.fiatinterface import create_quadrature as fiat_create_quadrature
 
 # Dictionary mapping from cellname to dimension
 from ufl.cell import cellname2dim
 
+# Cache for computed quadrature rules (bounded by the size of the
+# tabulation cache, see set_tabulation_cache_parameters)
+_cache = LRUCache(256*1024**2)
+
 def create_quadrature(shape, degree, scheme="default"):
     """
     Generate quadrature rule (points, weights) for given shape
     that will integrate an polynomial of order 'degree' exactly.
+
+    Rules are computed once for each (shape, degree, scheme) and
+    returned as read-only arrays shared between all callers.
     """
 
     # FIXME: KBO: Can this be handled more elegantly?
@@ -63,6 +71,25 @@ def create_quadrature(shape, degree, scheme="default"):
     if isinstance(shape, int) and shape == 0 or cellname2dim[shape] == 0:
         return ([()], array([1.0,]))
 
+    # Check cache
+    key = (shape, degree, scheme)
+    rule = _cache.get(key)
+    if rule is not None:
+        return rule
+
+    # Compute rule and store read-only copy in cache
+    points, weights = _create_quadrature(shape, degree, scheme)
+    points = array(points, dtype=float64)
+    weights = array(weights, dtype=float64)
+    points.setflags(write=False)
+    weights.setflags(write=False)
+    _cache.put(key, (points, weights))
+
+    return (points, weights)
+
+def _create_quadrature(shape, degree, scheme):
+    "Compute quadrature rule (points, weights), see create_quadrature."
+
     if scheme == "default":
         if shape == "tetrahedron":
             return _tetrahedron_scheme(degree)
@@ -33,9 +33,6 @@ in the intermediate representation under the key "foo".
 # Modified by Kristian B. Oelgaard 2010
 # Modified by Martin Alnaes, 2013-2014
 
-# Python modules
-from itertools import chain
-
 # Import UFL
 import ufl
 from ufl.classes import Measure
@@ -45,10 +42,12 @@ from ufl.cell import cellname2dim
 from ffc.utils import compute_permutations, product
 from ffc.log import info, error, begin, end, debug_ir, ffc_assert, warning
 from ffc.fiatinterface import create_element, reference_cell
+from ffc.fiatinterface import set_tabulation_cache_parameters
 from ffc.mixedelement import MixedElement
 from ffc.enrichedelement import EnrichedElement, SpaceOfReals
 from ffc.quadratureelement import QuadratureElement
 from ffc.cpp import set_float_formatting
+from ffc.profiling import profiled, profile_section
 
 def pick_representation(representation):
     "Return one of the specialized code generation modules from a representation string."
@@ -67,6 +66,7 @@ def pick_representation(representation):
 
 not_implemented = None
 
+@profiled("stage 2: representation", count_objects=True)
 def compute_ir(analysis, parameters):
     "Compute intermediate representation."
 
@@ -75,6 +75,9 @@ def compute_ir(analysis, parameters):
     # Set code generation parameters
     set_float_formatting(int(parameters["precision"]))
 
+    # Set size and location of cache for tabulated elements
+    set_tabulation_cache_parameters(parameters)
+
     # Extract data from analysis
     form_datas, elements, element_numbers = analysis
 
@@ -88,11 +91,15 @@ def compute_ir(analysis, parameters):
     ir_dofmaps = [_compute_dofmap_ir(e, i, element_numbers)
                       for (i, e) in enumerate(elements)]
 
-    # Compute and flatten representation of integrals
+    # Compute and flatten representation of integrals. This is done in
+    # the main process, since the representations hold UFL objects that
+    # can not be safely transferred from worker processes (only the code
+    # generation is done in parallel).
     info("Computing representation of integrals")
-    irs = [_compute_integral_ir(fd, i, element_numbers, parameters) \
-               for (i, fd) in enumerate(form_datas)]
-    ir_integrals = [ir for ir in chain(*irs) if not ir is None]
+    irs = [_compute_integral_ir(itg_data, fd, i, element_numbers, parameters)
+           for (i, fd) in enumerate(form_datas)
+           for itg_data in fd.integral_data]
+    ir_integrals = [ir for ir in irs if not ir is None]
 
     # Compute representation of forms
     info("Computing representation of forms")
@@ -198,29 +205,34 @@ def _needs_mesh_entities(element):
     else:
         return [d > 0 for d in num_dofs_per_entity]
 
-def _compute_integral_ir(form_data, form_id, element_numbers, parameters):
-    "Compute intermediate represention for form integrals."
-
-    irs = []
-
-    # Iterate over integrals
-    for itg_data in form_data.integral_data:
-
-        # Select representation
-        # TODO: Is it possible to detach this metadata from IntegralData? It's a bit strange from the ufl side.
-        r = pick_representation(itg_data.metadata["representation"])
-
-        # Compute representation
+def _compute_integral_ir(itg_data, form_data, form_id, element_numbers, parameters):
+    "Compute intermediate represention of form integral."
+
+    # Select representation
+    # TODO: Is it possible to detach this metadata from IntegralData? It's a bit strange from the ufl side.
+    representation = itg_data.metadata["representation"]
+    r = pick_representation(representation)
+
+    # Warn if options can not be honoured by the selected representation
+    if "blas" in parameters and representation != "quadrature":
+        warning("BLAS mode is only available for quadrature representation, "
+                "ignoring option 'blas' for %s integral %s of form %d in %s representation."
+                % (itg_data.integral_type, str(itg_data.subdomain_id), form_id, representation))
+
+    # Compute representation
+    with profile_section("compute_integral_ir", count_objects=True,
+                         form=form_id,
+                         integral_type=itg_data.integral_type,
+                         subdomain_id=itg_data.subdomain_id,
+                         representation=itg_data.metadata["representation"],
+                         quadrature_degree=itg_data.metadata["quadrature_degree"]):
         ir = r.compute_integral_ir(itg_data,
                                    form_data,
                                    form_id,
                                    element_numbers,
                                    parameters)
 
-        # Append representation
-        irs.append(ir)
-
-    return irs
+    return ir
 
 def _compute_form_ir(form_data, form_id, element_numbers):
     "Compute intermediate representation of form."
@@ -0,0 +1,195 @@
+"""This module provides functions for tabulating the element tensors
+of forms compiled by the JIT compiler from NumPy arrays. The arrays
+are passed to the generated tabulate_tensor through the buffer
+protocol and are not copied if they are C-contiguous arrays of
+float64, and the element tensors are written in place if an output
+array A is given. The batch versions tabulate the tensors of many
+cells in a single call, with one row per cell in each array.
+
+Example:
+
+  form, module, prefix = jit(u*v*dx)
+  A = tabulate_cell_tensors(form, vertex_coordinates)
+
+where vertex_coordinates has shape (num_cells, num_vertices, gdim)
+and A has shape (num_cells, space_dimension, space_dimension)."""
+
+# Copyright (C) 2014 The FFC authors
+#
+# This file is part of FFC.
+#
+# FFC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# FFC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with FFC. If not, see <http://www.gnu.org/licenses/>.
+
+import numpy
+
+from ffc.log import error
+
+__all__ = ["tabulate_cell_tensor", "tabulate_cell_tensors",
+           "tabulate_exterior_facet_tensor", "tabulate_exterior_facet_tensors",
+           "tabulate_interior_facet_tensor"]
+
+def tabulate_cell_tensor(form, vertex_coordinates, coefficients=(), A=None,
+                         cell_orientation=0, subdomain_id=None):
+    """Tabulate the element tensor of the cell integral (over the
+    given subdomain, or the default integral) of the compiled form on
+    a cell with the given vertex coordinates and coefficient values."""
+    integral = _create_integral(form, "cell", subdomain_id)
+    shape, dims, x_size = _dimensions(form)
+    x = _input(vertex_coordinates, "vertex_coordinates", x_size)
+    w = [_input(w, "coefficient %d" % i, dims[i])
+         for (i, w) in enumerate(_coefficients(coefficients, dims))]
+    A = _output(A, shape)
+    integral.tabulate_tensor_buffers(A, w, x, cell_orientation)
+    return A
+
+def tabulate_cell_tensors(form, vertex_coordinates, coefficients=(), A=None,
+                          cell_orientations=None, subdomain_id=None):
+    """Tabulate the element tensors of the cell integral (over the
+    given subdomain, or the default integral) of the compiled form on
+    a batch of cells, where each array has one row per cell."""
+    integral = _create_integral(form, "cell", subdomain_id)
+    shape, dims, x_size = _dimensions(form)
+    x = _input(vertex_coordinates, "vertex_coordinates", x_size, True)
+    num_cells = x.shape[0]
+    w = [_input(w, "coefficient %d" % i, dims[i], num_cells)
+         for (i, w) in enumerate(_coefficients(coefficients, dims))]
+    o = _indices(cell_orientations, "cell_orientations", num_cells)
+    A = _output(A, (num_cells,) + shape, True)
+    integral.tabulate_tensor_batch_buffers(A, w, x, o)
+    return A
+
+def tabulate_exterior_facet_tensor(form, vertex_coordinates, facet,
+                                   coefficients=(), A=None, cell_orientation=0,
+                                   subdomain_id=None):
+    """Tabulate the element tensor of the exterior facet integral
+    (over the given subdomain, or the default integral) of the
+    compiled form on the given local facet of a cell."""
+    integral = _create_integral(form, "exterior_facet", subdomain_id)
+    shape, dims, x_size = _dimensions(form)
+    x = _input(vertex_coordinates, "vertex_coordinates", x_size)
+    w = [_input(w, "coefficient %d" % i, dims[i])
+         for (i, w) in enumerate(_coefficients(coefficients, dims))]
+    A = _output(A, shape)
+    integral.tabulate_tensor_buffers(A, w, x, int(facet), cell_orientation)
+    return A
+
+def tabulate_exterior_facet_tensors(form, vertex_coordinates, facets,
+                                    coefficients=(), A=None,
+                                    cell_orientations=None, subdomain_id=None):
+    """Tabulate the element tensors of the exterior facet integral
+    (over the given subdomain, or the default integral) of the
+    compiled form on a batch of cells, each with a local facet."""
+    integral = _create_integral(form, "exterior_facet", subdomain_id)
+    shape, dims, x_size = _dimensions(form)
+    x = _input(vertex_coordinates, "vertex_coordinates", x_size, True)
+    num_cells = x.shape[0]
+    w = [_input(w, "coefficient %d" % i, dims[i], num_cells)
+         for (i, w) in enumerate(_coefficients(coefficients, dims))]
+    f = _indices(facets, "facets", num_cells)
+    o = _indices(cell_orientations, "cell_orientations", num_cells)
+    A = _output(A, (num_cells,) + shape, True)
+    integral.tabulate_tensor_batch_buffers(A, w, x, f, o)
+    return A
+
+def tabulate_interior_facet_tensor(form, vertex_coordinates, facets,
+                                   coefficients=(), A=None,
+                                   cell_orientations=(0, 0), subdomain_id=None):
+    """Tabulate the element tensor of the interior facet integral
+    (over the given subdomain, or the default integral) of the
+    compiled form on a facet shared by two cells, where
+    vertex_coordinates, facets and cell_orientations are pairs for the
+    two cells and the coefficient values are those of both cells."""
+    integral = _create_integral(form, "interior_facet", subdomain_id)
+    shape, dims, x_size = _dimensions(form)
+    shape = tuple(2*n for n in shape)
+    dims = [2*n for n in dims]
+    x0, x1 = [_input(x, "vertex_coordinates", x_size) for x in vertex_coordinates]
+    w = [_input(w, "coefficient %d" % i, dims[i])
+         for (i, w) in enumerate(_coefficients(coefficients, dims))]
+    A = _output(A, shape)
+    integral.tabulate_tensor_buffers(A, w, x0, x1,
+                                     int(facets[0]), int(facets[1]),
+                                     cell_orientations[0], cell_orientations[1])
+    return A
+
+def _create_integral(form, integral_type, subdomain_id):
+    "Create integral of given type and subdomain (or default) of form."
+    if subdomain_id is None:
+        integral = getattr(form, "create_default_%s_integral" % integral_type)()
+    else:
+        integral = getattr(form, "create_%s_integral" % integral_type)(subdomain_id)
+    if integral is None:
+        error("Form has no %s integral%s." % (integral_type.replace("_", " "),
+              "" if subdomain_id is None else " over subdomain %d" % subdomain_id))
+    return integral
+
+def _dimensions(form):
+    """Return shape of element tensor, dimensions of coefficients and
+    number of vertex coordinates of cells (None if unknown) of form."""
+    rank = form.rank()
+    elements = [form.create_finite_element(i)
+                for i in range(rank + form.num_coefficients())]
+    dims = [element.space_dimension() for element in elements]
+    x_size = None
+    if elements:
+        x_size = (elements[0].topological_dimension() + 1)*\
+                 elements[0].geometric_dimension()
+    return tuple(dims[:rank]), dims[rank:], x_size
+
+def _coefficients(coefficients, dims):
+    "Check number of coefficients."
+    if len(coefficients) != len(dims):
+        error("Expecting %d coefficients, got %d." % (len(dims), len(coefficients)))
+    return coefficients
+
+def _input(x, name, size, num_cells=None):
+    """Return x as a C-contiguous array of float64 (without copying if
+    possible), with num_cells rows if given, and check its size. If
+    num_cells is True, the number of rows is the length of x."""
+    x = numpy.ascontiguousarray(x, dtype=numpy.float64)
+    if num_cells is None:
+        if size is not None and x.size != size:
+            error("Expecting %d values for %s, got %d." % (size, name, x.size))
+        return x
+    if num_cells is True:
+        num_cells = x.shape[0] if x.ndim else 0
+    if x.ndim == 0 or x.shape[0] != num_cells:
+        error("Expecting %d rows (one per cell) for %s." % (num_cells, name))
+    x = x.reshape(num_cells, int(numpy.prod(x.shape[1:])))
+    if size is not None and x.shape[1] != size:
+        error("Expecting %d values per cell for %s, got %d." % (size, name, x.shape[1]))
+    return x
+
+def _indices(values, name, num_cells):
+    "Return values (or zeros if None) as an array of C int per cell."
+    if values is None:
+        return numpy.zeros(num_cells, dtype=numpy.intc)
+    values = numpy.ascontiguousarray(values, dtype=numpy.intc)
+    if values.shape != (num_cells,):
+        error("Expecting one value per cell for %s." % name)
+    return values
+
+def _output(A, shape, batch=False):
+    """Return A (or a new array if None) after checking that it can
+    be written in place as an array of the given shape, with one row
+    per cell for batches."""
+    if A is None:
+        return numpy.zeros(shape)
+    if not (isinstance(A, numpy.ndarray) and A.dtype == numpy.float64 and
+            A.flags.c_contiguous and A.flags.writeable):
+        error("Expecting a writable C-contiguous array of float64 for A.")
+    if A.size != int(numpy.prod(shape)) or \
+       (batch and (A.ndim == 0 or A.shape[0] != shape[0])):
+        error("Expecting an array of shape %s for A." % str(shape))
+    return A
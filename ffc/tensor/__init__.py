@@ -1,4 +1,4 @@
 from .tensorrepresentation import compute_integral_ir
 from .tensoroptimization import optimize_integral_ir
 from .tensorgenerator import generate_integral_code
-from .costestimation import estimate_cost
+from .costestimation import estimate_cost, estimate_flops
@@ -16,14 +16,15 @@
 # along with FFC. If not, see <http://www.gnu.org/licenses/>.
 #
 # First added:  2010-01-25
-# Last changed: 2014-04-15
+# Last changed: 2014-10-18
 
 # FFC modules
-from ffc.log import debug
+from ffc.log import debug, error
 
 # FFC tensor representation modules
 from ffc.tensor.monomialextraction import extract_monomial_form
 from ffc.tensor.monomialtransformation import transform_monomial_form
+from ffc.tensor.monomialtransformation import MonomialIndex
 
 def estimate_cost(integral, function_replace_map):
     """
@@ -32,10 +33,76 @@ def estimate_cost(integral, function_replace_map):
     if the integrand can be represented as a monomial, and -1 if not.
     """
 
+    # Extract monomial form
+    monomial_form = _extract_monomial_form(integral, function_replace_map)
+    if monomial_form is None:
+        return -1
+
+    # Compute cost
+    cost = 0
+    for integrand in monomial_form:
+        for monomial in integrand.monomials:
+            cost = max(cost, len(monomial.coefficients) + len(monomial.transforms))
+    return cost
+
+def estimate_flops(integral, function_replace_map, num_points):
+    """
+    Estimate the number of floating-point operations for one element
+    tensor of integral in tensor and quadrature representation (with
+    the given number of quadrature points), if the integrand can be
+    represented as a monomial. The estimates are returned as a
+    dictionary keyed by representation, or None if not.
+
+    For each monomial, the tensor representation computes the geometry
+    tensor and contracts it with the reference tensor. The quadrature
+    representation evaluates the coefficients and the integrand at
+    each point and adds to each entry of the element tensor a sum over
+    the components and derivatives of the arguments.
+    """
+
+    # Extract monomial form
+    monomial_form = _extract_monomial_form(integral, function_replace_map)
+    if monomial_form is None:
+        return None
+
+    tensor_flops = 0
+    quadrature_flops = 0
+    for integrand in monomial_form:
+        for monomial in integrand.monomials:
+
+            # Get dimensions of reference and geometry tensor
+            num_rows = _dimension(monomial.extract_unique_indices(MonomialIndex.PRIMARY))
+            num_secondary = _dimension(monomial.extract_unique_indices(MonomialIndex.SECONDARY))
+            num_external = _dimension(monomial.extract_unique_indices(MonomialIndex.EXTERNAL))
+            num_factors = len(monomial.coefficients) + len(monomial.transforms)
+
+            # Tensor representation
+            tensor_flops += 2*num_secondary*num_external*max(num_factors, 1)
+            tensor_flops += 2*num_rows*num_secondary
+
+            # Quadrature representation
+            num_terms = 1
+            coefficient_flops = 0
+            for v in monomial.arguments:
+                indices = _unique([i for i in v.components + v.derivatives
+                                   if i.index_type != MonomialIndex.FIXED])
+                if v.index.index_type == MonomialIndex.PRIMARY:
+                    num_terms *= _dimension(indices)
+                else:
+                    coefficient_flops += 2*len(v.index.index_range)*_dimension(indices)
+            integrand_flops = 2*num_external*num_factors*num_terms
+            quadrature_flops += num_points*(coefficient_flops + integrand_flops +
+                                            2*num_rows*num_terms)
+
+    return {"tensor": tensor_flops, "quadrature": quadrature_flops}
+
+def _extract_monomial_form(integral, function_replace_map):
+    "Extract transformed monomial form of integral, or None if not possible."
+
     # Check that integral type is supported
     supported = ["cell", "exterior_facet", "interior_facet"]
     if not integral.integral_type() in supported:
-        return -1
+        return None
 
     # Extract monomial integrand
     integrand = integral.integrand()
@@ -44,15 +111,24 @@ def estimate_cost(integral, function_replace_map):
         transform_monomial_form(monomial_form)
     except Exception as exception:
         debug("Monomial extraction failed: " + str(exception))
-        return -1
+        return None
 
     # Check that we get just one integrand
     if not len(monomial_form) == 1:
         error("Expecting just one integrand.")
 
-    # Compute cost
-    cost = 0
-    for integrand in monomial_form:
-        for monomial in integrand.monomials:
-            cost = max(cost, len(monomial.coefficients) + len(monomial.transforms))
-    return cost
+    return monomial_form
+
+def _unique(indices):
+    "Return indices with unique type and id."
+    unique = {}
+    for index in indices:
+        unique[(index.index_type, index.index_id)] = index
+    return list(unique.values())
+
+def _dimension(indices):
+    "Return product of the ranges of the given indices."
+    dimension = 1
+    for index in indices:
+        dimension *= len(index.index_range)
+    return dimension
@@ -36,15 +36,21 @@ from ufl.classes import Measure
 
 # FFC modules
 from ffc.log import info, debug, error
-from ffc.fiatinterface import create_element
+from ffc.fiatinterface import tabulate_element
 from ffc.fiatinterface import map_facet_points
+from ffc.fiatinterface import create_element, reference_cell
 from ffc.quadrature_schemes import create_quadrature
+from ffc.profiling import profile_section
 
 # FFC tensor representation modules
 from .multiindex import build_indices
 from .monomialextraction import MonomialException
 from .monomialtransformation import MonomialIndex
 
+# Permutations of the basis functions of elements under symmetries
+# of the reference cell, keyed by element, cell and vertex permutation
+_basis_permutations = {}
+
 def integrate(monomial,
               integral_type,
               facet0, facet1,
@@ -69,10 +75,11 @@ def integrate(monomial,
                                          facet_cellname)
 
     # Initialize quadrature table for basis functions
-    table = _init_table(monomial.arguments,
-                        integral_type,
-                        points,
-                        facet0, facet1)
+    with profile_section("FIAT tabulation", quadrature_degree=quadrature_degree):
+        table = _init_table(monomial.arguments,
+                            integral_type,
+                            points,
+                            facet0, facet1)
 
     # Compute table Psi for each factor
     psis = [_compute_psi(v, table, len(points), integral_type) \
@@ -89,6 +96,148 @@ def integrate(monomial,
 
     return A0
 
+def transform_reference_tensor(A0, monomial, integral_type, facets, new_facets, cellname):
+    """Compute the reference tensor for a given monomial on new facets
+    from the reference tensor A0 computed for other facets, or return
+    None if this is not possible.
+
+    For any two facets of the reference simplex, there is a vertex
+    permutation g of the reference cell that maps the points on one
+    facet to the same points on the other facet (as mapped by
+    map_facet_points). If the basis functions of each element are
+    permuted by g, so that phi_i(g(x)) = phi_pi(i)(x), the tables of
+    basis functions on the new facet are permutations of those on the
+    old facet, with derivatives transformed by the inverse Jacobian of
+    g. This is applied to each dimension of the reference tensor, for
+    each restriction separately (interior facets). It is not possible
+    if an element is not permuted by g (for example elements mapped by
+    Piola transforms), or if the tensor has fixed or internal
+    derivative indices which would mix with other derivatives."""
+
+    # Get argument and role of each dimension of reference tensor
+    axes = _compute_axes(monomial.arguments)
+    if axes is None:
+        return None
+
+    # Get vertex permutations and inverse Jacobians for each restriction
+    if integral_type == Measure.EXTERIOR_FACET:
+        symmetries = {None: _facet_symmetry(cellname, facets[0], new_facets[0])}
+    elif integral_type == Measure.INTERIOR_FACET:
+        symmetries = {"+": _facet_symmetry(cellname, facets[0], new_facets[0]),
+                      "-": _facet_symmetry(cellname, facets[1], new_facets[1])}
+    else:
+        return None
+
+    # Transform each dimension of reference tensor
+    for (axis, (v, role)) in enumerate(axes):
+        (sigma, Jinv) = symmetries[v.restriction]
+        if sigma == tuple(range(len(sigma))):
+            continue
+        if role == "basis":
+            permutation = _basis_permutation(v.element, cellname, sigma)
+            if permutation is None:
+                return None
+            A0 = numpy.take(A0, permutation, axis=axis)
+        elif role == "derivative":
+            A0 = numpy.tensordot(A0, Jinv, axes=([axis], [0]))
+            A0 = numpy.rollaxis(A0, A0.ndim - 1, axis)
+
+    return A0
+
+def _compute_axes(arguments):
+    """Compute the argument and the role (basis, component or
+    derivative) of each dimension of the reference tensor, ordered as
+    the reference tensor computed by _compute_psi and _compute_product.
+    Return None if there are fixed or internal derivative indices, or
+    internal basis function indices."""
+    indices, axes = [], []
+    for v in arguments:
+        # Indices of dimensions of Psi for v, as in _compute_psi
+        vindices = list(v.components) + list(v.derivatives) + [v.index]
+        roles = ["component"]*len(v.components) + \
+                ["derivative"]*len(v.derivatives) + ["basis"]
+        for (index, role) in zip(vindices, roles):
+            if role != "component" and index.index_type in (MonomialIndex.FIXED,
+                                                            MonomialIndex.INTERNAL):
+                return None
+        (rearrangement, num_indices) = _compute_rearrangement(vindices)
+        for i in rearrangement[num_indices[0] + num_indices[1]:]:
+            indices.append(vindices[i])
+            axes.append((v, roles[i]))
+
+    # Rearrange as (primary, secondary), as in _compute_product
+    (rearrangement, num_indices) = _compute_rearrangement(indices)
+    return [axes[i] for i in rearrangement]
+
+def _facet_symmetry(cellname, facet, new_facet):
+    """Compute the vertex permutation sigma of the reference cell that
+    maps the vertices of the facet (in order) to those of the new facet
+    and the remaining vertex to the remaining vertex, and the inverse
+    Jacobian of the corresponding affine map."""
+    fiat_cell = reference_cell(cellname)
+    vertices = numpy.array(fiat_cell.get_vertices(), dtype=float)
+    tdim = vertices.shape[1]
+    facet_vertices = fiat_cell.get_topology()[tdim - 1]
+    old, new = facet_vertices[facet], facet_vertices[new_facet]
+    sigma = dict(zip(old, new))
+    sigma[_other_vertex(old, len(vertices))] = _other_vertex(new, len(vertices))
+    sigma = tuple(sigma[i] for i in range(len(vertices)))
+
+    # Jacobian of map x -> sum_k lambda_k(x) v_sigma(k), where the
+    # reference vertices are v_0 = 0 and v_k = e_k
+    mapped = vertices[list(sigma)]
+    J = numpy.transpose(mapped[1:] - mapped[0])
+
+    return (sigma, numpy.linalg.inv(J))
+
+def _other_vertex(facet_vertices, num_vertices):
+    "Return the vertex not on a facet."
+    return [i for i in range(num_vertices) if not i in facet_vertices][0]
+
+def _basis_permutation(ufl_element, cellname, sigma):
+    """Compute the permutation pi of the basis functions of an element
+    such that phi_i(g(x)) = phi_pi(i)(x) for the affine map g of the
+    reference cell given by the vertex permutation sigma, by comparing
+    the basis functions at a set of points. Return None if the basis
+    functions are not permuted by g."""
+    key = (ufl_element, cellname, sigma)
+    if key in _basis_permutations:
+        return _basis_permutations[key]
+
+    # Generate points in the interior of the reference cell (more than
+    # the dimension of the space) in barycentric coordinates
+    element = create_element(ufl_element)
+    vertices = numpy.array(reference_cell(cellname).get_vertices(), dtype=float)
+    num_points = 2*element.space_dimension() + len(vertices)
+    barycentric = numpy.random.RandomState(0).random_sample((num_points, len(vertices))) + 0.1
+    barycentric /= barycentric.sum(axis=1)[:, numpy.newaxis]
+    points = numpy.dot(barycentric, vertices)
+    mapped_points = numpy.dot(barycentric, vertices[list(sigma)])
+
+    # Tabulate basis functions (all components) at points and mapped points
+    tdim = vertices.shape[1]
+    zero = (0,)*tdim
+    values = element.tabulate(0, points)[zero]
+    values = numpy.reshape(values, (numpy.shape(values)[0], -1))
+    mapped_values = element.tabulate(0, mapped_points)[zero]
+    mapped_values = numpy.reshape(mapped_values, numpy.shape(values))
+
+    # Match basis functions
+    tolerance = 1e-10*max(1.0, numpy.abs(values).max())
+    permutation = []
+    for i in range(len(values)):
+        difference = numpy.abs(values - mapped_values[i]).max(axis=1)
+        j = int(numpy.argmin(difference))
+        if difference[j] > tolerance:
+            permutation = None
+            break
+        permutation.append(j)
+    if permutation is not None and len(set(permutation)) != len(permutation):
+        permutation = None
+
+    _basis_permutations[key] = permutation
+    return permutation
+
 def _init_quadrature(arguments, integral_type, quadrature_degree, quadrature_rule, cellname, facet_cellname):
     "Initialize quadrature for given monomial."
     # Create quadrature rule and get points and weights
@@ -116,17 +265,16 @@ def _init_table(arguments, integral_type, points, facet0, facet1):
     # Call FIAT to tabulate the basis functions for each element
     table = {}
     for (ufl_element, order) in num_derivatives.items():
-        fiat_element = create_element(ufl_element)
         if integral_type == Measure.CELL:
-            table[(ufl_element, None)] = fiat_element.tabulate(order, points)
+            table[(ufl_element, None)] = tabulate_element(ufl_element, order, points)
         elif integral_type == Measure.EXTERIOR_FACET:
             x = map_facet_points(points, facet0)
-            table[(ufl_element, None)] = fiat_element.tabulate(order, x)
+            table[(ufl_element, None)] = tabulate_element(ufl_element, order, x)
         elif integral_type == Measure.INTERIOR_FACET:
             x0 = map_facet_points(points, facet0)
             x1 = map_facet_points(points, facet1)
-            table[(ufl_element, "+")] = fiat_element.tabulate(order, x0)
-            table[(ufl_element, "-")] = fiat_element.tabulate(order, x1)
+            table[(ufl_element, "+")] = tabulate_element(ufl_element, order, x0)
+            table[(ufl_element, "-")] = tabulate_element(ufl_element, order, x1)
 
     return table
 
@@ -223,27 +371,32 @@ def _compute_product(psis, weights):
     # points and internal Indices the outer product of all the Psis
     # with the first dimension (corresponding to quadrature points)
     # and all internal dimensions removed.
+    #
+    # This is computed as a single contraction by numpy.einsum. Each
+    # dimension is labelled by an integer: 0 for quadrature points,
+    # 1 + i for internal Index i, and consecutive labels after those
+    # for the remaining dimensions of each Psi, which make up the
+    # dimensions of the reference tensor.
 
-    # Initialize zero reference tensor (will be rearranged later)
+    # Compute shape and Indices of reference tensor (will be rearranged later)
     (shape, indices) = _compute_shape(psis)
-    A0 = numpy.zeros(shape, dtype= numpy.float)
 
-    # Initialize list of internal multiindices
+    # Label dimensions of weights and each Psi
     bshape = _compute_internal_shape(psis)
-    bindices = build_indices([list(range(b)) for b in bshape]) or [[]]
+    next_label = 1 + len(bshape)
+    operands = [numpy.asarray(weights), [0]]
+    output = []
+    for (Psi, index, bpart) in psis:
+        num_outer = numpy.ndim(Psi) - 1 - len(bpart)
+        outer = list(range(next_label, next_label + num_outer))
+        next_label += num_outer
+        operands += [Psi, [0] + [1 + b for b in bpart] + outer]
+        output += outer
+    operands.append(output)
 
     # Sum over quadrature points and internal indices
-    num_points = len(weights)
-    for q in range(num_points):
-        for b in bindices:
-
-            # Compute outer products of subtables for current (q, b)
-            B = weights[q]
-            for (Psi, index, bpart) in psis:
-                B = numpy.multiply.outer(B, Psi[ tuple([q] + [b[i] for i in bpart])])
-
-            # Add product to reference tensor
-            numpy.add(A0, B, A0)
+    A0 = _einsum(*operands)
+    A0 = numpy.reshape(A0, shape)
 
     # Rearrange Indices as (primary, secondary)
     (rearrangement, num_indices) = _compute_rearrangement(indices)
@@ -251,6 +404,13 @@ def _compute_product(psis, weights):
 
     return A0
 
+def _einsum(*operands):
+    "Call numpy.einsum, with optimized contraction order if supported."
+    try:
+        return numpy.einsum(*operands, optimize=True)
+    except TypeError:
+        return numpy.einsum(*operands)
+
 def _compute_rearrangement(indices):
     """
     Compute rearrangement tuple for given list of Indices, so that the
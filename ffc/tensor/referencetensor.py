@@ -25,7 +25,7 @@
 from ffc.log import debug
 
 # FFC tensor representation modules.
-from .monomialintegration import integrate
+from .monomialintegration import integrate, transform_reference_tensor
 from .monomialtransformation import MonomialIndex
 from .multiindex import create_multiindex
 
@@ -42,17 +42,35 @@ class ReferenceTensor:
                  quadrature_order,
                  quadrature_rule,
                  cellname,
-                 facet_cellname):
-        "Create reference tensor for given monomial."
+                 facet_cellname,
+                 reference=None):
+        """Create reference tensor for given monomial. If a reference
+        tensor for the same monomial on other facets is given, the
+        tensor is computed from it by symmetry if possible."""
+
+        # Compute reference tensor from given reference tensor
+        self.A0 = None
+        if reference is not None:
+            self.A0 = transform_reference_tensor(reference.A0,
+                                                 monomial,
+                                                 integral_type,
+                                                 reference.facets,
+                                                 (facet0, facet1),
+                                                 cellname)
+            if self.A0 is not None:
+                debug("Reference tensor computed by symmetry from facets " + \
+                      str(reference.facets))
 
         # Compute reference tensor
-        self.A0 = integrate(monomial,
-                            integral_type,
-                            facet0, facet1,
-                            quadrature_order,
-                            quadrature_rule,
-                            cellname,
-                            facet_cellname)
+        if self.A0 is None:
+            self.A0 = integrate(monomial,
+                                integral_type,
+                                facet0, facet1,
+                                quadrature_order,
+                                quadrature_rule,
+                                cellname,
+                                facet_cellname)
+        self.facets = (facet0, facet1)
 
         # Extract indices
         primary_indices   = monomial.extract_unique_indices(MonomialIndex.PRIMARY)
@@ -24,7 +24,7 @@
 # Modified by Martin Alnaes, 2013
 #
 # First added:  2004-11-03
-# Last changed: 2013-02-10
+# Last changed: 2014-10-18
 
 # FFC modules
 from ffc.log import error
@@ -32,7 +32,9 @@ from ffc.cpp import format, remove_unused, count_ops
 
 # FFC tensor representation modules
 from ffc.tensor.monomialtransformation import MonomialIndex
+from ffc.tensor.tensorreduction import contraction_matrix, reduce_contraction
 from ffc.representationutils import initialize_integral_code
+from ffc.profiling import profile_record
 
 def generate_integral_code(ir, prefix, parameters):
     "Generate code for integral from intermediate representation."
@@ -51,6 +53,9 @@ def _tabulate_tensor(ir, parameters):
     j_set = set()
     g_set = set()
 
+    # Number of operations saved by optimized tensor contractions
+    saved_ops = []
+
     # Extract data from intermediate representation
     AK = ir["AK"]
     integral_type = ir["integral_type"]
@@ -63,7 +68,7 @@ def _tabulate_tensor(ir, parameters):
     if integral_type == "cell":
 
         # Generate code for one single tensor contraction
-        t_code = _generate_tensor_contraction(AK, parameters, g_set)
+        t_code = _generate_tensor_contraction(AK, parameters, g_set, saved_ops)
 
         # Generate code for geometry tensors
         g_code = _generate_geometry_tensors(AK, j_set, g_set, tdim, gdim)
@@ -83,7 +88,7 @@ def _tabulate_tensor(ir, parameters):
         # Generate code for num_facets tensor contractions
         cases = [None for i in range(num_facets)]
         for i in range(num_facets):
-            cases[i] = _generate_tensor_contraction(AK[i], parameters, g_set)
+            cases[i] = _generate_tensor_contraction(AK[i], parameters, g_set, saved_ops)
         t_code = switch(format["facet"](None), cases)
 
         # Generate code for geometry tensors
@@ -105,7 +110,7 @@ def _tabulate_tensor(ir, parameters):
         cases = [[None for j in range(num_facets)] for i in range(num_facets)]
         for i in range(num_facets):
             for j in range(num_facets):
-                cases[i][j] = _generate_tensor_contraction(AK[i][j], parameters, g_set)
+                cases[i][j] = _generate_tensor_contraction(AK[i][j], parameters, g_set, saved_ops)
         t_code = switch(format["facet"]("+"), [switch(format["facet"]("-"), cases[i]) for i in range(len(cases))])
 
         # Generate code for geometry tensors
@@ -133,11 +138,24 @@ def _tabulate_tensor(ir, parameters):
     j_ops, g_ops, t_ops = [count_ops(c) for c in (j_code, g_code, t_code)]
     total_ops = j_ops + g_ops + t_ops
 
+    # Record operation counts for benchmarks (two per multiply-add
+    # pair), one per facet or pair of facets for facet integrals
+    case_ops = lambda case: 2*(j_ops + g_ops + count_ops(case))
+    if integral_type == "cell":
+        num_operations = 2*total_ops
+    elif integral_type == "exterior_facet":
+        num_operations = [case_ops(case) for case in cases]
+    else:
+        num_operations = [[case_ops(case) for case in row] for row in cases]
+    profile_record(num_operations=num_operations)
+
     # Add generated code
     lines = []
     lines.append(comment("Number of operations (multiply-add pairs) for Jacobian data:      %d" % j_ops))
     lines.append(comment("Number of operations (multiply-add pairs) for geometry tensor:    %d" % g_ops))
     lines.append(comment("Number of operations (multiply-add pairs) for tensor contraction: %d" % t_ops))
+    if saved_ops:
+        lines.append(comment("Number of operations (multiply-add pairs) saved by optimization:  %d" % sum(saved_ops)))
     lines.append(comment("Total number of operations (multiply-add pairs):                  %d" % total_ops))
     lines.append("")
     lines.append(j_code)
@@ -150,18 +168,41 @@ def _tabulate_tensor(ir, parameters):
 
     return "\n".join(lines)
 
-def _generate_tensor_contraction(terms, parameters, g_set):
+def _generate_tensor_contraction(terms, parameters, g_set, saved_ops=None):
     """
     Generate code for computation of tensor contraction, choosing
-    either standard or optimized contraction.
+    either standard or optimized contraction. When optimizing, the
+    cheapest of the standard, reduced and optimized contraction is
+    chosen and the number of operations saved compared to the standard
+    contraction is appended to saved_ops.
     """
 
     # Only check first term, assuming either non or all are optimized
     A0, GK, optimized_contraction = terms[0]
-    if optimized_contraction is None:
-        return _generate_tensor_contraction_standard(terms, parameters, g_set)
-    else:
-        return _generate_tensor_contraction_optimized(terms, parameters, g_set)
+    if not parameters["optimize"]:
+        if optimized_contraction is None:
+            return _generate_tensor_contraction_standard(terms, parameters, g_set)
+        else:
+            return _generate_tensor_contraction_optimized(terms, parameters, g_set)
+
+    # Generate code for all contractions, picking the cheapest
+    generators = [_generate_tensor_contraction_standard,
+                  _generate_tensor_contraction_reduced]
+    if optimized_contraction is not None:
+        generators.append(_generate_tensor_contraction_optimized)
+    candidates = []
+    for generate in generators:
+        used = set()
+        code = generate(terms, parameters, used)
+        candidates.append((count_ops(code), code, used))
+    num_ops, code, used = min(candidates, key=lambda candidate: candidate[0])
+
+    # Remember used geometry tensor entries and saved operations
+    g_set.update(used)
+    if saved_ops is not None and num_ops < candidates[0][0]:
+        saved_ops.append(candidates[0][0] - num_ops)
+
+    return code
 
 def _generate_tensor_contraction_standard(terms, parameters, g_set):
     """
@@ -230,6 +271,57 @@ def _generate_tensor_contraction_standard(terms, parameters, g_set):
 
     return "\n".join(lines)
 
+def _generate_tensor_contraction_reduced(terms, parameters, g_set):
+    """
+    Generate code for computation of tensor contraction using full
+    tensor contraction, reduced by exploiting duplicate, scaled and
+    linearly dependent rows and columns of the reference tensor.
+    """
+
+    # Prefetch formats to speed up code generation
+    assign            = format["assign"]
+    element_tensor    = format["element tensor"]
+    geometry_tensor   = format["geometry tensor"]
+    combination       = format["geometry tensor combination"]
+    declaration       = format["const float declaration"]
+    zero              = format["float"](0)
+    inner_product     = format["inner product"]
+
+    # Get machine precision
+    epsilon = parameters["epsilon"]
+
+    # Get names of geometry tensor entries for all terms
+    gk_names = []
+    for (j, (A0, GK, optimized_contraction)) in enumerate(terms):
+        gk_names += [geometry_tensor(j, a) for a in A0.secondary_multi_index.indices]
+
+    # Compute reduced tensor contraction
+    M = contraction_matrix(terms, epsilon)
+    combinations, rows = reduce_contraction(M, epsilon)
+
+    # Generate code for combinations of geometry tensor entries
+    lines = []
+    names = []
+    for (k, terms_k) in enumerate(combinations):
+        entries = [gk_names[a] for (c, a) in terms_k]
+        g_set.update(entries)
+        coefficients = [c for (c, a) in terms_k]
+        if len(entries) == 1 and coefficients[0] == 1.0:
+            names.append(entries[0])
+        else:
+            names.append(combination(k))
+            lines.append(declaration(names[-1], inner_product(coefficients, entries)))
+
+    # Generate code for computing the element tensor
+    for (k, row) in enumerate(rows):
+        coefficients = [c for (c, rtype, i) in row]
+        entries = [element_tensor(i) if rtype == 0 else names[i]
+                   for (c, rtype, i) in row]
+        value = inner_product(coefficients, entries) or zero
+        lines.append(assign(element_tensor(k), value))
+
+    return "\n".join(lines)
+
 def _generate_tensor_contraction_optimized(terms, parameters, g_set):
     """
     Generate code for computation of tensor contraction using
@@ -267,7 +359,7 @@ def _generate_tensor_contraction_optimized(terms, parameters, g_set):
             # Sanity check
             ltype, i = lhs
             if ltype != 0:
-                error("Expecting element tensor entry from FErari but got something else.")
+                error("Expecting element tensor entry from tensor optimization but got something else.")
 
             # Create name of entry
             name = element_tensor(i, j)
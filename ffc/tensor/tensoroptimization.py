@@ -16,22 +16,16 @@
 # along with FFC. If not, see <http://www.gnu.org/licenses/>.
 #
 # First added:  2010-02-08
-# Last changed: 2010-02-08
+# Last changed: 2014-10-18
 
 # Python modules
+import numpy
 from numpy import shape
 
 # FFC modules
 from ffc.log import warning, info, error
 from ffc.utils import product
 
-# Try importing FErari
-try:
-    import ferari
-    from ferari import binary
-except:
-    ferari = None
-
 def optimize_integral_ir(ir, parameters):
     """
     Compute optimized intermediate representation of integral.
@@ -40,14 +34,9 @@ def optimize_integral_ir(ir, parameters):
     representation directly, rather than working on a copy.
     """
 
-    # Skip optimization if FErari is not installed
-    if ferari is None:
-        warning("FErari not installed, skipping tensor optimizations")
-        return ir
-
     # Skip optimization if requested
     if "no_ferari" in parameters:
-        warning("Skipping FErari optimizations as requested.")
+        warning("Skipping tensor optimizations as requested.")
         return ir
 
     # Extract data from intermediate representation
@@ -55,24 +44,25 @@ def optimize_integral_ir(ir, parameters):
     integral_type = ir["integral_type"]
     num_facets = ir["num_facets"]
     rank = ir["rank"]
+    epsilon = parameters["epsilon"]
 
     # Optimize cell integrals
     if integral_type == "cell":
         for (k, (A0, GK, dummy)) in enumerate(AK):
-            ir["AK"][k] = (A0, GK, _optimize_tensor_contraction(A0.A0, rank))
+            ir["AK"][k] = (A0, GK, _optimize_tensor_contraction(A0.A0, rank, epsilon))
 
     # Optimize exterior facet integrals
     elif integral_type == "exterior_facet":
         for i in range(num_facets):
             for (k, (A0, GK, dummy)) in enumerate(AK[i]):
-                ir["AK"][i][k] = (A0, GK, _optimize_tensor_contraction(A0.A0, rank))
+                ir["AK"][i][k] = (A0, GK, _optimize_tensor_contraction(A0.A0, rank, epsilon))
 
     # Optimize interior facet integrals
     elif integral_type == "interior_facet":
         for i in range(num_facets):
             for j in range(num_facets):
                 for (k, (A0, GK, dummy)) in enumerate(AK[i][j]):
-                    ir["AK"][i][j][k] = (A0, GK, _optimize_tensor_contraction(A0.A0, rank))
+                    ir["AK"][i][j][k] = (A0, GK, _optimize_tensor_contraction(A0.A0, rank, epsilon))
 
     # Unhandled integral type
     else:
@@ -80,21 +70,95 @@ def optimize_integral_ir(ir, parameters):
 
     return ir
 
-def _optimize_tensor_contraction(A0, rank):
-    "Compute optimized tensor contraction for given reference tensor."
+def _optimize_tensor_contraction(A0, rank, epsilon):
+    """
+    Compute optimized tensor contraction for given reference tensor.
+
+    The optimized contraction is a list of pairs (lhs, rhs), one for
+    each entry of the element tensor in the order of computation,
+    where lhs = (0, i) denotes entry i of the element tensor and rhs
+    is a list of triples (c, rtype, k). The entry is the sum of c
+    times entry k of the element tensor (rtype 0) or c times the
+    geometry tensor entry for secondary index k (rtype 1), as for the
+    binary optimizations of FErari.
+    """
 
-    # Select FErari optimization algorithm
-    if rank == 2:
-        optimize = binary.optimize
-    elif rank == 1:
-        optimize = binary.optimize_action
-    else:
+    # Check rank
+    if rank not in (1, 2):
         warning("Tensor optimization only available for rank 1 and 2 tensors, skipping optimizations")
         return None
 
     # Write a message
-    info("Calling FErari to optimize tensor of size %s (%d entries)",
-         " x ".join(str(d) for d in shape(A0)), product(shape(A0)))#
+    info("Optimizing tensor contraction for tensor of size %s (%d entries)",
+         " x ".join(str(d) for d in shape(A0)), product(shape(A0)))
+
+    # Compute optimized tensor contraction for rows of A0, one for each
+    # entry of the element tensor
+    rows = numpy.array(A0, dtype=float).reshape(product(shape(A0)[:rank]), -1)
+    rows[abs(rows) < epsilon] = 0.0
+
+    return _optimize_rows(rows, epsilon)
+
+def _optimize_rows(rows, epsilon):
+    """
+    Compute optimized tensor contraction for the given rows, using a
+    minimum spanning tree for the cost of computing each row, either
+    directly from its nonzero entries, as a scaled copy of another row
+    or from another row and the entries where the rows differ (the
+    Hamming distance).
+    """
 
-    # Compute optimized tensor contraction
-    return optimize(A0)
+    num_rows = len(rows)
+    nonzero = rows != 0.0
+
+    # Cost, parent and ratio (for scaled copies) of each row, starting
+    # from the cost of computing each row directly
+    cost = nonzero.sum(axis=1)
+    parent = numpy.zeros(num_rows, dtype=int) - 1
+    ratio = numpy.zeros(num_rows)
+    remaining = numpy.ones(num_rows, dtype=bool)
+
+    contraction = []
+    for n in range(num_rows):
+
+        # Pick remaining row of least cost (Prim's algorithm)
+        i = numpy.flatnonzero(remaining)[numpy.argmin(cost[remaining])]
+        remaining[i] = False
+        row = rows[i]
+
+        # Generate row
+        j = parent[i]
+        if j < 0:
+            rhs = [(row[k], 1, k) for k in numpy.flatnonzero(nonzero[i])]
+        elif ratio[i] != 0.0:
+            rhs = [(ratio[i], 0, j)]
+        else:
+            difference = row - rows[j]
+            rhs = [(1.0, 0, j)] + [(difference[k], 1, k)
+                                   for k in numpy.flatnonzero(abs(difference) > epsilon)]
+        contraction.append(((0, i), rhs))
+
+        # Skip update if row is zero or no rows remain
+        if not nonzero[i].any() or not remaining.any():
+            continue
+
+        # Compute cost of remaining rows from this row (one more
+        # operation than the Hamming distance)
+        others = numpy.flatnonzero(remaining)
+        R = rows[others]
+        new_cost = (abs(R - row) > epsilon).sum(axis=1) + 1
+
+        # Compute cost of scaled copies of this row
+        p = numpy.argmax(abs(row))
+        r = R[:, p] / row[p]
+        scaled = (abs(R - numpy.outer(r, row)) <= epsilon).all(axis=1) & (r != 0.0)
+        new_cost[scaled] = 1
+
+        # Update cost of remaining rows that are cheaper from this row
+        cheaper = new_cost < cost[others]
+        k = others[cheaper]
+        cost[k] = new_cost[cheaper]
+        parent[k] = i
+        ratio[k] = numpy.where(scaled[cheaper], r[cheaper], 0.0)
+
+    return contraction
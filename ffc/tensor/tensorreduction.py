@@ -0,0 +1,235 @@
+"""This module implements a reduction of the tensor contraction
+A = A0 : GK that exploits duplicate, scaled and linearly dependent
+rows and columns of the reference tensor A0, as an alternative to the
+optimizations of FErari that does not depend on any external
+packages."""
+
+# Copyright (C) 2014 The FFC authors
+#
+# This file is part of FFC.
+#
+# FFC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# FFC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with FFC. If not, see <http://www.gnu.org/licenses/>.
+#
+# First added:  2014-10-18
+# Last changed: 2014-10-18
+
+# Python modules
+import numpy
+
+# Number of decimals used when hashing normalized rows and columns
+_decimals = 12
+
+def contraction_matrix(terms, epsilon):
+    """
+    Return the tensor contraction of the given terms as a matrix M,
+    such that the entries of the element tensor are given by M*g for
+    the vector g of all geometry tensor entries (for each term in
+    turn), with entries smaller than epsilon set to zero.
+    """
+    A0, GK, optimized_contraction = terms[0]
+    num_rows = len(A0.primary_multi_index.indices)
+    M = numpy.hstack([A0.A0.reshape(num_rows, -1) for (A0, GK, dummy) in terms])
+    M[abs(M) < epsilon] = 0.0
+    return M
+
+def reduce_contraction(M, epsilon):
+    """
+    Reduce the tensor contraction given by the matrix M, using
+    duplicate, scaled and linearly dependent columns and rows.
+
+    The result is given as a pair (combinations, rows). Each
+    combination is a list of pairs (c, a) and defines the temporary
+    sum of c*g[a]. Each row is a list of triples (c, rtype, k) and
+    defines the corresponding entry of the element tensor as the sum
+    of c times combination k (rtype 1) or a previous entry k of the
+    element tensor (rtype 0). Rows only refer to previous rows.
+    """
+
+    # Reduce columns and then the rows of the reduced matrix
+    combinations, C = _reduce_columns(M, epsilon)
+    rows = _reduce_rows(C, epsilon)
+
+    return combinations, rows
+
+def _reduce_columns(M, epsilon):
+    """
+    Merge scaled columns of M and express linearly dependent columns
+    in terms of a basis, returning the combinations of columns and the
+    reduced matrix.
+    """
+
+    # Merge columns that are scaled copies of a previous column
+    combinations = []
+    columns = []
+    for (a, copies) in _merge_scaled(M.T, epsilon):
+        combinations.append([(1.0, a)] + copies)
+        columns.append(M[:, a])
+    if not columns:
+        return [], numpy.zeros((M.shape[0], 0))
+    C = numpy.array(columns).T
+
+    # Find columns that are linear combinations of previous columns
+    basis, dependent = _split_basis(C.T, epsilon)
+    if not dependent:
+        return combinations, C
+
+    # Compute coefficients of dependent columns (X) and check that the
+    # combinations of basis columns cost less than the columns
+    B = C[:, basis]
+    X = _solve(B, C[:, dependent], epsilon)
+    if X is None:
+        return combinations, C
+    extra_ops = sum(len(combinations[n]) for (i, n) in enumerate(dependent)
+                    for b in range(len(basis)) if X[b, i] != 0.0)
+    if extra_ops >= numpy.count_nonzero(C[:, dependent]):
+        return combinations, C
+
+    # Add dependent columns to combinations of basis columns
+    reduced = []
+    for (i, b) in enumerate(basis):
+        combination = list(combinations[b])
+        for (k, n) in enumerate(dependent):
+            if X[i, k] != 0.0:
+                combination += [(X[i, k]*c, a) for (c, a) in combinations[n]]
+        reduced.append(combination)
+
+    return reduced, B
+
+def _reduce_rows(C, epsilon):
+    """
+    Express rows of C in terms of previous rows when they are scaled
+    copies of a previous row or are cheaper to compute as a linear
+    combination of previous rows.
+    """
+
+    rows = []
+    basis = []
+    Q = numpy.zeros((0, C.shape[1]))
+    for (k, (m, ratio)) in enumerate(_match_scaled(C, epsilon)):
+
+        row = C[k]
+        direct = [(c, 1, a) for (a, c) in enumerate(row) if c != 0.0]
+
+        # Zero row or scaled copy of a previous row
+        if not direct:
+            rows.append([])
+            continue
+        elif m is not None:
+            rows.append([(ratio, 0, m)])
+            continue
+
+        # New row, check if it is in the span of the previous basis rows
+        r = row - numpy.dot(Q.T, numpy.dot(Q, row))
+        scale = _scale(row)
+        if numpy.linalg.norm(r) > epsilon*scale*len(row):
+            rows.append(direct)
+            basis.append(k)
+            Q = numpy.vstack((Q, r / numpy.linalg.norm(r)))
+            continue
+
+        # Use combination of basis rows if cheaper
+        y = _solve(C[basis].T, row.reshape(-1, 1), epsilon)
+        if y is not None and numpy.count_nonzero(y) < len(direct):
+            rows.append([(c, 0, basis[i]) for (i, c) in enumerate(y[:, 0]) if c != 0.0])
+        else:
+            rows.append(direct)
+
+    return rows
+
+def _merge_scaled(V, epsilon):
+    """
+    Group the nonzero vectors V that are scaled copies of each other,
+    returning the index of the first vector of each group and the
+    other vectors of the group as pairs (ratio, index).
+    """
+    groups = []
+    members = {}
+    for (k, (m, ratio)) in enumerate(_match_scaled(V, epsilon)):
+        if m is not None:
+            members[m].append((ratio, k))
+        elif V[k].any():
+            members[k] = []
+            groups.append(k)
+
+    return [(k, members[k]) for k in groups]
+
+def _match_scaled(V, epsilon):
+    """
+    For each vector v in V, return the index m of the first previous
+    vector such that v = ratio*V[m] and the ratio, or (None, None)
+    if there is no such vector or v is zero.
+    """
+    matches = []
+    first = {}
+    for (k, v) in enumerate(V):
+
+        # Normalize by the (first) entry of largest magnitude
+        if not v.any():
+            matches.append((None, None))
+            continue
+        p = numpy.argmax(abs(v))
+        key = (p,) + tuple(numpy.round(v / v[p], _decimals) + 0.0)
+
+        # Check for previous vector, verifying the match
+        m = first.get(key)
+        if m is not None:
+            ratio = v[p] / V[m][p]
+            if numpy.allclose(v, ratio*V[m], rtol=0.0, atol=epsilon*_scale(v)):
+                matches.append((m, ratio))
+                continue
+        else:
+            first[key] = k
+        matches.append((None, None))
+
+    return matches
+
+def _split_basis(V, epsilon):
+    """
+    Split the indices of the vectors V into those of a basis for their
+    span, chosen greedily in order, and those of the dependent vectors.
+    """
+
+    # Skip Gram-Schmidt if the vectors are linearly independent
+    if len(V) <= 1 or numpy.linalg.matrix_rank(V) == len(V):
+        return list(range(len(V))), []
+
+    basis = []
+    dependent = []
+    Q = numpy.zeros((0, V.shape[1]))
+    for (k, v) in enumerate(V):
+        r = v - numpy.dot(Q.T, numpy.dot(Q, v))
+        if numpy.linalg.norm(r) > epsilon*_scale(v)*len(v):
+            basis.append(k)
+            Q = numpy.vstack((Q, r / numpy.linalg.norm(r)))
+        else:
+            dependent.append(k)
+
+    return basis, dependent
+
+def _solve(B, Y, epsilon):
+    """
+    Solve B*X = Y in the least squares sense, with entries of X smaller
+    than epsilon set to zero, or return None if the residual is not
+    within round-off.
+    """
+    X = numpy.linalg.lstsq(B, Y, rcond=None)[0]
+    X[abs(X) < epsilon] = 0.0
+    residual = abs(numpy.dot(B, X) - Y).max()
+    if residual > epsilon*max(_scale(B), _scale(Y))*B.shape[0]:
+        return None
+    return X
+
+def _scale(v):
+    "Return scale of entries of v (at least 1)."
+    return max(1.0, abs(v).max()) if v.size else 1.0
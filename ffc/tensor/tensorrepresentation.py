@@ -1,11 +1,10 @@
 """This module implements the representation of a multilinear form as
 a sum of tensor contractions.
 
-The following possible optimizations are currently not implemented but
+The following possible optimization is currently not implemented but
 might be (re-)implemented in a future version of FFC
 
   1. Factorization of common reference tensors
-  2. FErari optimizations
 """
 
 # Copyright (C) 2007-2014 Anders Logg
@@ -67,13 +66,14 @@ def compute_integral_ir(itg_data,
     num_facets = cell.num_facets()
 
     # Helper to simplify code below
-    compute_terms = lambda i, j: _compute_terms(monomial_form,
+    compute_terms = lambda i, j, reference=None: _compute_terms(monomial_form,
                                            i, j,
                                            integral_type,
                                            quadrature_degree,
                                            quadrature_rule,
                                            cellname,
-                                           facet_cellname)
+                                           facet_cellname,
+                                           reference)
 
     # Compute representation of cell tensor
     if integral_type == "cell":
@@ -81,12 +81,18 @@ def compute_integral_ir(itg_data,
         terms = compute_terms(None, None)
 
     elif integral_type == "exterior_facet":
-        # Compute sum of tensor representations for each facet
-        terms = [compute_terms(i, None) for i in range(num_facets)]
+        # Compute sum of tensor representations for each facet, from
+        # those of the first facet by symmetry where possible
+        reference = compute_terms(0, None)
+        terms = [reference] + [compute_terms(i, None, reference)
+                               for i in range(1, num_facets)]
 
     elif integral_type == "interior_facet":
-        # Compute sum of tensor representations for each facet-facet pair
-        terms = [[compute_terms(i, j) for j in range(num_facets)] for i in range(num_facets)]
+        # Compute sum of tensor representations for each facet-facet
+        # pair, from those of the first pair by symmetry where possible
+        reference = compute_terms(0, 0)
+        terms = [[reference if i == j == 0 else compute_terms(i, j, reference)
+                  for j in range(num_facets)] for i in range(num_facets)]
         for i in range(num_facets):
             for j in range(num_facets):
                 reorder_entries(terms[i][j])
@@ -106,8 +112,11 @@ def _compute_terms(monomial_form,
                    quadrature_degree,
                    quadrature_rule,
                    cellname,
-                   facet_cellname):
-    "Compute list of tensor contraction terms for monomial form."
+                   facet_cellname,
+                   reference=None):
+    """Compute list of tensor contraction terms for monomial form. If
+    the terms for other facets are given as reference, the reference
+    tensors are computed from those by symmetry if possible."""
 
     # Compute terms
     terms = []
@@ -123,7 +132,8 @@ def _compute_terms(monomial_form,
                                  quadrature_degree,
                                  quadrature_rule,
                                  cellname,
-                                 facet_cellname)
+                                 facet_cellname,
+                                 None if reference is None else reference[len(terms)][0])
 
             # Compute geometry tensor
             GK = GeometryTensor(monomial)
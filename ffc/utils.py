@@ -19,12 +19,17 @@
 # Modified by Martin Alnaes 2014
 
 # Python modules.
+import os
+import numpy
 import operator
 import functools
 import itertools
+import multiprocessing
+from multiprocessing.pool import MaybeEncodingError
+from collections import OrderedDict
 
 # FFC modules.
-from .log import error
+from .log import error, warning
 
 from ufl.utils.sequences import product
 
@@ -46,6 +51,48 @@ def listcopy(sequence):
     else:
         return [object.__class__(object) for object in sequence]
 
+class LRUCache:
+    """A cache of NumPy arrays (or tuples or dicts of arrays), bounded by
+    the total size of the arrays. When the size is exceeded, the least
+    recently used values are removed."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._values = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key):
+        "Return value for key (as most recently used), or None if not found."
+        value = self._values.pop(key, None)
+        if value is not None:
+            self._values[key] = value
+        return value
+
+    def put(self, key, value):
+        "Store value for key as most recently used and evict old values."
+        if key in self._values:
+            self._bytes -= _nbytes(self._values.pop(key))
+        self._values[key] = value
+        self._bytes += _nbytes(value)
+        self.evict()
+
+    def evict(self):
+        "Remove least recently used values until cache fits max size."
+        while self._values and self._bytes > self.max_bytes:
+            key, value = self._values.popitem(last=False)
+            self._bytes -= _nbytes(value)
+
+def _nbytes(value):
+    "Return size in bytes of arrays in value."
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return numpy.asarray(value).nbytes
+
 def compute_permutations(k, n, skip = []):
    """Compute all permutations of k elements from (0, n) in rising order.
    Any elements that are contained in the list skip are not included."""
@@ -61,3 +108,51 @@ def compute_permutations(k, n, skip = []):
                permutations += [(i, ) + p]
    return permutations
 
+# Function and arguments for parallel_map, inherited by forked workers
+_parallel_map_data = None
+
+def _parallel_map_call(i):
+    "Call function on item i of the sequence given to parallel_map."
+    function, sequence = _parallel_map_data
+    return function(sequence[i])
+
+def parallel_map(function, sequence, num_processes=1):
+    """Apply function to each item of sequence and return the list of
+    results in the order of the sequence. If num_processes > 1, the
+    items are distributed over a pool of forked worker processes.
+    Neither the function nor the items need to be picklable, only the
+    results, which should therefore be plain data such as strings. If
+    the results cannot be pickled, or if the platform does not support
+    forking, the items are processed serially."""
+
+    global _parallel_map_data
+
+    sequence = list(sequence)
+    num_processes = min(int(num_processes), len(sequence))
+    if num_processes <= 1:
+        return [function(item) for item in sequence]
+
+    # Workers must be forked to inherit function and sequence (Python 2
+    # has no get_context, but forks by default where fork is available)
+    if not hasattr(os, "fork"):
+        warning("Unable to fork worker processes, running serially.")
+        return [function(item) for item in sequence]
+    try:
+        context = multiprocessing.get_context("fork")
+    except AttributeError:
+        context = multiprocessing
+    except ValueError:
+        warning("Unable to fork worker processes, running serially.")
+        return [function(item) for item in sequence]
+
+    _parallel_map_data = (function, sequence)
+    pool = context.Pool(num_processes)
+    try:
+        return pool.map(_parallel_map_call, range(len(sequence)))
+    except MaybeEncodingError:
+        warning("Unable to transfer results from worker processes, running serially.")
+        return [function(item) for item in sequence]
+    finally:
+        pool.close()
+        pool.join()
+        _parallel_map_data = None
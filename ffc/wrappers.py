@@ -19,25 +19,34 @@
 from itertools import chain
 
 # FFC modules
-from ffc.log import begin, end, info, error
+from ffc.log import begin, end, info, error, warning
 from ffc.utils import all_equal
 from ffc.cpp import format
+from ffc.profiling import profiled
 from ffc.backends.dolfin.wrappers import generate_dolfin_code
 from ffc.backends.dolfin.capsules import UFCElementNames, UFCFormNames
+from ffc.backends.assembly import generate_assembly_code
 
 __all__ = ["generate_wrapper_code"]
 
 # FIXME: More clean-ups needed here.
 
+@profiled("stage 4.1: wrappers")
 def generate_wrapper_code(analysis, prefix, object_names, parameters):
     "Generate code for additional wrappers."
 
-    # Skip if wrappers not requested
-    if not parameters["format"] == "dolfin":
-        return None
+    code = ""
+
+    # Add dolfin wrapper
+    if parameters["format"] == "dolfin":
+        code += _generate_dolfin_wrapper(analysis, prefix, object_names, parameters)
 
-    # Return dolfin wrapper
-    return _generate_dolfin_wrapper(analysis, prefix, object_names, parameters)
+    # Add assembly drivers
+    if parameters["assembly_driver"]:
+        code += _generate_assembly_driver(analysis, prefix, object_names, parameters)
+
+    # Skip if wrappers not requested
+    return code or None
 
 def _generate_dolfin_wrapper(analysis, prefix, object_names, parameters):
 
@@ -56,6 +65,32 @@ def _generate_dolfin_wrapper(analysis, prefix, object_names, parameters):
 
     return code
 
+def _generate_assembly_driver(analysis, prefix, object_names, parameters):
+
+    begin("Compiler stage 4.2: Generating assembly drivers")
+
+    # Encapsulate data
+    (capsules, common_space) = _encapsulate(prefix, object_names, analysis, parameters)
+
+    # Skip if there are no forms
+    if isinstance(capsules, UFCElementNames):
+        info("No forms, skipping assembly drivers")
+        end()
+        return ""
+
+    # Warn about forms that can not be assembled
+    for form in capsules:
+        if form.rank > 2:
+            warning("Skipping assembly driver for form %s of rank %d." % (form.name, form.rank))
+
+    # Generate code
+    info("Generating assembly drivers")
+    code = generate_assembly_code(prefix, capsules)
+    code += "\n\n"
+    end()
+
+    return code
+
 def _encapsulate(prefix, object_names, analysis, parameters):
 
     # Extract data from analysis
@@ -250,7 +250,9 @@ def run_install():
     ext_module_ufc = Extension("ufc._ufc",
                                sources=[os.path.join("ufc", "ufc.i")],
                                depends=[os.path.join("ufc", "ufc.h"),
-                                        os.path.join("ufc", "ufc_geometry.h")],
+                                        os.path.join("ufc", "ufc_geometry.h"),
+                                        os.path.join("ufc", "ufc_gemm.h"),
+                                        os.path.join("ufc", "ufc_assembly.h")],
                                swig_opts=swig_options,
                                extra_compile_args=CXX_FLAGS.split(),
                                include_dirs=[os.path.join("ufc")])
@@ -272,6 +274,7 @@ def run_install():
                               "ffc.uflacsrepr",
                               "ffc.errorcontrol",
                               "ffc.backends",
+                              "ffc.backends.assembly",
                               "ffc.backends.dolfin",
                               "ffc.backends.ufc",
                               "ufc"],
@@ -285,7 +288,9 @@ def run_install():
                                [os.path.join("doc", "man", "man1", "ffc.1.gz")]),
                               (os.path.join("include"),
                                [os.path.join("ufc", "ufc.h"),
-                                os.path.join("ufc", "ufc_geometry.h")]),
+                                os.path.join("ufc", "ufc_geometry.h"),
+                                os.path.join("ufc", "ufc_gemm.h"),
+                                os.path.join("ufc", "ufc_assembly.h")]),
                               (os.path.join("share", "ufc"),
                                [os.path.join("cmake", "templates", \
                                              "UFCConfig.cmake"),
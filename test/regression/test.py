@@ -62,6 +62,10 @@ ext_quad = [\
 "-r quadrature -O -fprecompute_basis_const",
 "-r quadrature -O -fprecompute_ip_const -feliminate_zeros",
 "-r quadrature -O -fprecompute_basis_const -feliminate_zeros",
+"-r quadrature -O -fsum_factorization",
+"-r quadrature -O -fsum_factorization -feliminate_zeros",
+"-r quadrature -O -fsimd_width=4",
+"-r quadrature -fblas",
 ]
 
 # Extended uflacs tests (to be extended with optimisation parameters later)
@@ -377,6 +377,26 @@ void test_dofmap(ufc::dofmap& dofmap, ufc::shape cell_shape, int id,
   dofmap.tabulate_dofs(dofs, num_entities, c);
   printer.print_array("tabulate_dofs", dofmap.local_dimension(), dofs);
 
+  // dof_entity_incidence and tabulate_dof_offsets (only printed if the
+  // dofs computed from the incidence differ from tabulate_dofs)
+  {
+    const std::size_t* incidence = dofmap.dof_entity_incidence();
+    std::vector<std::size_t> offsets(n);
+    dofmap.tabulate_dof_offsets(offsets.data(), num_entities);
+    std::vector<std::size_t> incidence_dofs(n);
+    bool equal = true;
+    for (std::size_t i = 0; i < n; i++)
+    {
+      const std::size_t* dkn = incidence + 4*i;
+      incidence_dofs[i] = offsets[i] + dkn[3];
+      if (dkn[2] > 0)
+        incidence_dofs[i] += dkn[2]*c.entity_indices[dkn[0]][dkn[1]];
+      equal = equal && incidence_dofs[i] == dofs[i];
+    }
+    if (!equal)
+      printer.print_vector("dof_entity_incidence", incidence_dofs);
+  }
+
   // tabulate_facet_dofs
   for (std::size_t facet = 0; facet < num_facets; facet++)
   {
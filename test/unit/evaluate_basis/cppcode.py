@@ -69,6 +69,7 @@ evaluate_basis_code_fiat = """\
 #include <iostream>
 #include <ufc.h>
 #include <cstdlib>
+#include <cmath>
 #include "test.h"
 
 int main(int argc, char* argv[])
@@ -136,6 +137,28 @@ int main(int argc, char* argv[])
       }
       std::cout << std::endl;
     }
+
+    // Check that evaluate_basis_all_points gives the same values for
+    // all points at once.
+    unsigned int num_point_vals = element.space_dimension()*num_dof_vals;
+    double* point_values = new double[%(num_points)d*num_point_vals];
+    element.evaluate_basis_all_points(%(num_points)d, point_values, &points[0][0], vertex_coordinates, 0);
+    for (unsigned int p = 0; p < %(num_points)d; p++)
+    {
+      for (unsigned int i = 0; i < element.space_dimension(); i++)
+      {
+        element.evaluate_basis(i, dof_values, points[p], vertex_coordinates, 0);
+        for (unsigned int j = 0; j < num_dof_vals; j++)
+        {
+          if (std::abs(point_values[p*num_point_vals + i*num_dof_vals + j] - dof_values[j]) > 1e-12)
+          {
+            std::cerr << "evaluate_basis_all_points differs from evaluate_basis" << std::endl;
+            return 1;
+          }
+        }
+      }
+    }
+    delete [] point_values;
   }
   else
   {
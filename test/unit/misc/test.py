@@ -28,19 +28,93 @@ import numpy
 import math
 import os
 import instant
+import shutil
+import tempfile
+import subprocess
+import json
 from time import time
 
 sys.path.append(os.path.join(os.pardir, os.pardir))
 
 from ufl import *
+from ufl.algorithms import load_ufl_file
 from ffc.fiatinterface import create_element as create
+from ffc.fiatinterface import (tabulate_element, map_facet_points,
+                               set_tabulation_cache_parameters)
+from ffc.fiatinterface import create_quadrature as create_fiat_quadrature
+from ffc.quadrature_schemes import create_quadrature
+from ffc.utils import LRUCache
 from ffc import jit
+from ffc.cache import CodeCache
+from ffc.bench import parse_configuration, compare_results, operation_counts
+from ffc.parameters import default_parameters
+from ffc.compiler import compile_form
+from ffc.analysis import analyze_forms
+from ffc.jitobject import _parameters_signature
+from ffc.cpp import format, set_float_formatting
+from ffc.quadrature.quadratureutils import unique_tables, unique_psi_tables
+from ffc.profiling import start_profiling, stop_profiling, profile_section, profile_record
+from ffc.tensor.tensoroptimization import _optimize_tensor_contraction
+from ffc.tensor.tensorreduction import contraction_matrix, reduce_contraction
+from ffc.tensor.multiindex import MultiIndex
+from ffc.costmodel import (calibrate, predict_times, autotune, TuningDatabase,
+                           open_tuning_database, _decision_key)
+from ffc.tabulate import (tabulate_cell_tensor, tabulate_cell_tensors,
+                          tabulate_exterior_facet_tensor,
+                          tabulate_exterior_facet_tensors,
+                          tabulate_interior_facet_tensor)
+
+try:
+    import ufc_benchmark
+except ImportError:
+    ufc_benchmark = None
 
 interval = [(0,), (1,)]
 triangle = [(0, 0), (1, 0), (0, 1)]
 tetrahedron = [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)]
 num_points = 5
 
+# Directory of demo forms of this source tree
+demo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, os.pardir, os.pardir, "demo")
+
+def generate_header(forms, prefix, parameters, object_names={}):
+    "Compile forms and return the generated header file as a string."
+    directory = tempfile.mkdtemp()
+    try:
+        p = default_parameters()
+        p.update(parameters)
+        p["output_dir"] = directory
+        compile_form(forms, object_names, prefix, p)
+        return open(os.path.join(directory, prefix + ".h")).read()
+    finally:
+        shutil.rmtree(directory)
+
+# Directory of the UFC headers of this source tree
+ufc_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir, os.pardir, os.pardir, "ufc")
+
+def run_program(headers, main, flags=()):
+    """Compile a C++ program from the given headers (a dict from file
+    name to code) and main program against the UFC headers of this
+    source tree, run it and return its output."""
+    directory = tempfile.mkdtemp()
+    try:
+        for (name, code) in list(headers.items()) + [("main.cpp", main)]:
+            with open(os.path.join(directory, name), "w") as f:
+                f.write(code)
+        program = os.path.join(directory, "main")
+        command = [os.environ.get("CXX", "g++"), "-std=c++11",
+                   "-I" + directory, "-I" + ufc_dir] + list(flags) + \
+                  ["-o", program, os.path.join(directory, "main.cpp")]
+        try:
+            subprocess.check_call(command)
+        except OSError:
+            raise unittest.SkipTest("No C++ compiler found.")
+        return subprocess.check_output([program], universal_newlines=True)
+    finally:
+        shutil.rmtree(directory)
+
 def random_point(shape):
     w = numpy.random.random(len(shape))
     return sum([numpy.array(shape[i])*w[i] for i in range(len(shape))]) / sum(w)
@@ -360,5 +434,914 @@ class JITTests(unittest.TestCase):
         self.assertTrue(dt0 < 10*dt0_good)
         self.assertTrue(dt1 < 10*dt1_good)
 
+class TabulateTensorTests(unittest.TestCase):
+
+    def testMassMatrix(self):
+        "Test tabulation of element tensors from NumPy arrays."
+        element = FiniteElement("Lagrange", "triangle", 1)
+        v = TestFunction(element)
+        u = TrialFunction(element)
+        f = Coefficient(element)
+        form, module, prefix = jit(f*u*v*dx + f*u*v*ds,
+                                   {"log_level": WARNING})
+
+        # Cells scaled by 1, 2, 3, with f = 1
+        x = numpy.array([numpy.array(triangle)*(c + 1) for c in range(3)],
+                        dtype=float)
+        w = numpy.ones((3, 3))
+        A = tabulate_cell_tensors(form, x, [w])
+        M = (numpy.ones((3, 3)) + numpy.eye(3)) / 24.0
+        for c in range(3):
+            self.assertTrue(numpy.allclose(A[c], (c + 1)**2*M))
+
+        # Single cell, written in place in a row of the batch
+        tabulate_cell_tensor(form, x[0], [w[0]], A=A[2])
+        self.assertTrue(numpy.allclose(A[2], M))
+
+        # Facet 0 of each cell has length sqrt(2)*(c + 1)
+        A = tabulate_exterior_facet_tensors(form, x, [0, 0, 0], [w])
+        for c in range(3):
+            self.assertAlmostEqual(A[c].sum(), numpy.sqrt(2)*(c + 1))
+
+    def testFacetSymmetry(self):
+        """Test that the facet tensors of the tensor representation,
+        computed by symmetry from the first facet, match quadrature."""
+        element = FiniteElement("Discontinuous Lagrange", "tetrahedron", 2)
+        v = TestFunction(element)
+        u = TrialFunction(element)
+        n = FacetNormal(element.cell())
+        a = inner(jump(grad(u), n), avg(v))*dS + u.dx(0)*v*ds + inner(grad(u), grad(v))*ds
+        forms = [jit(a, {"representation": r, "log_level": WARNING})[0]
+                 for r in ("tensor", "quadrature")]
+        x = numpy.array([[0.0, 0.0, 0.0], [1.0, 0.2, 0.0],
+                         [0.1, 1.0, 0.3], [0.2, 0.1, 0.9]])
+        for f0 in range(4):
+            A, B = [tabulate_exterior_facet_tensor(form, x, f0) for form in forms]
+            self.assertTrue(numpy.allclose(A, B))
+            for f1 in range(4):
+                # Neighbour by reflecting vertex f0 through the facet midpoint
+                y = x.copy()
+                y[f0] = x[f1]
+                y[f1] = 2*numpy.delete(x, f0, axis=0).mean(axis=0) - x[f0]
+                A, B = [tabulate_interior_facet_tensor(form, (x, y), (f0, f1))
+                        for form in forms]
+                self.assertTrue(numpy.allclose(A, B))
+
+    def testOptimizedTensorContraction(self):
+        """Test that the optimized tensor contraction (-O) gives the
+        same element tensors as the standard contraction."""
+        element = FiniteElement("Lagrange", "triangle", 2)
+        v = TestFunction(element)
+        u = TrialFunction(element)
+        f = Coefficient(element)
+        a = f*inner(grad(u), grad(v))*dx + f*u*v*ds
+        forms = [jit(a, {"representation": "tensor", "optimize": o,
+                         "log_level": WARNING})[0] for o in (False, True)]
+        x = numpy.array([[0.0, 0.0], [1.0, 0.2], [0.1, 1.0]])
+        w = numpy.linspace(1.0, 2.0, 6)
+        A, B = [tabulate_cell_tensor(form, x, [w]) for form in forms]
+        self.assertTrue(numpy.allclose(A, B))
+        for facet in range(3):
+            A, B = [tabulate_exterior_facet_tensor(form, x, facet, [w])
+                    for form in forms]
+            self.assertTrue(numpy.allclose(A, B))
+
+    def testSimdWidth(self):
+        """Test that aligned and padded tables (-fsimd_width) give the
+        same element tensors as the unpadded tables."""
+        element = FiniteElement("Lagrange", "triangle", 2)
+        v = TestFunction(element)
+        u = TrialFunction(element)
+        f = Coefficient(element)
+        a = f*inner(grad(u), grad(v))*dx + f*u*v*ds
+        x = numpy.array([[0.0, 0.0], [1.0, 0.2], [0.1, 1.0]])
+        w = numpy.linspace(1.0, 2.0, 6)
+        for parameters in ({}, {"eliminate_zeros": True}):
+            forms = []
+            for simd_width in (0, 4):
+                p = {"representation": "quadrature", "optimize": True,
+                     "simd_width": simd_width, "log_level": WARNING}
+                p.update(parameters)
+                forms.append(jit(a, p)[0])
+            A, B = [tabulate_cell_tensor(form, x, [w]) for form in forms]
+            self.assertTrue(numpy.allclose(A, B))
+            for facet in range(3):
+                A, B = [tabulate_exterior_facet_tensor(form, x, facet, [w])
+                        for form in forms]
+                self.assertTrue(numpy.allclose(A, B))
+
+    def testSimdWidthCompiles(self):
+        """Test that code generated with -fsimd_width compiles with
+        warnings as errors, with and without OpenMP."""
+        element = FiniteElement("Lagrange", "triangle", 2)
+        v = TestFunction(element)
+        u = TrialFunction(element)
+        a = inner(grad(u), grad(v))*dx
+        header = generate_header([a], "Simd", {"representation": "quadrature",
+                                               "optimize": True,
+                                               "simd_width": 4})
+        main = """
+#include "Simd.h"
+
+int main()
+{
+  return 0;
+}
+"""
+        flags = ("-Wall", "-Werror", "-pedantic")
+        for extra in ((), ("-fopenmp",)):
+            run_program({"Simd.h": header}, main, flags + extra)
+
+@unittest.skipIf(ufc_benchmark is None, "ufc_benchmark is not available.")
+class BulkDofmapTests(unittest.TestCase):
+
+    # Two cells of the unit square, the vertices of the second unsorted
+    cells = numpy.array([[0, 1, 2], [1, 3, 2]])
+
+    def testComputeEntities(self):
+        "Test numbering of the edges and cells of a mesh."
+        entities, num_edges = ufc_benchmark.compute_entities(self.cells, 1)
+        self.assertEqual(num_edges, 5)
+        edges = {}
+        for (c, cell) in enumerate(numpy.sort(self.cells, axis=1)):
+            for k in range(3):
+                # Edge k is opposite to vertex k
+                edge = tuple(numpy.delete(cell, k))
+                self.assertEqual(edges.setdefault(entities[c, k], edge), edge)
+        self.assertEqual(len(edges), 5)
+        entities, num_cells = ufc_benchmark.compute_entities(self.cells, 2)
+        self.assertEqual(num_cells, 2)
+        self.assertEqual(entities.tolist(), [[0], [1]])
+
+    def testTabulateAllDofs(self):
+        "Test that the dofs of all cells follow the UFC numbering."
+        P1 = FiniteElement("Lagrange", triangle, 1)
+        P2 = FiniteElement("Lagrange", triangle, 2)
+        V = VectorElement("Lagrange", triangle, 1)
+        R = FiniteElement("Real", triangle, 0)
+        vertices = numpy.sort(self.cells, axis=1)
+        edges = ufc_benchmark.compute_entities(self.cells, 1)[0]
+        for (element, dofs, dim) in \
+                ((P2, numpy.hstack((vertices, 4 + edges)), 9),
+                 (V, numpy.hstack((vertices, 4 + vertices)), 8),
+                 (P1*R, numpy.hstack((vertices, [[4], [4]])), 5)):
+            v = TestFunction(element)
+            L = v[0]*dx if element.value_shape() else v*dx
+            form = jit(L, {"log_level": WARNING})[0]
+            result = ufc_benchmark.tabulate_all_dofs(form.create_dofmap(0),
+                                                     self.cells, 4)
+            self.assertEqual(result[0].tolist(), dofs.tolist())
+            self.assertEqual(result[1], dim)
+
+    def testComputeSparsityPattern(self):
+        "Test the sparsity pattern of a mass matrix."
+        element = FiniteElement("Lagrange", triangle, 1)
+        form = jit(TrialFunction(element)*TestFunction(element)*dx,
+                   {"log_level": WARNING})[0]
+        row_offsets, columns = \
+            ufc_benchmark.compute_sparsity_pattern(form, self.cells, 4)
+        self.assertEqual(row_offsets.tolist(), [0, 3, 7, 11, 14])
+        self.assertEqual(columns.tolist(), [0, 1, 2, 0, 1, 2, 3,
+                                            0, 1, 2, 3, 1, 2, 3])
+
+class DofmapTests(unittest.TestCase):
+
+    def testDofTable(self):
+        """Test that table-driven tabulate_dofs and tabulate_dof_offsets
+        (-fdof_table_threshold) give the dofs of the unrolled code."""
+        P1 = FiniteElement("Lagrange", triangle, 1)
+        P2 = VectorElement("Lagrange", triangle, 2)
+        R = FiniteElement("Real", triangle, 0)
+        main = """
+#include <cstdio>
+#include <vector>
+#include "Table.h"
+#include "Unrolled.h"
+
+void print(const ufc::dofmap& dofmap)
+{
+  std::vector<std::size_t> num_entities(3);
+  num_entities[0] = 8;
+  num_entities[1] = 20;
+  num_entities[2] = 12;
+  ufc::cell c;
+  c.cell_shape = ufc::triangle;
+  c.topological_dimension = 2;
+  c.geometric_dimension = 2;
+  c.entity_indices.resize(3, std::vector<std::size_t>(3));
+  c.entity_indices[0][0] = 1;
+  c.entity_indices[0][1] = 4;
+  c.entity_indices[0][2] = 6;
+  c.entity_indices[1][0] = 9;
+  c.entity_indices[1][1] = 2;
+  c.entity_indices[1][2] = 17;
+  c.entity_indices[2][0] = 5;
+  c.index = 5;
+  const std::size_t n = dofmap.local_dimension();
+  std::vector<std::size_t> dofs(n);
+  std::vector<std::size_t> offsets(n);
+  dofmap.tabulate_dofs(&dofs[0], num_entities, c);
+  dofmap.tabulate_dof_offsets(&offsets[0], num_entities);
+  for (std::size_t i = 0; i < n; i++)
+    std::printf("%d %d ", (int) dofs[i], (int) offsets[i]);
+  std::printf("\\n");
+}
+
+int main()
+{
+  table_form_0 table;
+  unrolled_form_0 unrolled;
+  ufc::dofmap* dofmap = table.create_dofmap(0);
+  print(*dofmap);
+  delete dofmap;
+  dofmap = unrolled.create_dofmap(0);
+  print(*dofmap);
+  delete dofmap;
+  return 0;
+}
+"""
+        for element in (P2*P1, P2, P1*R):
+            v = TestFunction(element)
+            L = v[0]*dx if element.value_shape() else v*dx
+            headers = {}
+            for (prefix, threshold) in (("Table", 1), ("Unrolled", 0)):
+                headers[prefix + ".h"] = \
+                    generate_header([L], prefix, {"dof_table_threshold": threshold})
+            self.assertTrue("dof_blocks" in headers["Table.h"])
+            self.assertFalse("dof_blocks" in headers["Unrolled.h"])
+            table, unrolled = run_program(headers, main).split("\n")[:2]
+            self.assertEqual(table, unrolled)
+
+class CustomIntegralTests(unittest.TestCase):
+
+    def testWorkspace(self):
+        """Test that repeated calls to tabulate_tensor of a custom
+        integral, with the same or other quadrature points in the same
+        buffer, give the element tensors of a fresh integral object."""
+        element = FiniteElement("Lagrange", triangle, 2)
+        v = TestFunction(element)
+        u = TrialFunction(element)
+        f = Coefficient(FiniteElement("Lagrange", triangle, 1))
+        a = f*inner(grad(u), grad(v))*dc(0, metadata={"num_cells": 1}) \
+            + f*u*v*dc(0, metadata={"num_cells": 1})
+        header = generate_header([a], "CustomWorkspace",
+                                 {"representation": "quadrature"})
+        main = """
+#include <algorithm>
+#include <cmath>
+#include <cstdio>
+#include <vector>
+#include "CustomWorkspace.h"
+
+std::vector<double> tabulate(const ufc::custom_integral& integral,
+                             const std::vector<double>& points)
+{
+  const double x[6] = {0.0, 0.0, 1.0, 0.2, 0.1, 1.0};
+  const double f[3] = {1.0, 2.0, 3.0};
+  const double* w[1] = {f};
+  const std::size_t n = points.size() / 2;
+  std::vector<double> weights(n, 0.5 / n);
+  std::vector<double> A(36);
+  integral.tabulate_tensor(&A[0], w, x, n, &points[0], &weights[0], 0, 0);
+  return A;
+}
+
+int main()
+{
+  // Same points, other points, fewer points and the first points again
+  const double p[5][4] = {{0.3, 0.3, 0.5, 0.4}, {0.3, 0.3, 0.5, 0.4},
+                          {0.2, 0.5, 0.6, 0.3}, {0.4, 0.4, 0.0, 0.0},
+                          {0.3, 0.3, 0.5, 0.4}};
+  const std::size_t n[5] = {2, 2, 2, 1, 2};
+
+  customworkspace_form_0 form;
+  ufc::custom_integral* integral = form.create_custom_integral(0);
+  std::vector<double> points;
+  for (std::size_t i = 0; i < 5; i++)
+  {
+    points.assign(p[i], p[i] + 2*n[i]);
+    const std::vector<double> A = tabulate(*integral, points);
+    ufc::custom_integral* fresh = form.create_custom_integral(0);
+    const std::vector<double> B = tabulate(*fresh, points);
+    delete fresh;
+    double diff = 0.0;
+    double sum = 0.0;
+    for (std::size_t j = 0; j < A.size(); j++)
+    {
+      diff = std::max(diff, std::abs(A[j] - B[j]));
+      sum += std::abs(A[j]);
+    }
+    std::printf("%.16e %.16e\\n", diff, sum);
+  }
+  delete integral;
+  return 0;
+}
+"""
+        output = run_program({"CustomWorkspace.h": header}, main)
+        diffs, sums = zip(*[[float(x) for x in line.split()]
+                            for line in output.split("\n") if line])
+        self.assertEqual(diffs, (0.0,)*5)
+        self.assertEqual(sums[0], sums[1])
+        self.assertEqual(sums[0], sums[4])
+        self.assertNotAlmostEqual(sums[0], sums[2])
+        self.assertNotAlmostEqual(sums[0], sums[3])
+
+def reference_unique_tables(tables):
+    """Remove redundant tables by comparing all pairs of tables (the
+    original implementation of unique_tables)."""
+    eps = format["epsilon"]
+    name_map = {}
+    inverse_name_map = {}
+    names = sorted(tables.keys())
+    for (i, name0) in enumerate(names):
+        if name0 in inverse_name_map:
+            continue
+        for name1 in names[i + 1:]:
+            if name1 in inverse_name_map:
+                continue
+            val0, val1 = tables[name0], tables[name1]
+            if numpy.shape(val0) == numpy.shape(val1) and len(val0) > 0 and \
+                   abs(val0 - val1).max() < eps:
+                name_map.setdefault(name0, []).append(name1)
+                inverse_name_map[name1] = name0
+    for name in names:
+        if not name in inverse_name_map:
+            inverse_name_map[name] = name
+    return name_map, inverse_name_map
+
+class QuadratureTablesTests(unittest.TestCase):
+
+    def setUp(self):
+        set_float_formatting(15)
+
+    def testUniqueTables(self):
+        "Test that unique_tables gives the same maps as comparing all pairs."
+        eps = format["epsilon"]
+        base = numpy.array([[0.25, -0.5, 1.0], [0.75, 0.0, -2.0]])
+        tables = {"FE0": base,
+                  "FE1": base + 0.9*eps,               # duplicate within epsilon
+                  "FE2": base + 1.1*eps*(base != 0.0), # not a duplicate
+                  "FE3": -base,                        # negated table
+                  "FE4": numpy.zeros((2, 3)),
+                  "FE5": 0.9*eps*numpy.ones((2, 3)),   # zero within epsilon
+                  "FE6": -0.9*eps*numpy.ones((2, 3)),  # not within epsilon of FE5
+                  "FE7": base.reshape(3, 2),           # same values, other shape
+                  "FE8": numpy.zeros((0, 3))}
+        name_map, inverse_name_map = unique_tables(dict(tables))
+        self.assertEqual((name_map, inverse_name_map), reference_unique_tables(tables))
+        self.assertEqual(name_map, {"FE0": ["FE1"], "FE4": ["FE5", "FE6"]})
+
+        # Random tables with duplicates close to the epsilon boundary
+        rng = numpy.random.RandomState(0)
+        values = [rng.randint(-2, 3, (3, 4))*0.5 for i in range(5)]
+        for n in range(10):
+            tables = {}
+            for i in range(40):
+                perturbation = rng.choice([0.0, 0.45, -0.45, 0.55, 1.1])*eps
+                tables["FE%d" % i] = values[rng.randint(5)] + \
+                                     perturbation*rng.randint(0, 2, (3, 4))
+            self.assertEqual(unique_tables(dict(tables)),
+                             reference_unique_tables(tables))
+
+    def testUniquePsiTables(self):
+        "Test zero, one and non-zero column information of unique psi tables."
+        eps = format["epsilon"]
+        tables = {"FE0": numpy.array([[-1.0, 0.0, 1.0], [-1.0, 0.0, 1.0]]),
+                  "FE1": numpy.array([[-1.0, 1.0, 0.0], [-1.0, 1.0, 0.5*eps]]),
+                  "FE2": numpy.array([[0.0, 2.0, 0.0], [3.0, 0.0, 0.0]]),
+                  "FE3": numpy.array([[0.5*eps, -0.5*eps, 0.0]]),
+                  "FE4": numpy.array([[1.0, 1.0, 1.0 - 0.5*eps]]),
+                  "FE5": numpy.array([[0.0, 1.0, 0.0]]),
+                  "FE6": numpy.array([[1.0, -1.0, 0.0], [1.0, -1.0, 0.0]])}
+        name_map, unique = unique_psi_tables(dict(tables), False)
+        self.assertEqual(name_map, {"FE0": ("FE0", (), False, False),
+                                    "FE1": ("FE1", (), False, False),
+                                    "FE2": ("FE2", (), False, False),
+                                    "FE3": ("FE3", (), True, False),
+                                    "FE4": ("FE4", (), False, True),
+                                    "FE5": ("FE5", (), False, False),
+                                    "FE6": ("FE6", (), False, False)})
+        self.assertEqual(unique["FE3"].tolist(), [[0.0, 0.0, 0.0]])
+
+        # Compressed tables of FE0 and FE1 become equal, the compressed
+        # table of FE5 contains only ones and the negated compressed
+        # table of FE6 is kept
+        name_map, unique = unique_psi_tables(dict(tables), True)
+        self.assertEqual(name_map, {"FE0": ("FE0", (0, [0, 2]), False, False),
+                                    "FE1": ("FE0", (1, [0, 1]), False, False),
+                                    "FE2": ("FE2", (2, [0, 1]), False, False),
+                                    "FE3": ("FE3", (), True, False),
+                                    "FE4": ("FE4", (), False, True),
+                                    "FE5": ("FE5", (3, [1]), False, True),
+                                    "FE6": ("FE6", (4, [0, 1]), False, False)})
+        self.assertEqual(sorted(unique.keys()), ["FE0", "FE2", "FE3", "FE4", "FE5", "FE6"])
+        self.assertEqual(unique["FE0"].tolist(), [[-1.0, 1.0], [-1.0, 1.0]])
+        self.assertEqual(unique["FE2"].tolist(), [[0.0, 2.0], [3.0, 0.0]])
+
+class TabulationCacheTests(unittest.TestCase):
+
+    def tearDown(self):
+        set_tabulation_cache_parameters(default_parameters())
+
+    def testTabulateElement(self):
+        "Test that cached tabulations are copies and keyed by element, order and points."
+        P1 = FiniteElement("Lagrange", triangle, 1)
+        P2 = FiniteElement("Lagrange", triangle, 2)
+        points, weights = create_quadrature("triangle", 2)
+        reference = create(P2).tabulate(1, points)
+
+        directory = tempfile.mkdtemp()
+        try:
+            parameters = default_parameters()
+            parameters["tabulation_cache_dir"] = directory
+            for size in (256, 0):
+                parameters["tabulation_cache_size"] = size
+                set_tabulation_cache_parameters(parameters)
+                for i in range(2):
+                    table = tabulate_element(P2, 1, points)
+                    self.assertEqual(sorted(table.keys()), sorted(reference.keys()))
+                    for derivatives in reference:
+                        self.assertTrue(numpy.all(table[derivatives] == reference[derivatives]))
+                        table[derivatives][:] = 0.0
+        finally:
+            shutil.rmtree(directory)
+
+        # Different elements, orders and points
+        self.assertEqual(tabulate_element(P1, 1, points)[(0, 0)].shape, (3, len(points)))
+        self.assertEqual(sorted(tabulate_element(P2, 0, points).keys()), [(0, 0)])
+        facet_points = [map_facet_points(create_fiat_quadrature("interval", 2)[0], f)
+                        for f in range(3)]
+        tables = [tabulate_element(P2, 0, x)[(0, 0)] for x in facet_points]
+        for f in range(3):
+            self.assertTrue(numpy.all(tables[f] == create(P2).tabulate(0, facet_points[f])[(0, 0)]))
+        self.assertFalse(numpy.allclose(tables[0], tables[1]))
+
+    def testQuadratureRules(self):
+        "Test that cached quadrature rules are read-only and keyed by shape, degree and scheme."
+        for (shape, degree, scheme) in (("triangle", 2, "default"), ("triangle", 4, "default"),
+                                        ("triangle", 1, "vertex"), ("tetrahedron", 2, "default")):
+            points, weights = create_quadrature(shape, degree, scheme)
+            self.assertRaises(ValueError, points.__setitem__, 0, 0.0)
+            self.assertRaises(ValueError, weights.__setitem__, 0, 0.0)
+            self.assertTrue(create_quadrature(shape, degree, scheme)[0] is points)
+        self.assertEqual(len(create_quadrature("triangle", 1, "vertex")[1]), 3)
+        self.assertNotEqual(len(create_quadrature("triangle", 2)[1]),
+                            len(create_quadrature("triangle", 4)[1]))
+        self.assertNotEqual(create_quadrature("triangle", 2)[0].shape,
+                            create_quadrature("tetrahedron", 2)[0].shape)
+        self.assertNotEqual(len(create_fiat_quadrature("triangle", 2)[1]),
+                            len(create_fiat_quadrature("triangle", 3)[1]))
+
+        # Points mapped to facets
+        points = create_fiat_quadrature("triangle", 2)[0]
+        vertices = [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)]
+        for facet in range(4):
+            mapped = map_facet_points(points, facet)
+            self.assertRaises(ValueError, mapped.__setitem__, 0, 0.0)
+            v = [numpy.array(vertices[i]) for i in range(4) if i != facet]
+            for (x, y) in zip(points, mapped):
+                self.assertTrue(numpy.allclose(y, (1.0 - x[0] - x[1])*v[0] + x[0]*v[1] + x[1]*v[2]))
+
+        # Caches are bounded by the size of the tabulation cache
+        parameters = default_parameters()
+        parameters["tabulation_cache_size"] = 0
+        set_tabulation_cache_parameters(parameters)
+        points, weights = create_quadrature("triangle", 6)
+        self.assertFalse(create_quadrature("triangle", 6)[0] is points)
+
+    def testLRUCache(self):
+        "Test eviction of least recently used values."
+        cache = LRUCache(2*2*5*8)
+        for key in "abc":
+            cache.put(key, (numpy.zeros(5), numpy.zeros(5)))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("a"), None)
+        cache.get("b")
+        cache.put("d", {"x": numpy.zeros(10)})
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("c"), None)
+        self.assertTrue(cache.get("b") is not None)
+        cache.max_bytes = 0
+        cache.evict()
+        self.assertEqual(len(cache), 0)
+
+class TensorOptimizationTests(unittest.TestCase):
+
+    def testOptimizeTensorContraction(self):
+        "Test that optimized tensor contractions reproduce A0 : GK."
+        rng = numpy.random.RandomState(0)
+        A0 = numpy.round(rng.randn(6, 6, 2, 2), 1)
+        A0[abs(A0) < 0.5] = 0.0
+        A0[3, 1] = -2.0*A0[0, 4]
+        A0[5, 5] = A0[2, 2]
+        A0[4, 0] = A0[1, 3]
+        A0[4, 0, 1, 1] += 0.5
+        contraction = _optimize_tensor_contraction(A0, 2, 1e-14)
+        self.assertEqual(sorted(i for ((t, i), rhs) in contraction),
+                         list(range(36)))
+        self.assertTrue(sum(len(rhs) for (lhs, rhs) in contraction)
+                        < numpy.count_nonzero(A0))
+
+        # Evaluate contraction for random geometry tensor
+        GK = rng.randn(4)
+        A = {}
+        for ((t, i), rhs) in contraction:
+            A[i] = sum(c*(A[k] if rtype == 0 else GK[k]) for (c, rtype, k) in rhs)
+        A = numpy.array([A[i] for i in range(36)])
+        self.assertTrue(numpy.allclose(A, numpy.dot(A0.reshape(36, 4), GK)))
+
+    def testReduceContraction(self):
+        "Test that reduced tensor contractions reproduce M*g."
+        class ReferenceTensor(object):
+            def __init__(self, A0):
+                self.A0 = A0
+                self.primary_multi_index = MultiIndex([list(range(6))])
+        rng = numpy.random.RandomState(0)
+        A0 = numpy.round(rng.randn(6, 2, 2), 1)
+        B0 = numpy.round(rng.randn(6, 2), 1)
+        B0[:, 0] = -2.0*A0[:, 0, 0]
+        B0[:, 1] = A0[:, 0, 1] + 0.5*A0[:, 1, 0]
+        for X0 in (A0, B0):
+            X0[3] = 3.0*X0[0]
+            X0[5] = X0[1] - X0[2]
+        terms = [(ReferenceTensor(A0), None, None),
+                 (ReferenceTensor(B0), None, None)]
+        M = contraction_matrix(terms, 1e-14)
+        self.assertEqual(M.shape, (6, 6))
+        combinations, rows = reduce_contraction(M, 1e-14)
+        self.assertEqual(rows[3], [(3.0, 0, 0)])
+        self.assertTrue(sum(len(c) for c in combinations) +
+                        sum(len(r) for r in rows) < numpy.count_nonzero(M))
+
+        # Evaluate reduced contraction for random geometry tensor
+        g = rng.randn(6)
+        G = [sum(c*g[a] for (c, a) in combination)
+             for combination in combinations]
+        A = []
+        for row in rows:
+            A.append(sum(c*(A[k] if rtype == 0 else G[k]) for (c, rtype, k) in row))
+        self.assertTrue(numpy.allclose(A, numpy.dot(M, g)))
+
+class CompileCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def testGetPut(self):
+        "Test storing and retrieving generated code."
+        cache = CodeCache(self.cache_dir, 1024**2)
+        code = ([{"classname": "foo", "signature": "return 0;"}], [], [], [])
+        self.assertEqual(cache.get("a"), None)
+        cache.put("a", code)
+        self.assertEqual(cache.get("a"), code)
+
+    def testEviction(self):
+        "Test that least recently used entries are evicted first."
+        cache = CodeCache(self.cache_dir, 2500)
+        cache.put("a", "x"*1000)
+        cache.put("b", "x"*1000)
+
+        # Make 'a' older than 'b', then use 'a'
+        os.utime(os.path.join(self.cache_dir, "a.ffccache"), (0, 0))
+        os.utime(os.path.join(self.cache_dir, "b.ffccache"), (1, 1))
+        self.assertNotEqual(cache.get("a"), None)
+
+        # Adding 'c' should evict 'b' only
+        cache.put("c", "x"*1000)
+        self.assertNotEqual(cache.get("a"), None)
+        self.assertEqual(cache.get("b"), None)
+        self.assertNotEqual(cache.get("c"), None)
+
+    def testAssemblyDriver(self):
+        """Test that assembly drivers are generated for code from the
+        compile cache."""
+        element = FiniteElement("Lagrange", "triangle", 1)
+        v = TestFunction(element)
+        u = TrialFunction(element)
+        a = u*v*dx
+        L = v*dx
+        parameters = {"assembly_driver": True,
+                      "compile_cache_dir": self.cache_dir}
+        headers = [generate_header([a, L], "Driver", parameters,
+                                   {id(a): "a", id(L): "L"})
+                   for i in range(2)]
+        self.assertEqual(headers[0], headers[1])
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        self.assertTrue("namespace Driver_assembly" in headers[1])
+
+class AssemblyDriverTests(unittest.TestCase):
+
+    def testStrategies(self):
+        """Test that assembly with OpenMP threads, for both colored and
+        buffered strategies, gives the serial result."""
+        element = FiniteElement("Lagrange", "triangle", 2)
+        P1 = FiniteElement("Lagrange", "triangle", 1)
+        v = TestFunction(element)
+        u = TrialFunction(element)
+        f = Coefficient(P1)
+        a = f*u*v*dx + u*v*ds
+        L = f*v*dx + v*ds
+        header = generate_header([a, L], "Driver", {"assembly_driver": True},
+                                 {id(a): "a", id(L): "L", id(f): "f"})
+        main = """
+#include <algorithm>
+#include <cmath>
+#include <cstdio>
+#include <omp.h>
+#include "Driver.h"
+
+int main()
+{
+  ufc_assembly::mesh mesh = ufc_assembly::unit_mesh(ufc::triangle, 8);
+  Driver_assembly::Assembler_L assembler(mesh);
+  std::vector<double> f(assembler.global_dimension(1));
+  for (std::size_t i = 0; i < f.size(); i++)
+    f[i] = 1.0 + 0.1*static_cast<double>(i % 7);
+  const std::vector<const double*> w(1, &f[0]);
+
+  // Serial result
+  omp_set_num_threads(1);
+  ufc_assembly::csr_matrix A;
+  std::vector<double> b;
+  Driver_assembly::assemble_a(A, mesh, w);
+  Driver_assembly::assemble_L(b, mesh, w);
+
+  // Maximum difference to serial result of each strategy
+  omp_set_num_threads(4);
+  const ufc_assembly::strategy strategies[2] = {ufc_assembly::colored,
+                                                ufc_assembly::buffered};
+  for (std::size_t k = 0; k < 2; k++)
+  {
+    ufc_assembly::csr_matrix A_k;
+    std::vector<double> b_k;
+    Driver_assembly::assemble_a(A_k, mesh, w, strategies[k]);
+    Driver_assembly::assemble_L(b_k, mesh, w, strategies[k]);
+    if (A_k.row_offsets != A.row_offsets || A_k.columns != A.columns ||
+        A_k.values.size() != A.values.size() || b_k.size() != b.size())
+    {
+      std::printf("-1 -1\\n");
+      continue;
+    }
+    double error_A = 0.0;
+    double error_b = 0.0;
+    for (std::size_t i = 0; i < A.values.size(); i++)
+      error_A = std::max(error_A, std::abs(A_k.values[i] - A.values[i]));
+    for (std::size_t i = 0; i < b.size(); i++)
+      error_b = std::max(error_b, std::abs(b_k[i] - b[i]));
+    std::printf("%.16e %.16e\\n", error_A, error_b);
+  }
+  return 0;
+}
+"""
+        output = run_program({"Driver.h": header}, main, flags=("-fopenmp",))
+        errors = [[float(x) for x in line.split()]
+                  for line in output.strip().split("\n")]
+        self.assertEqual(len(errors), 2)
+        for error_A, error_b in errors:
+            self.assertTrue(0.0 <= error_A < 1e-12)
+            self.assertTrue(0.0 <= error_b < 1e-12)
+
+class ProfilingTests(unittest.TestCase):
+
+    def testReport(self):
+        "Test structure of profiling report written as JSON."
+        start_profiling("Test")
+        with profile_section("stage", form=0):
+            with profile_section("integral", count_objects=True,
+                                 integral_type="cell", quadrature_degree=2):
+                data = [float(i) for i in range(100000)]
+                profile_record(num_operations=42)
+            with profile_section("integral", integral_type="exterior_facet"):
+                pass
+        report = stop_profiling()
+
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "Test_profile.json")
+            report.write(filename)
+            with open(filename) as f:
+                report = json.load(f)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(report["prefix"], "Test")
+        stage, cell, facet = report["sections"]
+        self.assertEqual([s["name"] for s in (stage, cell, facet)],
+                         ["stage", "integral", "integral"])
+        self.assertEqual([s["depth"] for s in (stage, cell, facet)], [0, 1, 1])
+        self.assertEqual(cell["labels"], {"form": 0, "integral_type": "cell",
+                                          "quadrature_degree": 2})
+        self.assertEqual(cell["values"], {"num_operations": 42})
+        self.assertTrue("num_objects" in cell and not "num_objects" in facet)
+        self.assertTrue(stage["time"] >= cell["time"] + facet["time"])
+        for section in (stage, cell, facet):
+            self.assertFalse(any(key.startswith("_") for key in section))
+            if section["peak_rss_increase"] is not None:
+                self.assertTrue(section["peak_rss_increase"] >= 0.0)
+        summary = report["summary"]
+        self.assertEqual(summary["sections"]["integral"]["count"], 2)
+        self.assertEqual(summary["integral_type"]["cell/integral"]["count"], 1)
+        self.assertEqual(summary["form"]["0/stage"]["count"], 1)
+        self.assertEqual(summary["form"].get("0/integral"), None)
+
+    def testPythonMemory(self):
+        "Test that peak memory allocated by Python is recorded per section."
+        try:
+            import tracemalloc
+            tracemalloc.reset_peak
+        except (ImportError, AttributeError):
+            return
+        tracemalloc.start()
+        try:
+            start_profiling()
+            with profile_section("stage"):
+                with profile_section("first"):
+                    data = [float(i) for i in range(100000)]
+                    del data
+                with profile_section("second"):
+                    pass
+            report = stop_profiling()
+        finally:
+            tracemalloc.stop()
+        stage, first, second = [s["python_peak_increase"] for s in report.sections]
+        self.assertTrue(first > 1.0)
+        self.assertTrue(second < 0.1*first)
+        self.assertTrue(stage >= first)
+
+class ParallelCompilationTests(unittest.TestCase):
+
+    def testNumProcesses(self):
+        "Test that generated code does not depend on the number of processes."
+        for name in ("HyperElasticity", "SubDomains"):
+            ufd = load_ufl_file(os.path.join(demo_dir, name + ".ufl"))
+            code = [generate_header(ufd.forms, name, {"num_processes": n},
+                                    ufd.object_names)
+                    for n in (1, 3)]
+            self.assertEqual(code[0], code[1])
+
+class CostModelTests(unittest.TestCase):
+
+    def testCalibrate(self):
+        "Test calibration of the cost model from measurements."
+        measurements = [{"representation": r, "num_operations": f,
+                         "time": a + b*f}
+                        for (r, a, b) in (("tensor", 1e-7, 2e-9),
+                                          ("quadrature", 5e-8, 1e-9))
+                        for f in (100, 1000, 10000)]
+        self.assertEqual(calibrate(measurements[:3]), None)
+        models = calibrate(measurements)
+        self.assertTrue(numpy.allclose(models["tensor"], (1e-7, 2e-9)))
+        times = predict_times({"tensor": 500, "quadrature": 800}, models)
+        self.assertAlmostEqual(times["tensor"], 1.1e-6)
+        self.assertAlmostEqual(times["quadrature"], 8.5e-7)
+
+    def testTuningDatabase(self):
+        "Test storing measurements and decisions in tuning database."
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "tuning.json")
+            database = TuningDatabase(filename)
+            database.add_measurement({"representation": "tensor",
+                                      "num_operations": 10, "time": 1e-8})
+            database.add_decision("representation", "key", "tensor")
+            database.save()
+            database = open_tuning_database({"tuning_database": filename})
+            self.assertEqual(len(database.measurements), 1)
+            self.assertEqual(database.get_decision("representation", "key"), "tensor")
+            self.assertEqual(database.get_decision("representation", "other"), None)
+            self.assertEqual(open_tuning_database({"tuning_database": ""}), None)
+        finally:
+            shutil.rmtree(directory)
+
+    def testConcurrentSave(self):
+        """Test that saving tuning databases opened concurrently keeps
+        the measurements and decisions of both."""
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "tuning.json")
+            databases = [TuningDatabase(filename) for i in range(2)]
+            for (i, database) in enumerate(databases):
+                database.add_measurement({"representation": "tensor",
+                                          "num_operations": 10, "time": i})
+                database.add_decision("representation", "key%d" % i, "tensor")
+            for database in databases:
+                database.save()
+            database = TuningDatabase(filename)
+            self.assertEqual(sorted(m["time"] for m in database.measurements),
+                             [0, 1])
+            self.assertEqual(database.get_decision("representation", "key0"), "tensor")
+            self.assertEqual(database.get_decision("representation", "key1"), "tensor")
+
+            # Saving again does not add the measurements twice
+            databases[1].save()
+            self.assertEqual(len(TuningDatabase(filename).measurements), 2)
+        finally:
+            shutil.rmtree(directory)
+
+    def testAutotuneDecision(self):
+        "Test that autotuning decisions are reused from tuning database."
+        element = FiniteElement("Lagrange", triangle, 1)
+        integrals = (TrialFunction(element)*TestFunction(element)*dx).integrals()
+        directory = tempfile.mkdtemp()
+        try:
+            parameters = default_parameters()
+            parameters["tuning_database"] = os.path.join(directory, "tuning.json")
+            parameters["autotune"] = True
+            database = TuningDatabase(parameters["tuning_database"])
+            database.add_decision("optimise_parameters",
+                                  _decision_key(integrals, "cell", parameters), "b")
+            database.save()
+            variants = [("a", parameters), ("b", parameters)]
+            self.assertEqual(autotune("optimise_parameters", integrals, "cell",
+                                      variants, parameters), "b")
+        finally:
+            shutil.rmtree(directory)
+
+    def testDefaultSelection(self):
+        """Test that the representation is selected by the estimated
+        cost of tensor representation without measurements."""
+        element = FiniteElement("Lagrange", triangle, 1)
+        v = TestFunction(element)
+        u = TrialFunction(element)
+        f = [Coefficient(element) for i in range(4)]
+        for (a, representation) in ((u*v*dx, "tensor"),
+                                    (f[0]*f[1]*f[2]*u*v*dx, "tensor"),
+                                    (f[0]*f[1]*f[2]*f[3]*u*v*dx, "quadrature")):
+            form_data = analyze_forms([a], default_parameters())[0][0]
+            self.assertEqual(form_data.integral_data[0].metadata["representation"],
+                             representation)
+
+    def testDatabaseSignature(self):
+        """Test that parameter signatures depend on the contents of the
+        tuning database and autotuning decisions do not."""
+        element = FiniteElement("Lagrange", triangle, 1)
+        integrals = (TrialFunction(element)*TestFunction(element)*dx).integrals()
+        directory = tempfile.mkdtemp()
+        try:
+            filenames = [os.path.join(directory, name)
+                         for name in ("a.json", "b.json")]
+            for filename in filenames:
+                database = TuningDatabase(filename)
+                database.add_decision("representation", "key", "tensor")
+                database.save()
+            parameters = [{"tuning_database": filename} for filename in filenames]
+            self.assertEqual(_parameters_signature(parameters[0]),
+                             _parameters_signature(parameters[1]))
+            key = _decision_key(integrals, "cell", parameters[0])
+            database.add_decision("representation", "other", "quadrature")
+            database.save()
+            self.assertNotEqual(_parameters_signature(parameters[0]),
+                                _parameters_signature(parameters[1]))
+            self.assertEqual(_decision_key(integrals, "cell", parameters[1]), key)
+        finally:
+            shutil.rmtree(directory)
+
+class BenchTests(unittest.TestCase):
+
+    def testParseConfiguration(self):
+        "Test parsing of compiler options of benchmark configurations."
+        parameters = parse_configuration("-r quadrature -O -fsimd_width=4 -feliminate_zeros")
+        self.assertEqual(parameters, {"representation": "quadrature",
+                                      "optimize": True,
+                                      "simd_width": "4",
+                                      "eliminate_zeros": True})
+
+    def testCompareResults(self):
+        "Test that changes of medians beyond the threshold are flagged."
+        def results(median, stddev):
+            stats = {"min": median, "median": median, "mean": median,
+                     "stddev": stddev, "samples": [median]}
+            return {"results": {"Poisson": {"-r tensor": {"runtime": {"form 0/cell 0": stats}}}}}
+        key = ("Poisson", "-r tensor", "runtime", "form 0/cell 0")
+        self.assertEqual(compare_results(results(1.0, 0.01), results(1.5, 0.01)),
+                         ([key + (1.0, 1.5)], []))
+        self.assertEqual(compare_results(results(1.0, 0.01), results(0.5, 0.01)),
+                         ([], [key + (1.0, 0.5)]))
+        self.assertEqual(compare_results(results(1.0, 0.01), results(1.05, 0.01)),
+                         ([], []))
+        self.assertEqual(compare_results(results(1.0, 0.6), results(1.5, 0.6)),
+                         ([], []))
+
+    def testOperationCounts(self):
+        "Test that operation counts are recorded for each integral and facet."
+        element = FiniteElement("Lagrange", triangle, 1)
+        v = TestFunction(element)
+        u = TrialFunction(element)
+        class FormData:
+            forms = [u*v*dx + u*v*ds + avg(u)*avg(v)*dS]
+            object_names = {}
+        for representation in ("tensor", "quadrature"):
+            parameters = default_parameters()
+            parameters["representation"] = representation
+            counts = operation_counts(FormData, "OperationCounts", parameters)
+            self.assertEqual(len(counts), 1)
+            self.assertTrue(counts[0][("cell", "otherwise")] > 0)
+            self.assertEqual(len(counts[0][("exterior_facet", "otherwise")]), 3)
+            self.assertEqual([len(c) for c in counts[0][("interior_facet", "otherwise")]],
+                             [3, 3, 3])
+
 if __name__ == "__main__":
     unittest.main()
@@ -50,6 +50,7 @@ from .testelasticityterm import TestElasticityTerm
 from .testelasweighted import TestElasWeighted
 from .testelasweighted2 import TestElasWeighted2
 from .testrealexamples import TestRealExamples
+from .testsumfactorization import TestSumFactorization
 
 class TestSingle(unittest.TestCase):
 
@@ -122,6 +123,8 @@ def suite():
     suite.addTest(TestElasticityTerm('testElasticityTerm'))
     suite.addTest(TestElasWeighted('testElasWeighted'))
     suite.addTest(TestElasWeighted2('testElasWeighted2'))
+    suite.addTest(TestSumFactorization('testSumFactorization'))
+    suite.addTest(TestSumFactorization('testGemm'))
 
     # Various bug encounters
     suite.addTest(TestRealExamples('testRealExamples'))
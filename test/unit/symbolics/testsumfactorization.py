@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 The FFC authors
+#
+# This file is part of FFC.
+#
+# FFC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# FFC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with FFC. If not, see <http://www.gnu.org/licenses/>.
+
+# Pyhton modules
+import unittest
+
+# FFC modules
+from ffc.quadrature.symbolics import *
+from ffc.quadrature.sumfactorization import factorize_entry, stage_entry, gemm_entry
+from ffc.cpp import format, set_float_formatting
+from ffc.parameters import FFC_PARAMETERS
+set_float_formatting(FFC_PARAMETERS['precision'])
+
+class TestSumFactorization(unittest.TestCase):
+
+    def testSumFactorization(self):
+
+        # Poisson on a triangle (after expansion and optimise_code)
+        FE0_D10_j = Symbol("FE0_D10[ip][j]", BASIS)
+        FE0_D01_j = Symbol("FE0_D01[ip][j]", BASIS)
+        FE0_D10_k = Symbol("FE0_D10[ip][k]", BASIS)
+        FE0_D01_k = Symbol("FE0_D01[ip][k]", BASIS)
+        I0, I1, I2 = [Symbol("I[%d]" % i, IP) for i in range(3)]
+        expr = Sum([Product([FE0_D10_j, FE0_D10_k, I0]),
+                    Product([FE0_D10_j, FE0_D01_k, I1]),
+                    Product([FE0_D01_j, FE0_D10_k, I1]),
+                    Product([FE0_D01_j, FE0_D01_k, I2])])
+        loop = (("j", 0, 3), ("k", 0, 3))
+
+        # Two groups, staged values computed in loop over j
+        stage, groups = factorize_entry(expr, loop)
+        self.assertEqual(stage, 0)
+        self.assertEqual(len(groups), 2)
+
+        # Entry is cheaper to compute from staged values
+        ops, code, value = stage_entry(expr, loop, 0)
+        self.assertEqual(expr.ops(), 11)
+        self.assertEqual(value.ops(), 3)
+        self.assertEqual(ops, 2*3*3)
+
+        # Evaluate staged values and entries
+        FE0_D10 = [[1.1, -2.3, 0.7]]
+        FE0_D01 = [[0.4, 5.2, -1.9]]
+        I = [1.5, -0.3, 2.2]
+        SF0 = [[0.0]*3 for g in range(2)]
+        ip = 0
+        lines = [l.strip().rstrip(";") for l in code if l.strip().startswith("SF0")]
+        self.assertEqual(len(lines), 2)
+        for j in range(3):
+            for line in lines:
+                exec(line)
+        for j in range(3):
+            for k in range(3):
+                self.assertAlmostEqual(eval(str(expr)), eval(str(value)))
+
+        # A single term gives a single group
+        expr = Product([FE0_D10_j, FE0_D10_k, I0])
+        self.assertEqual(len(factorize_entry(expr, loop)[1]), 1)
+
+        # Functionals and linear forms can not be factorized
+        self.assertEqual(factorize_entry(Product([FE0_D10_j, I0]), loop), None)
+
+    def testGemm(self):
+
+        FE0_j = Symbol("FE0[ip][j]", BASIS)
+        FE1_k = Symbol("FE1[ip][k]", BASIS)
+        FE1_D10_k = Symbol("FE1_D10[ip][k]", BASIS)
+        F0, F1 = Symbol("F0", IP), Symbol("F1", IP)
+        expr = Sum([Product([FE0_j, FE1_k, F0]),
+                    Product([FE0_j, FE1_D10_k, F1])])
+        loop = (("j", 0, 3), ("k", 0, 4))
+
+        # Staged values in loop over k, one product with the table FE0
+        ops, code, decl_code, gemm_ops, gemm_code = gemm_entry(expr, loop, "j*4 + k", 0, 6)
+        self.assertEqual(ops, 3*4)
+        self.assertEqual(gemm_ops, (2*6 + 1)*3*4)
+        self.assertEqual([l for l in gemm_code if l.startswith("ufc_gemm_tn")],
+                         ["ufc_gemm_tn(3, 4, 6, &FE0[0][0], &SF6_0[0], &AF6_0[0]);"])
+
+        # The arrays are allocated on the heap
+        self.assertEqual(decl_code[1:], ["std::vector<double> SF6_0(24);",
+                                         "std::vector<double> AF6_0(12);"])
+        self.assertTrue(any(l.strip().startswith("SF6_0[0 + ip*4 + k] = ") for l in code))
+
+        # The factor must be a table tabulated in integration points
+        expr = Product([FE0_j, Symbol("FE1[0][k]", BASIS), F0])
+        self.assertEqual(gemm_entry(expr, loop, "j*4 + k", 0, 6), None)
+
+if __name__ == "__main__":
+
+    # Run all returned tests
+    runner = unittest.TextTestRunner()
+    runner.run(TestSumFactorization('testSumFactorization'))
+    runner.run(TestSumFactorization('testGemm'))
@@ -18,6 +18,31 @@
 
 const char UFC_VERSION[] = "1.4.0+";
 
+/// Alignment of arrays in generated code to n bytes. Uses alignas
+/// for C++11 compilers, the aligned attribute of GCC compatible
+/// compilers otherwise, and expands to nothing if neither is available.
+#ifndef UFC_ALIGNED
+#if __cplusplus >= 201103L
+#define UFC_ALIGNED(n) alignas(n)
+#elif defined(__GNUC__)
+#define UFC_ALIGNED(n) __attribute__((aligned(n)))
+#else
+#define UFC_ALIGNED(n)
+#endif
+#endif
+
+/// Marks the following loop in generated code for vectorisation. Expands
+/// to an OpenMP simd pragma when compiling with OpenMP 4.0 or later, or
+/// when UFC_OPENMP_SIMD is defined (for instance together with
+/// -fopenmp-simd), and to nothing otherwise.
+#ifndef UFC_SIMD
+#if (defined(_OPENMP) && _OPENMP >= 201307) || defined(UFC_OPENMP_SIMD)
+#define UFC_SIMD _Pragma("omp simd")
+#else
+#define UFC_SIMD
+#endif
+#endif
+
 namespace ufc
 {
 
@@ -253,6 +278,28 @@ namespace ufc
                                const std::vector<std::size_t>& num_global_entities,
                                const cell& c) const = 0;
 
+    /// Return the local dof-to-entity incidence as a static array of
+    /// four values (d, k, n, j) for each local dof: the topological
+    /// dimension d and local index k of the cell entity the dof is
+    /// associated with, the number n of dofs of its element on each
+    /// entity of dimension d and the index j of the dof among these
+    /// (n is zero for dofs not associated with mesh entities). The
+    /// default implementation returns a null pointer, meaning that
+    /// the incidence is not available and the dofs must be tabulated
+    /// by tabulate_dofs.
+    virtual const std::size_t* dof_entity_incidence() const
+    { return 0; }
+
+    /// Tabulate the offsets of the global indices of the local dofs,
+    /// such that the global index of local dof i on a cell c is
+    /// offsets[i] + n*c.entity_indices[d][k] + j, where (d, k, n, j)
+    /// is the incidence of dof i (see dof_entity_incidence). The
+    /// default implementation leaves the offsets unset and should
+    /// only be called if dof_entity_incidence is available.
+    virtual void tabulate_dof_offsets(std::size_t* offsets,
+                                      const std::vector<std::size_t>& num_global_entities) const
+    {}
+
     /// Tabulate the local-to-local mapping from facet dofs to cell dofs
     virtual void tabulate_facet_dofs(std::size_t* dofs,
                                      std::size_t facet) const = 0;
@@ -380,6 +427,13 @@ namespace ufc
   /// tensor corresponding to the local contribution to a form from
   /// the integral over a custom domain defined in terms of a set of
   /// quadrature points and weights.
+  ///
+  /// Note that implementations may keep the tables of basis function
+  /// values at the quadrature points in a workspace of the integral
+  /// object, which is reused across calls to tabulate_tensor. The
+  /// function tabulate_tensor is therefore not reentrant: it must not
+  /// be called concurrently on the same object. Threads should use
+  /// separate objects created by form::create_custom_integral.
 
   class custom_integral: public integral
   {
@@ -2,7 +2,9 @@
 
 %{
 #include "ufc.h"
+#include <algorithm>
 #include <memory>
+#include <vector>
 %}
 
 // Use std::shared_ptr
@@ -64,11 +66,262 @@
 }
 
 
+//-----------------------------------------------------------------------------
+// Helpers for passing arrays to tabulate_tensor through the buffer protocol
+//-----------------------------------------------------------------------------
+%{
+namespace ufc_swig
+{
+  // A C-contiguous buffer of doubles (or ints) which is released on
+  // destruction
+  class buffer
+  {
+  public:
+
+    buffer() : acquired(false) {}
+
+    ~buffer()
+    { if (acquired) PyBuffer_Release(&view); }
+
+    // Get buffer of object, return false and set Python error on failure
+    bool get(PyObject* obj, const char* name, bool writable=false,
+             bool integer=false)
+    {
+      const int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT
+        | (writable ? PyBUF_WRITABLE : 0);
+      if (PyObject_GetBuffer(obj, &view, flags) != 0)
+      {
+        PyErr_Format(PyExc_TypeError,
+                     "expected a %sC-contiguous array for '%s'",
+                     writable ? "writable " : "", name);
+        return false;
+      }
+      acquired = true;
+
+      // Check item type
+      const char c = view.format[0] == '=' || view.format[0] == '@'
+        ? view.format[1] : view.format[0];
+      const bool ok = integer
+        ? (c == 'i' || c == 'l') && view.itemsize == sizeof(int)
+        : c == 'd' && view.itemsize == sizeof(double);
+      if (!ok)
+      {
+        PyErr_Format(PyExc_TypeError, "expected an array of %s for '%s'",
+                     integer ? "int32" : "float64", name);
+        return false;
+      }
+      return true;
+    }
+
+    // Number of items
+    std::size_t size() const
+    { return view.len/view.itemsize; }
+
+    // Number of rows (length of first axis)
+    std::size_t rows() const
+    { return view.ndim > 0 ? view.shape[0] : 1; }
+
+    // Row r
+    double* row(std::size_t r) const
+    { return r == 0 ? data() : data() + r*(size()/rows()); }
+
+    double* data() const
+    { return static_cast<double*>(view.buf); }
+
+    int* int_data() const
+    { return static_cast<int*>(view.buf); }
+
+  private:
+
+    Py_buffer view;
+    bool acquired;
+
+  };
+
+  // Buffers of a sequence of coefficient arrays
+  class coefficients
+  {
+  public:
+
+    // Get buffers of sequence w, each with num_rows rows (if nonzero),
+    // return false and set Python error on failure
+    bool get(PyObject* w, std::size_t num_rows=0)
+    {
+      PyObject* seq = PySequence_Fast(w, "expected a sequence of arrays for 'w'");
+      if (!seq)
+        return false;
+      const std::size_t n = PySequence_Fast_GET_SIZE(seq);
+      buffers.resize(n);
+      pointers.resize(n);
+      bool ok = true;
+      for (std::size_t i = 0; i < n && ok; i++)
+      {
+        buffers[i].reset(new buffer);
+        ok = buffers[i]->get(PySequence_Fast_GET_ITEM(seq, i), "w");
+        if (ok && num_rows && buffers[i]->rows() != num_rows)
+        {
+          PyErr_SetString(PyExc_ValueError,
+                          "expected one row per cell in each array of 'w'");
+          ok = false;
+        }
+        if (ok)
+          pointers[i] = buffers[i]->data();
+      }
+      Py_DECREF(seq);
+      return ok;
+    }
+
+    // Number of coefficients
+    std::size_t size() const
+    { return buffers.size(); }
+
+    // Pointers to coefficients (of row r)
+    const double * const * row(std::size_t r)
+    {
+      for (std::size_t i = 0; i < buffers.size(); i++)
+        pointers[i] = buffers[i]->row(r);
+      return pointers.empty() ? 0 : &pointers[0];
+    }
+
+  private:
+
+    std::vector<std::shared_ptr<buffer> > buffers;
+    std::vector<const double*> pointers;
+
+  };
+
+  // Check that buffer has num_rows rows
+  inline bool check_rows(const buffer& b, std::size_t num_rows, const char* name)
+  {
+    if (b.rows() == num_rows)
+      return true;
+    PyErr_Format(PyExc_ValueError, "expected one row per cell in '%s'", name);
+    return false;
+  }
+}
+%}
+
+// Return None, or NULL to raise the Python error set on failure
+%define UFC_SWIG_RETURN(ok)
+  if (!(ok))
+    return 0;
+  Py_INCREF(Py_None);
+  return Py_None;
+%enddef
+
 //-----------------------------------------------------------------------------
 // Include the main header file
 //-----------------------------------------------------------------------------
 %include "ufc.h"
 
+//-----------------------------------------------------------------------------
+// Tabulate tensors from arrays supporting the buffer protocol (such as
+// NumPy arrays) without copying. The element tensor A is written in
+// place, w is a sequence of coefficient arrays. The batch versions
+// take arrays with one row per cell (including each coefficient) and
+// call tabulate_tensor for each cell. The array sizes are not checked,
+// see ffc.tabulate for a checked interface.
+//-----------------------------------------------------------------------------
+%extend ufc::cell_integral
+{
+  PyObject* tabulate_tensor_buffers(PyObject* A, PyObject* w,
+                                    PyObject* vertex_coordinates,
+                                    int cell_orientation=0)
+  {
+    ufc_swig::buffer _A, _x;
+    ufc_swig::coefficients _w;
+    const bool ok = _A.get(A, "A", true) && _w.get(w)
+      && _x.get(vertex_coordinates, "vertex_coordinates");
+    if (ok)
+      self->tabulate_tensor(_A.data(), _w.row(0), _x.data(), cell_orientation);
+    UFC_SWIG_RETURN(ok)
+  }
+
+  PyObject* tabulate_tensor_batch_buffers(PyObject* A, PyObject* w,
+                                          PyObject* vertex_coordinates,
+                                          PyObject* cell_orientations)
+  {
+    ufc_swig::buffer _A, _x, _o;
+    ufc_swig::coefficients _w;
+    const bool ok = _A.get(A, "A", true)
+      && _w.get(w, _A.rows())
+      && _x.get(vertex_coordinates, "vertex_coordinates")
+      && ufc_swig::check_rows(_x, _A.rows(), "vertex_coordinates")
+      && _o.get(cell_orientations, "cell_orientations", false, true)
+      && ufc_swig::check_rows(_o, _A.rows(), "cell_orientations");
+    if (ok)
+    {
+      for (std::size_t c = 0; c < _A.rows(); c++)
+        self->tabulate_tensor(_A.row(c), _w.row(c), _x.row(c), _o.int_data()[c]);
+    }
+    UFC_SWIG_RETURN(ok)
+  }
+}
+
+%extend ufc::exterior_facet_integral
+{
+  PyObject* tabulate_tensor_buffers(PyObject* A, PyObject* w,
+                                    PyObject* vertex_coordinates,
+                                    std::size_t facet,
+                                    int cell_orientation=0)
+  {
+    ufc_swig::buffer _A, _x;
+    ufc_swig::coefficients _w;
+    const bool ok = _A.get(A, "A", true) && _w.get(w)
+      && _x.get(vertex_coordinates, "vertex_coordinates");
+    if (ok)
+      self->tabulate_tensor(_A.data(), _w.row(0), _x.data(), facet,
+                            cell_orientation);
+    UFC_SWIG_RETURN(ok)
+  }
+
+  PyObject* tabulate_tensor_batch_buffers(PyObject* A, PyObject* w,
+                                          PyObject* vertex_coordinates,
+                                          PyObject* facets,
+                                          PyObject* cell_orientations)
+  {
+    ufc_swig::buffer _A, _x, _f, _o;
+    ufc_swig::coefficients _w;
+    const bool ok = _A.get(A, "A", true)
+      && _w.get(w, _A.rows())
+      && _x.get(vertex_coordinates, "vertex_coordinates")
+      && ufc_swig::check_rows(_x, _A.rows(), "vertex_coordinates")
+      && _f.get(facets, "facets", false, true)
+      && ufc_swig::check_rows(_f, _A.rows(), "facets")
+      && _o.get(cell_orientations, "cell_orientations", false, true)
+      && ufc_swig::check_rows(_o, _A.rows(), "cell_orientations");
+    if (ok)
+    {
+      for (std::size_t c = 0; c < _A.rows(); c++)
+        self->tabulate_tensor(_A.row(c), _w.row(c), _x.row(c), _f.int_data()[c],
+                              _o.int_data()[c]);
+    }
+    UFC_SWIG_RETURN(ok)
+  }
+}
+
+%extend ufc::interior_facet_integral
+{
+  PyObject* tabulate_tensor_buffers(PyObject* A, PyObject* w,
+                                    PyObject* vertex_coordinates_0,
+                                    PyObject* vertex_coordinates_1,
+                                    std::size_t facet_0, std::size_t facet_1,
+                                    int cell_orientation_0=0,
+                                    int cell_orientation_1=0)
+  {
+    ufc_swig::buffer _A, _x0, _x1;
+    ufc_swig::coefficients _w;
+    const bool ok = _A.get(A, "A", true) && _w.get(w)
+      && _x0.get(vertex_coordinates_0, "vertex_coordinates_0")
+      && _x1.get(vertex_coordinates_1, "vertex_coordinates_1");
+    if (ok)
+      self->tabulate_tensor(_A.data(), _w.row(0), _x0.data(), _x1.data(),
+                            facet_0, facet_1,
+                            cell_orientation_0, cell_orientation_1);
+    UFC_SWIG_RETURN(ok)
+  }
+}
+
 // Include code to generate a __swigversion__ attribute to the cpp module
 // Add prefix to avoid naming problems with other modules
 %inline %{
@@ -0,0 +1,732 @@
+// This file provides a simple shared-memory assembler for UFC forms
+// on simplex meshes, used by the assembly drivers generated by FFC
+// with the option -fassembly_driver. Cells are assembled in parallel
+// by OpenMP threads when the code is compiled with OpenMP enabled
+// (-fopenmp), and serially otherwise.
+// This code is released into the public domain.
+//
+// The FEniCS Project (http://www.fenicsproject.org/) 2014.
+
+#ifndef __UFC_ASSEMBLY_H
+#define __UFC_ASSEMBLY_H
+
+#include <algorithm>
+#include <cstddef>
+#include <map>
+#include <stdexcept>
+#include <utility>
+#include <vector>
+
+#include <ufc.h>
+
+#ifdef _OPENMP
+#include <omp.h>
+#define UFC_ASSEMBLY_OMP(directive) _Pragma(#directive)
+#else
+#define UFC_ASSEMBLY_OMP(directive)
+#endif
+
+namespace ufc_assembly
+{
+
+  /// Strategy for avoiding race conditions when threads add element
+  /// tensors to the global tensor
+  enum strategy
+  {
+    /// Cells are coloured such that cells of the same colour share no
+    /// rows of the global tensor, and the cells of each colour are
+    /// assembled in parallel directly into the global tensor
+    colored,
+
+    /// Each thread assembles into a private copy of the global tensor
+    /// and the copies are summed at the end
+    buffered
+  };
+
+  /// This class defines a mesh of simplices given by the coordinates
+  /// of its vertices and the vertices of each cell (a CSR-like
+  /// connectivity with a fixed number of vertices per cell). The
+  /// vertices of each cell are sorted by global index, as assumed by
+  /// the UFC numbering convention. Mesh entities of other dimensions
+  /// are numbered on demand by init().
+
+  class mesh
+  {
+  public:
+
+    /// Constructor
+    mesh(ufc::shape cell_shape, std::size_t geometric_dimension,
+         const std::vector<double>& coordinates,
+         const std::vector<std::size_t>& cells)
+      : cell_shape(cell_shape),
+        topological_dimension(_topological_dimension(cell_shape)),
+        geometric_dimension(geometric_dimension),
+        coordinates(coordinates)
+    {
+      const std::size_t tdim = topological_dimension;
+      const std::size_t n = tdim + 1;
+      if (cells.size() % n != 0)
+        throw std::runtime_error("Number of cell vertices does not match cell shape.");
+
+      entities.resize(tdim + 1);
+      num_entities.resize(tdim + 1, 0);
+      entities[0] = cells;
+      for (std::size_t c = 0; c < cells.size(); c += n)
+        std::sort(entities[0].begin() + c, entities[0].begin() + c + n);
+      num_entities[0] = coordinates.size() / geometric_dimension;
+      num_entities[tdim] = cells.size() / n;
+    }
+
+    /// Destructor
+    virtual ~mesh() {}
+
+    /// Return number of cells
+    std::size_t num_cells() const
+    { return num_entities[topological_dimension]; }
+
+    /// Return number of entities of dimension d of each cell
+    std::size_t num_cell_entities(std::size_t d) const
+    {
+      // Binomial coefficient (tdim + 1 over d + 1)
+      std::size_t n = 1;
+      for (std::size_t i = 0; i < d + 1; i++)
+        n = n*(topological_dimension + 1 - i) / (i + 1);
+      return n;
+    }
+
+    /// Number the entities of dimension d
+    void init(std::size_t d)
+    {
+      const std::size_t tdim = topological_dimension;
+      if (d == 0 || d >= tdim || !entities[d].empty())
+        return;
+
+      const std::vector<std::vector<std::size_t> > local = _local_entities(tdim, d);
+      const std::size_t n = tdim + 1;
+      std::map<std::vector<std::size_t>, std::size_t> numbering;
+      std::vector<std::size_t> key(d + 1);
+      entities[d].resize(num_cells()*local.size());
+      for (std::size_t c = 0; c < num_cells(); c++)
+      {
+        for (std::size_t i = 0; i < local.size(); i++)
+        {
+          // Local vertices are sorted, and so are the cell vertices
+          for (std::size_t v = 0; v < d + 1; v++)
+            key[v] = entities[0][c*n + local[i][v]];
+          const std::size_t index = numbering.size();
+          entities[d][c*local.size() + i]
+            = numbering.insert(std::make_pair(key, index)).first->second;
+        }
+      }
+      num_entities[d] = numbering.size();
+    }
+
+    /// Find the exterior facets as (cell, local facet) pairs
+    void init_exterior_facets()
+    {
+      if (!exterior_facets.empty())
+        return;
+
+      const std::size_t d = topological_dimension - 1;
+      init(d);
+      const std::size_t n = num_cell_entities(d);
+      std::vector<std::size_t> count(num_entities[d], 0);
+      for (std::size_t i = 0; i < entities[d].size(); i++)
+        count[entities[d][i]]++;
+      for (std::size_t i = 0; i < entities[d].size(); i++)
+        if (count[entities[d][i]] == 1)
+          exterior_facets.push_back(std::make_pair(i / n, i % n));
+    }
+
+    /// Fill UFC cell data and vertex coordinates for cell c
+    void get_cell(ufc::cell& cell, double* vertex_coordinates, std::size_t c) const
+    {
+      const std::size_t tdim = topological_dimension;
+      const std::size_t gdim = geometric_dimension;
+      cell.cell_shape = cell_shape;
+      cell.topological_dimension = tdim;
+      cell.geometric_dimension = gdim;
+      cell.entity_indices.resize(tdim + 1);
+      for (std::size_t d = 0; d < tdim; d++)
+      {
+        const std::size_t n = num_cell_entities(d);
+        if (entities[d].empty())
+          cell.entity_indices[d].clear();
+        else
+          cell.entity_indices[d].assign(entities[d].begin() + c*n,
+                                        entities[d].begin() + (c + 1)*n);
+      }
+      cell.entity_indices[tdim].assign(1, c);
+      cell.index = c;
+      cell.orientation = -1;
+      for (std::size_t v = 0; v < tdim + 1; v++)
+      {
+        const double* x = &coordinates[entities[0][c*(tdim + 1) + v]*gdim];
+        std::copy(x, x + gdim, vertex_coordinates + v*gdim);
+      }
+    }
+
+    /// Shape of the cells
+    ufc::shape cell_shape;
+
+    /// Topological dimension of the mesh
+    std::size_t topological_dimension;
+
+    /// Geometric dimension of the mesh
+    std::size_t geometric_dimension;
+
+    /// Coordinates of the vertices (flattened, gdim values per vertex)
+    std::vector<double> coordinates;
+
+    /// Global indices of the entities of dimension d of each cell,
+    /// where entities[0] holds the (sorted) vertices of each cell
+    std::vector<std::vector<std::size_t> > entities;
+
+    /// Number of entities of each dimension (0 if not numbered)
+    std::vector<std::size_t> num_entities;
+
+    /// Exterior facets as (cell, local facet) pairs
+    std::vector<std::pair<std::size_t, std::size_t> > exterior_facets;
+
+  private:
+
+    static std::size_t _topological_dimension(ufc::shape cell_shape)
+    {
+      switch (cell_shape)
+      {
+      case ufc::interval:
+        return 1;
+      case ufc::triangle:
+        return 2;
+      case ufc::tetrahedron:
+        return 3;
+      default:
+        throw std::runtime_error("Only simplex meshes are supported.");
+      }
+      return 0;
+    }
+
+    // Local vertices of the entities of dimension d of a simplex. The
+    // UFC numbering of the entities is the reverse lexicographic
+    // ordering of the sorted vertex tuples (such that facet i is
+    // opposite to vertex i).
+    static std::vector<std::vector<std::size_t> >
+    _local_entities(std::size_t tdim, std::size_t d)
+    {
+      std::vector<std::vector<std::size_t> > local;
+      std::vector<std::size_t> v(d + 1);
+      for (std::size_t i = 0; i < d + 1; i++)
+        v[i] = i;
+      while (true)
+      {
+        local.push_back(v);
+        std::size_t i = d + 1;
+        while (i > 0 && v[i - 1] == tdim - d + i - 1)
+          i--;
+        if (i == 0)
+          break;
+        v[i - 1]++;
+        for (std::size_t j = i; j < d + 1; j++)
+          v[j] = v[j - 1] + 1;
+      }
+      std::reverse(local.begin(), local.end());
+      return local;
+    }
+
+  };
+
+  /// Create a mesh of the unit interval, square or cube with n
+  /// subintervals in each direction, where each square is divided
+  /// into 2 triangles and each cube into 6 tetrahedra
+  inline mesh unit_mesh(ufc::shape cell_shape, std::size_t n)
+  {
+    std::size_t tdim = 0;
+    switch (cell_shape)
+    {
+    case ufc::interval:
+      tdim = 1;
+      break;
+    case ufc::triangle:
+      tdim = 2;
+      break;
+    case ufc::tetrahedron:
+      tdim = 3;
+      break;
+    default:
+      throw std::runtime_error("Only simplex meshes are supported.");
+    }
+
+    // Vertices of a lattice of (n + 1)^tdim points
+    std::size_t num_vertices = 1;
+    for (std::size_t d = 0; d < tdim; d++)
+      num_vertices *= n + 1;
+    std::vector<double> coordinates(num_vertices*tdim);
+    for (std::size_t v = 0; v < num_vertices; v++)
+    {
+      std::size_t index = v;
+      for (std::size_t d = 0; d < tdim; d++)
+      {
+        coordinates[v*tdim + d] = static_cast<double>(index % (n + 1)) / n;
+        index /= n + 1;
+      }
+    }
+
+    // Divide each lattice cube into simplices along paths from its
+    // first to its last vertex, one simplex per permutation of axes
+    std::vector<std::size_t> axes(tdim), stride(tdim);
+    for (std::size_t d = 0; d < tdim; d++)
+    {
+      axes[d] = d;
+      stride[d] = d == 0 ? 1 : stride[d - 1]*(n + 1);
+    }
+    std::size_t num_cubes = 1;
+    for (std::size_t d = 0; d < tdim; d++)
+      num_cubes *= n;
+    std::vector<std::size_t> cells;
+    for (std::size_t q = 0; q < num_cubes; q++)
+    {
+      std::size_t first = 0, index = q;
+      for (std::size_t d = 0; d < tdim; d++)
+      {
+        first += (index % n)*stride[d];
+        index /= n;
+      }
+      do
+      {
+        std::size_t v = first;
+        cells.push_back(v);
+        for (std::size_t d = 0; d < tdim; d++)
+        {
+          v += stride[axes[d]];
+          cells.push_back(v);
+        }
+      }
+      while (std::next_permutation(axes.begin(), axes.end()));
+    }
+
+    return mesh(cell_shape, tdim, coordinates, cells);
+  }
+
+  /// This class defines a sparse matrix in compressed sparse row
+  /// format, with sorted column indices in each row.
+
+  class csr_matrix
+  {
+  public:
+
+    /// Constructor
+    csr_matrix() : num_rows(0), num_columns(0) {}
+
+    /// Destructor
+    virtual ~csr_matrix() {}
+
+    /// Return position of entry (i, j) in values
+    std::size_t find(std::size_t i, std::size_t j) const
+    {
+      const std::size_t* begin = &columns[0] + row_offsets[i];
+      const std::size_t* end = &columns[0] + row_offsets[i + 1];
+      const std::size_t* position = std::lower_bound(begin, end, j);
+      if (position == end || *position != j)
+        throw std::runtime_error("Entry is not in sparsity pattern.");
+      return position - &columns[0];
+    }
+
+    /// Number of rows
+    std::size_t num_rows;
+
+    /// Number of columns
+    std::size_t num_columns;
+
+    /// Offsets of the rows in columns and values (num_rows + 1 values)
+    std::vector<std::size_t> row_offsets;
+
+    /// Column indices of the nonzero entries
+    std::vector<std::size_t> columns;
+
+    /// Values of the nonzero entries
+    std::vector<double> values;
+
+  };
+
+  /// This class assembles the global tensor of a UFC form (of type
+  /// Form) over a mesh. The dofs of all cells are computed once on
+  /// construction from the dof-to-entity incidence of the dofmaps, or
+  /// tabulated cell by cell for dofmaps without the incidence, and
+  /// each thread creates its own integral objects.
+  /// Only the default cell and exterior facet integrals are assembled.
+
+  template <typename Form>
+  class assembler
+  {
+  public:
+
+    /// Constructor
+    assembler(mesh& m) : _mesh(m)
+    {
+      const std::size_t tdim = _mesh.topological_dimension;
+      const std::size_t num_cells = _mesh.num_cells();
+      const std::size_t num_dofmaps = _form.rank() + _form.num_coefficients();
+      _global_dimensions.resize(num_dofmaps);
+      _local_dimensions.resize(num_dofmaps);
+      _dofs.resize(num_dofmaps);
+
+      if (_form.has_exterior_facet_integrals())
+        _mesh.init_exterior_facets();
+
+      for (std::size_t i = 0; i < num_dofmaps; i++)
+      {
+        ufc::dofmap* dofmap = _form.create_dofmap(i);
+        for (std::size_t d = 0; d <= tdim; d++)
+          if (dofmap->needs_mesh_entities(d))
+            _mesh.init(d);
+        _global_dimensions[i] = dofmap->global_dimension(_mesh.num_entities);
+        _local_dimensions[i] = dofmap->local_dimension();
+        _dofs[i].resize(num_cells*_local_dimensions[i]);
+
+        // Tabulate the dofs cell by cell if the dofmap does not
+        // provide the dof-to-entity incidence
+        const std::size_t n = _local_dimensions[i];
+        const std::size_t* incidence = dofmap->dof_entity_incidence();
+        if (!incidence)
+        {
+          UFC_ASSEMBLY_OMP(omp parallel)
+          {
+            ufc::cell cell;
+            std::vector<double> vertex_coordinates((tdim + 1)*_mesh.geometric_dimension);
+            UFC_ASSEMBLY_OMP(omp for schedule(static))
+            for (long c = 0; c < static_cast<long>(num_cells); c++)
+            {
+              _mesh.get_cell(cell, &vertex_coordinates[0], c);
+              dofmap->tabulate_dofs(&_dofs[i][c*n], _mesh.num_entities, cell);
+            }
+          }
+          delete dofmap;
+          continue;
+        }
+
+        // Compute the dofs of all cells from the dof-to-entity
+        // incidence, such that dof j on cell c is
+        // offsets[j] + n*(index of entity (d, k) of c) + l
+        std::vector<std::size_t> offsets(n);
+        dofmap->tabulate_dof_offsets(&offsets[0], _mesh.num_entities);
+        for (std::size_t j = 0; j < n; j++)
+        {
+          const std::size_t d = incidence[4*j];
+          const std::size_t k = incidence[4*j + 1];
+          const std::size_t m = incidence[4*j + 2];
+          const std::size_t offset = offsets[j] + incidence[4*j + 3];
+          const std::size_t num_cell_entities = _mesh.num_cell_entities(d);
+          const std::vector<std::size_t>& entities = _mesh.entities[d];
+          std::size_t* dofs = &_dofs[i][j];
+          UFC_ASSEMBLY_OMP(omp parallel for schedule(static))
+          for (long c = 0; c < static_cast<long>(num_cells); c++)
+          {
+            std::size_t entity = c;
+            if (m > 0 && d < tdim)
+              entity = entities[c*num_cell_entities + k];
+            dofs[c*n] = offset + m*entity;
+          }
+        }
+        delete dofmap;
+      }
+
+      // Colour cells and exterior facets by their rows
+      if (_form.rank() > 0)
+      {
+        std::vector<std::size_t> cells(num_cells);
+        for (std::size_t c = 0; c < num_cells; c++)
+          cells[c] = c;
+        _cell_colors = _color(cells);
+
+        std::vector<std::size_t> facet_cells(_mesh.exterior_facets.size());
+        for (std::size_t f = 0; f < facet_cells.size(); f++)
+          facet_cells[f] = _mesh.exterior_facets[f].first;
+        _facet_colors = _color(facet_cells);
+      }
+    }
+
+    /// Destructor
+    virtual ~assembler() {}
+
+    /// Return the form
+    const Form& form() const
+    { return _form; }
+
+    /// Return the dimension of the global finite element function
+    /// space of argument or coefficient i
+    std::size_t global_dimension(std::size_t i) const
+    { return _global_dimensions[i]; }
+
+    /// Return the dimension of the local finite element function
+    /// space of argument or coefficient i
+    std::size_t local_dimension(std::size_t i) const
+    { return _local_dimensions[i]; }
+
+    /// Return the dofs of argument or coefficient i on all cells
+    /// (local_dimension(i) values per cell)
+    const std::vector<std::size_t>& cell_dofs(std::size_t i) const
+    { return _dofs[i]; }
+
+    /// Return the number of colours of the cells
+    std::size_t num_colors() const
+    { return _cell_colors.size(); }
+
+    /// Initialize the sparsity pattern of a matrix (for a bilinear form)
+    void init(csr_matrix& A) const
+    {
+      _check_rank(2);
+      const std::size_t n0 = _local_dimensions[0];
+      const std::size_t n1 = _local_dimensions[1];
+      std::vector<std::vector<std::size_t> > rows(_global_dimensions[0]);
+      for (std::size_t c = 0; c < _mesh.num_cells(); c++)
+        for (std::size_t i = 0; i < n0; i++)
+          rows[_dofs[0][c*n0 + i]].insert(rows[_dofs[0][c*n0 + i]].end(),
+                                          _dofs[1].begin() + c*n1,
+                                          _dofs[1].begin() + (c + 1)*n1);
+
+      A.num_rows = _global_dimensions[0];
+      A.num_columns = _global_dimensions[1];
+      A.row_offsets.assign(1, 0);
+      A.columns.clear();
+      for (std::size_t i = 0; i < rows.size(); i++)
+      {
+        std::sort(rows[i].begin(), rows[i].end());
+        rows[i].erase(std::unique(rows[i].begin(), rows[i].end()), rows[i].end());
+        A.columns.insert(A.columns.end(), rows[i].begin(), rows[i].end());
+        A.row_offsets.push_back(A.columns.size());
+      }
+      A.values.assign(A.columns.size(), 0.0);
+    }
+
+    /// Assemble a matrix (for a bilinear form), where w holds the
+    /// global dof values of each coefficient
+    void assemble(csr_matrix& A,
+                  const std::vector<const double*>& w=std::vector<const double*>(),
+                  strategy s=colored) const
+    {
+      _check_rank(2);
+      if (A.row_offsets.empty())
+        init(A);
+      std::fill(A.values.begin(), A.values.end(), 0.0);
+      _assemble(A.values.empty() ? 0 : &A.values[0], A.values.size(), &A, w, s);
+    }
+
+    /// Assemble a vector (for a linear form), where w holds the global
+    /// dof values of each coefficient
+    void assemble(std::vector<double>& b,
+                  const std::vector<const double*>& w=std::vector<const double*>(),
+                  strategy s=colored) const
+    {
+      _check_rank(1);
+      b.assign(_global_dimensions[0], 0.0);
+      _assemble(b.empty() ? 0 : &b[0], b.size(), 0, w, s);
+    }
+
+    /// Assemble a scalar (for a functional), where w holds the global
+    /// dof values of each coefficient
+    double assemble(const std::vector<const double*>& w=std::vector<const double*>()) const
+    {
+      _check_rank(0);
+      double value = 0.0;
+      _assemble(&value, 1, 0, w, buffered);
+      return value;
+    }
+
+  private:
+
+    // Check rank of form
+    void _check_rank(std::size_t rank) const
+    {
+      if (_form.rank() != rank)
+        throw std::runtime_error("Form rank does not match global tensor.");
+    }
+
+    // Colour items (given by their cells) such that items of the same
+    // colour share no dofs of the first argument
+    std::vector<std::vector<std::size_t> >
+    _color(const std::vector<std::size_t>& cells) const
+    {
+      const std::size_t n = _local_dimensions[0];
+      const std::vector<std::size_t>& dofs = _dofs[0];
+
+      // Compute items of each dof
+      std::vector<std::vector<std::size_t> > dof_items(_global_dimensions[0]);
+      for (std::size_t k = 0; k < cells.size(); k++)
+        for (std::size_t i = 0; i < n; i++)
+          dof_items[dofs[cells[k]*n + i]].push_back(k);
+
+      // Give each item the first colour not used by its neighbours
+      const std::size_t none = cells.size();
+      std::vector<std::size_t> item_colors(cells.size(), none);
+      std::vector<std::size_t> marked;
+      std::vector<std::vector<std::size_t> > colors;
+      for (std::size_t k = 0; k < cells.size(); k++)
+      {
+        for (std::size_t i = 0; i < n; i++)
+        {
+          const std::vector<std::size_t>& items = dof_items[dofs[cells[k]*n + i]];
+          for (std::size_t j = 0; j < items.size(); j++)
+            if (item_colors[items[j]] != none)
+              marked[item_colors[items[j]]] = k;
+        }
+        std::size_t color = 0;
+        while (color < colors.size() && marked[color] == k)
+          color++;
+        if (color == colors.size())
+        {
+          colors.push_back(std::vector<std::size_t>());
+          marked.push_back(none);
+        }
+        item_colors[k] = color;
+        colors[color].push_back(k);
+      }
+
+      return colors;
+    }
+
+    // Add element tensor of cell c to global tensor
+    void _add(double* values, const csr_matrix* A, const double* A_e,
+              std::size_t c) const
+    {
+      const std::size_t rank = _form.rank();
+      if (rank == 0)
+        values[0] += A_e[0];
+      else if (rank == 1)
+      {
+        const std::size_t n = _local_dimensions[0];
+        const std::size_t* dofs = &_dofs[0][c*n];
+        for (std::size_t i = 0; i < n; i++)
+          values[dofs[i]] += A_e[i];
+      }
+      else
+      {
+        const std::size_t n0 = _local_dimensions[0];
+        const std::size_t n1 = _local_dimensions[1];
+        const std::size_t* dofs0 = &_dofs[0][c*n0];
+        const std::size_t* dofs1 = &_dofs[1][c*n1];
+        const std::size_t* columns = &A->columns[0];
+        for (std::size_t i = 0; i < n0; i++)
+        {
+          const std::size_t* begin = columns + A->row_offsets[dofs0[i]];
+          const std::size_t* end = columns + A->row_offsets[dofs0[i] + 1];
+          for (std::size_t j = 0; j < n1; j++)
+            values[std::lower_bound(begin, end, dofs1[j]) - columns] += A_e[i*n1 + j];
+        }
+      }
+    }
+
+    // Assemble global tensor with given values
+    void _assemble(double* values, std::size_t size, const csr_matrix* A,
+                   const std::vector<const double*>& w, strategy s) const
+    {
+      const std::size_t tdim = _mesh.topological_dimension;
+      const std::size_t rank = _form.rank();
+      const std::size_t num_coefficients = _form.num_coefficients();
+      if (w.size() != num_coefficients)
+        throw std::runtime_error("Wrong number of coefficients.");
+
+      // Size of element tensor
+      std::size_t size_e = 1;
+      for (std::size_t i = 0; i < rank; i++)
+        size_e *= _local_dimensions[i];
+
+      // A scalar can only be assembled by summing private copies
+      if (rank == 0)
+        s = buffered;
+
+      UFC_ASSEMBLY_OMP(omp parallel)
+      {
+        // Thread-private integrals and work arrays
+        ufc::cell_integral* cell_integral = _form.create_default_cell_integral();
+        ufc::exterior_facet_integral* facet_integral
+          = _form.create_default_exterior_facet_integral();
+        ufc::cell cell;
+        std::vector<double> vertex_coordinates((tdim + 1)*_mesh.geometric_dimension);
+        std::vector<double> A_e(size_e);
+        std::vector<std::vector<double> > w_e(num_coefficients);
+        std::vector<const double*> w_p(num_coefficients);
+        for (std::size_t i = 0; i < num_coefficients; i++)
+        {
+          w_e[i].resize(_local_dimensions[rank + i]);
+          w_p[i] = &w_e[i][0];
+        }
+        std::vector<double> private_values(s == buffered ? size : 0, 0.0);
+        double* target = s == buffered ? (size ? &private_values[0] : 0) : values;
+
+        // Assemble over cells and exterior facets
+        for (std::size_t facets = 0; facets < 2; facets++)
+        {
+          if ((facets == 0 && !cell_integral) || (facets == 1 && !facet_integral))
+            continue;
+          const std::size_t num_items = facets ? _mesh.exterior_facets.size()
+                                               : _mesh.num_cells();
+          const std::vector<std::vector<std::size_t> >& colors
+            = facets ? _facet_colors : _cell_colors;
+          const std::size_t num_colors = s == colored ? colors.size() : 1;
+          for (std::size_t color = 0; color < num_colors; color++)
+          {
+            const long num = s == colored ? colors[color].size() : num_items;
+            UFC_ASSEMBLY_OMP(omp for schedule(static))
+            for (long k = 0; k < num; k++)
+            {
+              const std::size_t item = s == colored ? colors[color][k] : k;
+              const std::size_t c = facets ? _mesh.exterior_facets[item].first : item;
+
+              // Gather cell data and coefficients
+              _mesh.get_cell(cell, &vertex_coordinates[0], c);
+              for (std::size_t i = 0; i < num_coefficients; i++)
+              {
+                const std::size_t n = _local_dimensions[rank + i];
+                const std::size_t* dofs = &_dofs[rank + i][c*n];
+                for (std::size_t j = 0; j < n; j++)
+                  w_e[i][j] = w[i][dofs[j]];
+              }
+
+              // Compute and add element tensor
+              if (facets)
+                facet_integral->tabulate_tensor(&A_e[0], &w_p[0], &vertex_coordinates[0],
+                                                _mesh.exterior_facets[item].second,
+                                                cell.orientation);
+              else
+                cell_integral->tabulate_tensor(&A_e[0], &w_p[0], &vertex_coordinates[0],
+                                               cell.orientation);
+              _add(target, A, &A_e[0], c);
+            }
+          }
+        }
+
+        // Sum private copies
+        if (s == buffered)
+        {
+          UFC_ASSEMBLY_OMP(omp critical)
+          for (std::size_t i = 0; i < size; i++)
+            values[i] += private_values[i];
+        }
+
+        delete cell_integral;
+        delete facet_integral;
+      }
+    }
+
+    // The form
+    Form _form;
+
+    // The mesh
+    mesh& _mesh;
+
+    // Global and local dimensions of arguments and coefficients
+    std::vector<std::size_t> _global_dimensions;
+    std::vector<std::size_t> _local_dimensions;
+
+    // Dofs of arguments and coefficients on all cells
+    std::vector<std::vector<std::size_t> > _dofs;
+
+    // Cells and exterior facets of each colour
+    std::vector<std::vector<std::size_t> > _cell_colors;
+    std::vector<std::vector<std::size_t> > _facet_colors;
+
+  };
+
+}
+
+#endif
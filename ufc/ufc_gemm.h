@@ -0,0 +1,37 @@
+// This file provides a small dense matrix-matrix product used by code
+// generated by FFC with the option -fblas. No external BLAS library is
+// required.
+// This code is released into the public domain.
+//
+// The FEniCS Project (http://www.fenicsproject.org/) 2014.
+
+#ifndef __UFC_GEMM_H
+#define __UFC_GEMM_H
+
+#include <cstddef>
+
+/// Compute C += A^T B, where A is a k x m matrix, B is a k x n matrix
+/// and C is an m x n matrix, all represented as row-major flattened
+/// raw C++ arrays (see ufc_geometry.h).
+///
+/// The product is computed as a sum of k rank-one updates, such that
+/// the innermost loop runs over contiguous rows of B and C and may be
+/// vectorised by the compiler.
+inline void ufc_gemm_tn(std::size_t m, std::size_t n, std::size_t k,
+                        const double* A, const double* B, double* C)
+{
+  for (std::size_t l = 0; l < k; l++)
+  {
+    const double* a = A + l*m;
+    const double* b = B + l*n;
+    for (std::size_t i = 0; i < m; i++)
+    {
+      const double a_i = a[i];
+      double* c = C + i*n;
+      for (std::size_t j = 0; j < n; j++)
+        c[j] += a_i*b[j];
+    }
+  }
+}
+
+#endif
@@ -5,7 +5,8 @@ import os
 
 # the buggy swig-support in distutils doesn't manage to invoke g++, uses gcc...
 os.system("make ufc_benchmark_wrap.cxx")
-extension = Extension('_ufc_benchmark', ['ufc_benchmark.cpp', 'ufc_benchmark_wrap.cxx'], language="c++", include_dirs=["../../../ufc"])
+extension = Extension('_ufc_benchmark', ['ufc_benchmark.cpp', 'ufc_benchmark_wrap.cxx'], language="c++", include_dirs=["../../../ufc"],
+                      extra_compile_args=["-std=c++11"])
 
 setup(### metadata:
       name              = 'ufc_benchmark',
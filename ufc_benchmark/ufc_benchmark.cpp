@@ -3,370 +3,294 @@
 //
 // The FEniCS Project (http://www.fenicsproject.org/) 2006-2014.
 
-#include <iostream>
 #include <vector>
-using std::cout;
-using std::endl;
+#include <string>
+#include <chrono>
+#include <cmath>
+#include <algorithm>
+#include <stdexcept>
 using std::vector;
 
-#include <ctime>
-#define TMIN 3.0
-#define MMIN 1000
+#if defined(__x86_64__) || defined(__i386__)
+#include <x86intrin.h>
+#define UFC_BENCHMARK_CYCLES() static_cast<double>(__rdtsc())
+#else
+#define UFC_BENCHMARK_CYCLES() 0.0
+#endif
 
 #include "ufc_data.h"
 #include "ufc_reference_cell.h"
 #include "ufc_benchmark.h"
 
-clock_t __tic_time;
+typedef std::chrono::steady_clock benchmark_clock;
 
-void tic()
+double seconds(benchmark_clock::duration t)
 {
-  __tic_time = clock();
+  return std::chrono::duration<double>(t).count();
 }
 
-double toc()
+double median(vector<double> values)
 {
-  clock_t __toc_time = clock();
-  double elapsed_time = ((double) (__toc_time - __tic_time)) / CLOCKS_PER_SEC;
-  return elapsed_time;
+  std::sort(values.begin(), values.end());
+  const std::size_t n = values.size();
+  return n % 2 ? values[n/2] : 0.5*(values[n/2 - 1] + values[n/2]);
 }
 
-// Adaptive timing: make sure we run for at least TMIN to get reliable results
-double time_tabulate_tensor(ufc::cell_integral& integral, double *A, const double * const * w, const ufc::cell & c)
+// Adaptive timing: double the number of calls until a sample takes at
+// least sample_time (which also serves to warm up caches and branch
+// predictors), run once more as warm-up and then take the samples
+template <typename Function>
+integral_timing time_tabulate_tensor(Function tabulate_tensor,
+                                     const std::string& integral_type,
+                                     int subdomain_id, int entity_0, int entity_1,
+                                     std::size_t num_samples, double sample_time)
 {
-  std::size_t M = MMIN;
-  while ( true )
+  std::size_t M = 1;
+  while (true)
   {
-    tic();
+    const benchmark_clock::time_point t0 = benchmark_clock::now();
     for (std::size_t i = 0; i < M; i++)
-    {
-      integral.tabulate_tensor(A, w, c);
-    }
-    double t = toc();
-    if ( t >= TMIN )
-      return t / static_cast<double>(M);
-    M *= 10;
-    cout << "Elapsed time too short, increasing number of iterations to" << M << endl;
+      tabulate_tensor();
+    if (seconds(benchmark_clock::now() - t0) >= sample_time)
+      break;
+    M *= 2;
   }
+  for (std::size_t i = 0; i < M; i++)
+    tabulate_tensor();
 
-  return 0.0;
-}
-
-// Adaptive timing: make sure we run for at least TMIN to get reliable results
-double time_tabulate_tensor(ufc::exterior_facet_integral& integral, double *A, const double * const * w, const ufc::cell & c, std::size_t facet)
-{
-  std::size_t M = MMIN;
-  while ( true )
+  vector<double> times(num_samples);
+  vector<double> cycles(num_samples);
+  for (std::size_t s = 0; s < num_samples; s++)
   {
-    tic();
+    const benchmark_clock::time_point t0 = benchmark_clock::now();
+    const double c0 = UFC_BENCHMARK_CYCLES();
     for (std::size_t i = 0; i < M; i++)
-    {
-      integral.tabulate_tensor(A, w, c, facet);
-    }
-    double t = toc();
-    if ( t >= TMIN )
-      return t / static_cast<double>(M);
-    M *= 10;
-    cout << "Elapsed time too short, increasing number of iterations to" << M << endl;
+      tabulate_tensor();
+    cycles[s] = (UFC_BENCHMARK_CYCLES() - c0) / static_cast<double>(M);
+    times[s] = seconds(benchmark_clock::now() - t0) / static_cast<double>(M);
   }
 
-  return 0.0;
+  integral_timing timing;
+  timing.integral_type = integral_type;
+  timing.subdomain_id = subdomain_id;
+  timing.entity_0 = entity_0;
+  timing.entity_1 = entity_1;
+  timing.num_iterations = M;
+  timing.num_samples = num_samples;
+  timing.min = *std::min_element(times.begin(), times.end());
+  timing.median = median(times);
+  timing.mean = 0.0;
+  for (std::size_t s = 0; s < num_samples; s++)
+    timing.mean += times[s] / static_cast<double>(num_samples);
+  timing.stddev = 0.0;
+  for (std::size_t s = 0; s < num_samples; s++)
+    timing.stddev += (times[s] - timing.mean)*(times[s] - timing.mean) / static_cast<double>(num_samples);
+  timing.stddev = std::sqrt(timing.stddev);
+  timing.cycles = median(cycles);
+  return timing;
 }
 
 // Benchmark all integrals of a form.
-vector< vector<double> > benchmark(const ufc::form & form, bool print_tensor)
+vector<integral_timing> benchmark(const ufc::form & form,
+                                  std::size_t num_samples, double sample_time)
 {
-    // construct and allocate some stuff
-    ufc::ufc_data data(form);
+  if (num_samples == 0)
+    throw std::runtime_error("Need at least one sample.");
 
-    // create a reference cell geometry
-    ufc::reference_cell c(data.elements[0]->cell_shape());
+  // construct and allocate some stuff
+  ufc::ufc_data data(form);
+  double* A = &data.A[0];
+  const double * const * w = data.coefficients();
 
-    // data structures for times
-    vector<double> cell_times(form.num_cell_domains());
-    vector<double> exterior_facet_times(form.num_exterior_facet_domains());
-    vector<double> interior_facet_times(form.num_interior_facet_domains());
+  // create a reference cell geometry
+  ufc::reference_cell c(data.elements[0]->cell_shape(),
+                        data.elements[0]->geometric_dimension());
+  const double* x = &c.vertex_coordinates[0];
+
+  vector<integral_timing> timings;
 
-    // benchmark all cell integrals
-    for(unsigned i = 0; i < form.num_cell_domains(); i++)
+  // benchmark all cell integrals
+  for (std::size_t i = 0; i < data.cell_integrals.size(); i++)
+  {
+    const ufc::cell_integral& integral = *data.cell_integrals[i];
+    timings.push_back(time_tabulate_tensor(
+      [&]() { integral.tabulate_tensor(A, w, x, 0); },
+      "cell", data.cell_subdomain_ids[i], -1, -1, num_samples, sample_time));
+  }
+
+  // benchmark all exterior facet integrals on all facets
+  for (std::size_t i = 0; i < data.exterior_facet_integrals.size(); i++)
+  {
+    const ufc::exterior_facet_integral& integral = *data.exterior_facet_integrals[i];
+    for (std::size_t facet = 0; facet < c.num_facets; facet++)
+      timings.push_back(time_tabulate_tensor(
+        [&]() { integral.tabulate_tensor(A, w, x, facet, 0); },
+        "exterior_facet", data.exterior_facet_subdomain_ids[i], facet, -1,
+        num_samples, sample_time));
+  }
+
+  // benchmark all interior facet integrals on all pairs of facets,
+  // with the neighbour sharing the facet
+  for (std::size_t i = 0; i < data.interior_facet_integrals.size(); i++)
+  {
+    const ufc::interior_facet_integral& integral = *data.interior_facet_integrals[i];
+    for (std::size_t facet_0 = 0; facet_0 < c.num_facets; facet_0++)
     {
-        cell_times[i] = time_tabulate_tensor(*data.cell_domains[i], data.A, data.w, c);
-
-        if(print_tensor)
-        {
-          cout << "Cell element tensor " << i << ":" << endl;
-          data.print_tensor();
-          cout << endl;
-        }
+      for (std::size_t facet_1 = 0; facet_1 < c.num_facets; facet_1++)
+      {
+        const vector<double> x1 = c.neighbour(facet_0, facet_1);
+        timings.push_back(time_tabulate_tensor(
+          [&]() { integral.tabulate_tensor(A, w, x, &x1[0], facet_0, facet_1, 0, 0); },
+          "interior_facet", data.interior_facet_subdomain_ids[i], facet_0, facet_1,
+          num_samples, sample_time));
+      }
     }
+  }
+
+  // benchmark all point integrals on all vertices
+  for (std::size_t i = 0; i < data.point_integrals.size(); i++)
+  {
+    const ufc::point_integral& integral = *data.point_integrals[i];
+    for (std::size_t vertex = 0; vertex < c.num_vertices; vertex++)
+      timings.push_back(time_tabulate_tensor(
+        [&]() { integral.tabulate_tensor(A, w, x, vertex, 0); },
+        "point", data.point_subdomain_ids[i], vertex, -1,
+        num_samples, sample_time));
+  }
 
-    // benchmark all exterior facet integrals
-    for(unsigned i = 0; i < form.num_exterior_facet_domains(); i++)
+  // benchmark all custom integrals, with one quadrature point halfway
+  // between the midpoint and each vertex of the reference cell (for
+  // each cell), equal weights and unit normals
+  for (std::size_t i = 0; i < data.custom_integrals.size(); i++)
+  {
+    const ufc::custom_integral& integral = *data.custom_integrals[i];
+    const std::size_t num_cells = integral.num_cells();
+    const std::size_t tdim = c.topological_dimension;
+    const std::size_t gdim = c.geometric_dimension;
+    const std::size_t num_points = c.num_vertices;
+
+    vector<double> xs;
+    for (std::size_t k = 0; k < num_cells; k++)
     {
-        std::size_t facet = 0; // TODO: would it be interesting to time all facets?
-        exterior_facet_times[i] = time_tabulate_tensor(*data.exterior_facet_domains[i], data.A, data.w, c, facet);
-
-        if(print_tensor)
-        {
-          cout << "Exterior facet element tensor " << i << ":" << endl;
-          data.print_tensor();
-          cout << endl;
-        }
+      const vector<double> xk = k > 0 && c.is_simplex() ? c.neighbour(0, 0) : c.vertex_coordinates;
+      xs.insert(xs.end(), xk.begin(), xk.end());
     }
 
-    // benchmark all interior facet integrals
-    /* // TODO: If somebody needs this, please implement it! Need two cells, and larger A.
-    for(unsigned i = 0; i < form.num_interior_facet_domains(); i++)
+    vector<double> points(num_cells*num_points*tdim, 0.0);
+    vector<double> weights(num_cells*num_points, 1.0 / static_cast<double>(num_points));
+    vector<double> normals(num_cells*num_points*gdim, 0.0);
+    for (std::size_t k = 0; k < num_cells*num_points; k++)
     {
-        std::size_t facet = 0; // TODO: would it be interesting to time all facets?
-        interior_facet_times[i] = time_tabulate_tensor(*data.interior_facet_domains[i], data.A, data.w, c, facet);
-
-        if(print_tensor)
-        {
-          cout << "Interior facet element tensor " << i << ":" << endl;
-          data.print_tensor();
-          cout << endl;
-        }
+      const std::size_t q = k % num_points;
+      for (std::size_t j = 0; j < tdim; j++)
+      {
+        double midpoint = 0.0;
+        for (std::size_t v = 0; v < c.num_vertices; v++)
+          midpoint += c.vertex_coordinates[v*gdim + j] / static_cast<double>(c.num_vertices);
+        points[k*tdim + j] = 0.5*(midpoint + c.vertex_coordinates[q*gdim + j]);
+      }
+      normals[k*gdim] = 1.0;
     }
-    */
 
-    vector< vector<double> > result(3);
-    result[0] = cell_times;
-    result[1] = exterior_facet_times;
-    result[2] = interior_facet_times;
+    timings.push_back(time_tabulate_tensor(
+      [&]() { integral.tabulate_tensor(A, w, &xs[0], num_points, &points[0],
+                                       &weights[0], &normals[0], 0); },
+      "custom", data.custom_subdomain_ids[i], -1, -1, num_samples, sample_time));
+  }
 
-    return result;
+  return timings;
 }
 
+// Find the integral for the given subdomain (-1 for the default integral)
+template <typename T>
+const T& find_integral(const vector<T*>& integrals,
+                       const vector<int>& subdomain_ids, int domain)
+{
+  for (std::size_t i = 0; i < integrals.size(); i++)
+    if (subdomain_ids[i] == domain)
+      return *integrals[i];
+  throw std::runtime_error("No integral for the given subdomain.");
+}
 
 vector< vector<double> > tabulate_cell_tensor(const ufc::form & form, vector< vector<double> > w, int domain)
 {
   ufc::ufc_data data(form);
-
-  // copy w to the appropriate array
-  if(data.num_coefficients != w.size())
-      throw std::runtime_error("Wrong number of coefficients");
-  for(unsigned i=0; i<data.num_coefficients; i++)
-  {
-    if(data.dimensions[data.rank+i] != w[i].size())
-        throw std::runtime_error("Wrong coefficient dimension.");
-    for(unsigned j=0; j<data.dimensions[data.rank+i]; j++)
-    {
-      data.w[i][j] = w[i][j];
-    }
-  }
+  data.set_coefficients(w, false);
 
   // create a reference cell geometry
-  ufc::reference_cell c(data.elements[0]->cell_shape());
+  ufc::reference_cell c(data.elements[0]->cell_shape(),
+                        data.elements[0]->geometric_dimension());
 
   // tabulate the tensor
-  data.cell_integrals[domain]->tabulate_tensor(data.A, data.w, c);
-
-  // copy element tensor to stl-structure for easy returning to python (should perhaps rather use numpy and some typemaps, but I'm lazy)
-  vector< vector<double> > A;
-  if(data.rank == 2)
-  {
-    A.resize(data.dimensions[0]);
-    for(unsigned i=0; i<data.dimensions[0]; i++)
-    {
-      A[i].resize(data.dimensions[1]);
-      for(unsigned j=0; j<data.dimensions[1]; j++)
-      {
-        A[i][j] = data.A[i*data.dimensions[1] + j];
-      }
-    }
-  }
-  else if(data.rank == 1)
-  {
-    A.resize(data.dimensions[0]);
-    for(unsigned i=0; i<data.dimensions[0]; i++)
-    {
-      A[i].resize(1);
-      A[i][0] = data.A[i];
-    }
-  }
-  else if(data.rank == 0)
-  {
-    A.resize(1);
-    A[0].resize(1);
-    A[0][0] = data.A[0];
-  }
-  else
-  {
-    throw std::runtime_error("rank != 0,1,2 not implemented");
-  }
+  find_integral(data.cell_integrals, data.cell_subdomain_ids, domain)
+    .tabulate_tensor(&data.A[0], data.coefficients(), &c.vertex_coordinates[0], 0);
 
-  return A;
+  return data.tensor(false);
 }
 
-std::vector< std::vector<double> > tabulate_cell_integral(const std::shared_ptr<ufc::form> form, std::vector< std::vector<double> > w, ufc::cell cell, int domain)
+vector< vector<double> > tabulate_cell_integral(const std::shared_ptr<ufc::form> form,
+                                                vector< vector<double> > w,
+                                                vector<double> vertex_coordinates,
+                                                int domain)
 {
   ufc::ufc_data data(*form);
-
-  // copy w to the appropriate array
-  if(data.num_coefficients != w.size())
-      throw std::runtime_error("Wrong number of coefficients");
-  for(unsigned i=0; i<data.num_coefficients; i++)
-  {
-    if(data.dimensions[data.rank+i] != w[i].size())
-        throw std::runtime_error("Wrong coefficient dimension.");
-    for(unsigned j=0; j<data.dimensions[data.rank+i]; j++)
-    {
-      data.w[i][j] = w[i][j];
-    }
-  }
+  data.set_coefficients(w, false);
 
   // tabulate the tensor
-  data.cell_integrals[domain]->tabulate_tensor(data.A, data.w, cell);
+  find_integral(data.cell_integrals, data.cell_subdomain_ids, domain)
+    .tabulate_tensor(&data.A[0], data.coefficients(), &vertex_coordinates[0], 0);
 
-  // copy element tensor to stl-structure for easy returning to python (should perhaps rather use numpy and some typemaps, but I'm lazy)
-  vector< vector<double> > A;
-  if(data.rank == 2)
-  {
-    A.resize(data.dimensions[0]);
-    for(unsigned i=0; i<data.dimensions[0]; i++)
-    {
-      A[i].resize(data.dimensions[1]);
-      for(unsigned j=0; j<data.dimensions[1]; j++)
-      {
-        A[i][j] = data.A[i*data.dimensions[1] + j];
-      }
-    }
-  }
-  else if(data.rank == 1)
-  {
-    A.resize(data.dimensions[0]);
-    for(unsigned i=0; i<data.dimensions[0]; i++)
-    {
-      A[i].resize(1);
-      A[i][0] = data.A[i];
-    }
-  }
-  else if(data.rank == 0)
-  {
-    A.resize(1);
-    A[0].resize(1);
-    A[0][0] = data.A[0];
-  }
-  else
-  {
-    throw std::runtime_error("rank != 0,1,2 not implemented");
-  }
-
-  return A;
+  return data.tensor(false);
 }
 
-std::vector< std::vector<double> > tabulate_exterior_facet_integral(const std::shared_ptr<ufc::form> form, std::vector< std::vector<double> > w, ufc::cell& cell, int facet, int domain)
+vector< vector<double> > tabulate_exterior_facet_integral(const std::shared_ptr<ufc::form> form,
+                                                          vector< vector<double> > w,
+                                                          vector<double> vertex_coordinates,
+                                                          int facet,
+                                                          int domain)
 {
   ufc::ufc_data data(*form);
-
-  // copy w to the appropriate array
-  if(data.num_coefficients != w.size())
-      throw std::runtime_error("Wrong number of coefficients");
-  for(unsigned i=0; i<data.num_coefficients; i++)
-  {
-    if(data.dimensions[data.rank+i] != w[i].size())
-        throw std::runtime_error("Wrong coefficient dimension.");
-    for(unsigned j=0; j<data.dimensions[data.rank+i]; j++)
-    {
-      data.w[i][j] = w[i][j];
-    }
-  }
+  data.set_coefficients(w, false);
 
   // tabulate the tensor
-  data.exterior_facet_integrals[domain]->tabulate_tensor(data.A, data.w, cell, facet);
-
-  // copy element tensor to stl-structure for easy returning to python (should perhaps rather use numpy and some typemaps, but I'm lazy)
-  vector< vector<double> > A;
-  if(data.rank == 2)
-  {
-    A.resize(data.dimensions[0]);
-    for(unsigned i=0; i<data.dimensions[0]; i++)
-    {
-      A[i].resize(data.dimensions[1]);
-      for(unsigned j=0; j<data.dimensions[1]; j++)
-      {
-        A[i][j] = data.A[i*data.dimensions[1] + j];
-      }
-    }
-  }
-  else if(data.rank == 1)
-  {
-    A.resize(data.dimensions[0]);
-    for(unsigned i=0; i<data.dimensions[0]; i++)
-    {
-      A[i].resize(1);
-      A[i][0] = data.A[i];
-    }
-  }
-  else if(data.rank == 0)
-  {
-    A.resize(1);
-    A[0].resize(1);
-    A[0][0] = data.A[0];
-  }
-  else
-  {
-    throw std::runtime_error("rank != 0,1,2 not implemented");
-  }
+  find_integral(data.exterior_facet_integrals, data.exterior_facet_subdomain_ids, domain)
+    .tabulate_tensor(&data.A[0], data.coefficients(), &vertex_coordinates[0], facet, 0);
 
-  return A;
+  return data.tensor(false);
 }
 
-std::vector< std::vector<double> > tabulate_interior_facet_integral(const std::shared_ptr<ufc::form> form, std::vector< std::vector<double> > macro_w,\
-                                                                    ufc::cell& cell0, ufc::cell& cell1, int facet_0, int facet_1, int domain)
+vector< vector<double> > tabulate_interior_facet_integral(const std::shared_ptr<ufc::form> form,
+                                                          vector< vector<double> > macro_w,
+                                                          vector<double> vertex_coordinates_0,
+                                                          vector<double> vertex_coordinates_1,
+                                                          int facet_0,
+                                                          int facet_1,
+                                                          int domain)
 {
   ufc::ufc_data data(*form);
-
-  // copy w to the appropriate array
-  if(data.num_coefficients != macro_w.size())
-      throw std::runtime_error("Wrong number of coefficients");
-  for(unsigned i=0; i<data.num_coefficients; i++)
-  {
-    if(2*data.dimensions[data.rank+i] != macro_w[i].size())
-        throw std::runtime_error("Wrong coefficient dimension.");
-    for(unsigned j=0; j<2*data.dimensions[data.rank+i]; j++)
-    {
-      data.macro_w[i][j] = macro_w[i][j];
-    }
-  }
+  data.set_coefficients(macro_w, true);
 
   // tabulate the tensor
-  data.interior_facet_integrals[domain]->tabulate_tensor(data.macro_A, data.macro_w, cell0, cell1, facet_0, facet_1);
+  find_integral(data.interior_facet_integrals, data.interior_facet_subdomain_ids, domain)
+    .tabulate_tensor(&data.A[0], data.coefficients(),
+                     &vertex_coordinates_0[0], &vertex_coordinates_1[0],
+                     facet_0, facet_1, 0, 0);
 
-  // copy element tensor to stl-structure for easy returning to python (should perhaps rather use numpy and some typemaps, but I'm lazy)
-  vector< vector<double> > A;
-  if(data.rank == 2)
-  {
-    A.resize(2*data.dimensions[0]);
-    for(unsigned i=0; i<2*data.dimensions[0]; i++)
-    {
-      A[i].resize(2*data.dimensions[1]);
-      for(unsigned j=0; j<2*data.dimensions[1]; j++)
-      {
-        A[i][j] = data.macro_A[i*2*data.dimensions[1] + j];
-      }
-    }
-  }
-  else if(data.rank == 1)
-  {
-    A.resize(2*data.dimensions[0]);
-    for(unsigned i=0; i<2*data.dimensions[0]; i++)
-    {
-      A[i].resize(1);
-      A[i][0] = data.macro_A[i];
-    }
-  }
-  else if(data.rank == 0)
-  {
-    A.resize(1);
-    A[0].resize(1);
-    A[0][0] = data.macro_A[0];
-  }
-  else
-  {
-    throw std::runtime_error("rank != 0,1,2 not implemented");
-  }
+  return data.tensor(true);
+}
 
-  return A;
+vector<std::size_t> dof_entity_incidence(const ufc::dofmap& dofmap)
+{
+  const std::size_t* incidence = dofmap.dof_entity_incidence();
+  if (!incidence)
+    return vector<std::size_t>();
+  return vector<std::size_t>(incidence, incidence + 4*dofmap.local_dimension());
+}
+
+vector<std::size_t> tabulate_dof_offsets(const ufc::dofmap& dofmap,
+                                         const vector<std::size_t>& num_global_entities)
+{
+  vector<std::size_t> offsets(dofmap.local_dimension());
+  dofmap.tabulate_dof_offsets(&offsets[0], num_global_entities);
+  return offsets;
 }
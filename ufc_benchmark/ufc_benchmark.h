@@ -8,12 +8,38 @@
 
 #include "ufc.h"
 #include <memory>
+#include <string>
 #include <vector>
 
-/* Benchmark time to run tabulate_tensor for all integrals in a form. *
- * Uses a reference cell and one-cell mesh, and sets all w_ij = 1.0.  */
-std::vector< std::vector<double> > benchmark(const ufc::form & form,
-                                             bool print_tensors);
+/* Timing of tabulate_tensor for one integral of a form on one local   *
+ * facet, pair of facets (interior facets) or vertex (point integrals) *
+ * of the reference cell. Times are given in seconds per call and the  *
+ * cycles as the median number of time stamp counter cycles per call   *
+ * (zero if not available on the platform).                            */
+struct integral_timing
+{
+  std::string integral_type;  // "cell", "exterior_facet", ...
+  int subdomain_id;           // -1 for the default integral
+  int entity_0;               // facet or vertex (-1 if not applicable)
+  int entity_1;               // facet of second cell (-1 if not applicable)
+  std::size_t num_iterations; // calls of tabulate_tensor per sample
+  std::size_t num_samples;
+  double min;
+  double median;
+  double mean;
+  double stddev;
+  double cycles;
+};
+
+/* Benchmark time to run tabulate_tensor for all integrals in a form,    *
+ * on all facets, pairs of facets and vertices of a reference cell (and  *
+ * a neighbouring cell for interior facets), with all w_ij = 1.0. The    *
+ * number of calls per sample is doubled until a sample takes at least   *
+ * sample_time seconds, then each integral is run once more as warm-up   *
+ * before num_samples samples are taken.                                 */
+std::vector<integral_timing> benchmark(const ufc::form & form,
+                                       std::size_t num_samples=11,
+                                       double sample_time=0.01);
 
 /* Compute one element tensor on the reference cell with the given coefficients. */
 std::vector< std::vector<double> > tabulate_cell_tensor(const ufc::form & form,
@@ -23,23 +49,31 @@ std::vector< std::vector<double> > tabulate_cell_tensor(const ufc::form & form,
 /* Compute one cell integral. */
 std::vector< std::vector<double> > tabulate_cell_integral(const std::shared_ptr<ufc::form> form,
                                                           std::vector< std::vector<double> > w,
-                                                          ufc::cell cell,
+                                                          std::vector<double> vertex_coordinates,
                                                           int domain);
 
 /* Compute one exterior facet integral. */
 std::vector< std::vector<double> > tabulate_exterior_facet_integral(const std::shared_ptr<ufc::form> form,
                                                                     std::vector< std::vector<double> > w,
-                                                                    ufc::cell& cell,
+                                                                    std::vector<double> vertex_coordinates,
                                                                     int facet,
                                                                     int domain);
 
 /* Compute one interior facet integral. */
 std::vector< std::vector<double> > tabulate_interior_facet_integral(const std::shared_ptr<ufc::form> form,
                                                                     std::vector< std::vector<double> > macro_w,
-                                                                    ufc::cell& cell0,
-                                                                    ufc::cell& cell1,
+                                                                    std::vector<double> vertex_coordinates_0,
+                                                                    std::vector<double> vertex_coordinates_1,
                                                                     int facet_0,
                                                                     int facet_1,
                                                                     int domain);
 
+/* Return the local dof-to-entity incidence of a dofmap (four values per dof),
+   or an empty vector if the dofmap does not provide it. */
+std::vector<std::size_t> dof_entity_incidence(const ufc::dofmap& dofmap);
+
+/* Return the offsets of the global indices of the local dofs of a dofmap. */
+std::vector<std::size_t> tabulate_dof_offsets(const ufc::dofmap& dofmap,
+                                              const std::vector<std::size_t>& num_global_entities);
+
 #endif
@@ -7,6 +7,7 @@
 %}
 
 %include stl.i
+%include std_string.i
 %include std_vector.i
 %include std_carray.i
 
@@ -36,6 +37,8 @@
 %include "ufc_benchmark.h"
 %include "ufc_reference_cell.h"
 
+%template(vector_integral_timing) std::vector<integral_timing>;
+
 // ----------------------- Reference to shared pointer utility
 
 %{
@@ -49,14 +52,144 @@ std::shared_ptr<ufc::form> form_ptr(ufc::form * form) { return std::shared_ptr<u
 
 %pythoncode{
 
-def benchmark_forms(forms, print_tensors):
+def benchmark_forms(forms, num_operations=None, num_samples=11, sample_time=0.01):
+    """Benchmark tabulate_tensor for all integrals of the given forms
+    on the reference cell. Return a list (one item per form) of lists
+    of dicts, one for each integral on each facet, pair of facets or
+    vertex, with the integral type, subdomain ("otherwise" for the
+    default integral), entity (None, the facet or vertex, or a pair of
+    facets for interior facets) and statistics of the time per call.
+
+    If num_operations is given (one dict per form, from (integral
+    type, subdomain) to the number of floating-point operations of
+    tabulate_tensor, as a number or a list over facets or vertices, or
+    nested lists over pairs of facets), the number of operations and
+    the rate of operations per second (at the median time) are also
+    included."""
     import gc
     gc.collect()
 
-    times = []
-    for f in forms:
-        res = benchmark(f, print_tensors)
-        times.append(tuple(res))
-    return times
+    results = []
+    for (i, form) in enumerate(forms):
+        counts = num_operations[i] if num_operations else {}
+        result = []
+        for timing in benchmark(form, num_samples, sample_time):
+            subdomain = "otherwise" if timing.subdomain_id < 0 else timing.subdomain_id
+            entity = None
+            count = counts.get((timing.integral_type, subdomain))
+            if timing.entity_0 >= 0:
+                entity = timing.entity_0
+                if isinstance(count, list):
+                    count = count[timing.entity_0]
+            if timing.entity_1 >= 0:
+                entity = (timing.entity_0, timing.entity_1)
+                if isinstance(count, list):
+                    count = count[timing.entity_1]
+            item = {"integral_type": timing.integral_type,
+                    "subdomain_id": subdomain,
+                    "entity": entity,
+                    "num_iterations": timing.num_iterations,
+                    "num_samples": timing.num_samples,
+                    "min": timing.min,
+                    "median": timing.median,
+                    "mean": timing.mean,
+                    "stddev": timing.stddev,
+                    "cycles": timing.cycles}
+            if count is not None:
+                item["flops"] = count
+                item["flop_rate"] = count / timing.median if timing.median > 0 else 0.0
+            result.append(item)
+        results.append(result)
+    return results
+
+def compute_entities(cells, d):
+    """Number the entities of dimension d of a simplex mesh given by the
+    vertices of each cell (one row per cell). Returns the global
+    indices of the entities of each cell (in UFC local numbering) and
+    the number of entities."""
+    import itertools
+    import numpy
+
+    cells = numpy.sort(numpy.asarray(cells), axis=1)
+    num_cells, tdim = cells.shape[0], cells.shape[1] - 1
+    if d == tdim:
+        return numpy.arange(num_cells).reshape(num_cells, 1), num_cells
+
+    # Local vertices of each entity in reverse lexicographic order,
+    # such that facet i is opposite to vertex i
+    local = numpy.array(list(itertools.combinations(range(tdim + 1), d + 1))[::-1])
+    vertices = cells[:, local].reshape(-1, d + 1)
+    unique, indices = numpy.unique(vertices, axis=0, return_inverse=True)
+    return indices.reshape(num_cells, len(local)), len(unique)
+
+def tabulate_all_dofs(dofmap, cells, num_vertices, entities=None):
+    """Tabulate the dofs of all cells of a simplex mesh given by the
+    vertices of each cell, computed in bulk from the dof-to-entity
+    incidence of the dofmap. The entities (a dict from dimension to
+    the result of compute_entities) are computed if not given.
+    Returns the dofs (one row per cell) and the global dimension."""
+    import numpy
+
+    cells = numpy.sort(numpy.asarray(cells), axis=1)
+    num_cells, tdim = cells.shape[0], cells.shape[1] - 1
+    if entities is None:
+        entities = {}
+    entities[0] = (cells, num_vertices)
+
+    # Number mesh entities needed by the dofmap
+    num_entities = [0]*(tdim + 1)
+    num_entities[0] = num_vertices
+    num_entities[tdim] = num_cells
+    for d in range(1, tdim + 1):
+        if dofmap.needs_mesh_entities(d) or d == tdim:
+            if not d in entities:
+                entities[d] = compute_entities(cells, d)
+            num_entities[d] = entities[d][1]
+
+    # Compute global dof = offset + n*(entity index) + j for each local dof
+    incidence = numpy.array(dof_entity_incidence(dofmap)).reshape(-1, 4)
+    if len(incidence) != dofmap.local_dimension():
+        raise RuntimeError("Dofmap does not provide the dof-to-entity incidence.")
+    offsets = numpy.array(tabulate_dof_offsets(dofmap, num_entities))
+    dofs = numpy.empty((num_cells, len(offsets)), dtype=numpy.int64)
+    for (i, (d, k, n, j)) in enumerate(incidence):
+        dofs[:, i] = offsets[i] + j
+        if n:
+            dofs[:, i] += n*entities[d][0][:, k]
+
+    return dofs, dofmap.global_dimension(num_entities)
+
+def compute_sparsity_pattern(form, cells, num_vertices):
+    """Compute the sparsity pattern of the matrix of a bilinear form
+    on a simplex mesh given by the vertices of each cell. Returns the
+    row offsets and the (sorted) column indices of each row in
+    compressed sparse row format."""
+    import numpy
+
+    if form.rank() != 2:
+        raise RuntimeError("Sparsity pattern requires a bilinear form.")
+
+    # Tabulate dofs of both arguments, sharing the mesh entities
+    entities = {}
+    dofs, dims = [], []
+    for i in range(2):
+        dofmap = form.create_dofmap(i)
+        d, dim = tabulate_all_dofs(dofmap, cells, num_vertices, entities)
+        dofs.append(d)
+        dims.append(dim)
+        del dofmap
+
+    # Couple all pairs of dofs on each cell and sort unique entries
+    n0, n1 = dofs[0].shape[1], dofs[1].shape[1]
+    rows = numpy.repeat(dofs[0], n1, axis=1).ravel()
+    columns = numpy.tile(dofs[1], (1, n0)).ravel()
+    entries = numpy.unique(rows*dims[1] + columns)
+    rows, columns = entries // dims[1], entries % dims[1]
+
+    # Compute row offsets
+    row_offsets = numpy.zeros(dims[0] + 1, dtype=numpy.int64)
+    row_offsets[1:] = numpy.cumsum(numpy.bincount(rows, minlength=dims[0]))
+
+    return row_offsets, columns
 
 }
@@ -8,12 +8,18 @@
 
 #include <ufc.h>
 #include <vector>
+#include <algorithm>
 #include <stdexcept>
-#include <cstring>
 
 namespace ufc
 {
 
+  /// Elements, dofmaps, integrals and local data of a form, for
+  /// debugging and benchmarking UFC code. The integrals of each type
+  /// are those of each subdomain (in increasing order) followed by
+  /// the default integral, with subdomain id -1. The element tensor
+  /// and coefficients are large enough for interior facet integrals
+  /// (macro elements), and all coefficient values are 1.0.
   class ufc_data
   {
   public:
@@ -29,13 +35,13 @@ namespace ufc
       // construct all dofmaps and elements
       dofmaps.resize(num_arguments);
       elements.resize(num_arguments);
-      dimensions = new unsigned[num_arguments];
+      dimensions.resize(num_arguments);
 
       for(unsigned i=0; i<num_arguments; i++)
       {
         dofmaps[i]    = form.create_dofmap(i);
         elements[i]   = form.create_finite_element(i);
-        dimensions[i] = dofmaps[i]->max_local_dimension();
+        dimensions[i] = dofmaps[i]->local_dimension();
 
         if(dimensions[i] != elements[i]->space_dimension())
           throw std::runtime_error("Mismatching dimensions between finite_elements and dofmaps!");
@@ -45,140 +51,153 @@ namespace ufc
       }
 
       // construct all integral objects
-      cell_integrals.resize(form.num_cell_domains());
-      for(unsigned i=0; i<form.num_cell_domains(); i++)
-      {
-        cell_integrals[i] = form.create_cell_integral(i);
-      }
-      exterior_facet_integrals.resize(form.num_exterior_facet_domains());
-      for(unsigned i=0; i<form.num_exterior_facet_domains(); i++)
-      {
-        exterior_facet_integrals[i] = form.create_exterior_facet_integral(i);
-      }
-      interior_facet_integrals.resize(form.num_interior_facet_domains());
-      for(unsigned i=0; i<form.num_interior_facet_domains(); i++)
-      {
-        interior_facet_integrals[i] = form.create_interior_facet_integral(i);
-      }
-
-      // compute size of element tensor A
-      A_size = 1;
+      create_integrals(cell_integrals, cell_subdomain_ids,
+                       form.num_cell_domains(),
+                       &ufc::form::create_cell_integral,
+                       &ufc::form::create_default_cell_integral);
+      create_integrals(exterior_facet_integrals, exterior_facet_subdomain_ids,
+                       form.num_exterior_facet_domains(),
+                       &ufc::form::create_exterior_facet_integral,
+                       &ufc::form::create_default_exterior_facet_integral);
+      create_integrals(interior_facet_integrals, interior_facet_subdomain_ids,
+                       form.num_interior_facet_domains(),
+                       &ufc::form::create_interior_facet_integral,
+                       &ufc::form::create_default_interior_facet_integral);
+      create_integrals(point_integrals, point_subdomain_ids,
+                       form.num_point_domains(),
+                       &ufc::form::create_point_integral,
+                       &ufc::form::create_default_point_integral);
+      create_integrals(custom_integrals, custom_subdomain_ids,
+                       form.num_custom_domains(),
+                       &ufc::form::create_custom_integral,
+                       &ufc::form::create_default_custom_integral);
+
+      // allocate space for element tensor of macro element
+      std::size_t A_size = 1;
       for(unsigned i=0; i<rank; i++)
-      {
-        A_size *= dimensions[i];
-      }
-
-      // allocate space for element tensor A
-      A = new double[A_size];
-
-      // Initialize local tensor for macro element
-      A_size = 1;
-      for (unsigned i = 0; i < form.rank(); i++)
         A_size *= 2*dimensions[i];
-      macro_A = new double[A_size];
+      A.resize(A_size, 0.0);
 
-      // allocate space for local coefficient data
-      w = new double*[num_coefficients];
+      // allocate space for coefficients of macro element
+      w_values.resize(num_coefficients);
+      w.resize(num_coefficients);
       for(unsigned i=0; i<num_coefficients; i++)
       {
-        unsigned dim = dimensions[i+rank];
-        w[i] = new double[dim];
-        memset(w[i], 0, sizeof(double)*dim);
-      }
-
-      // allocate space for local macro coefficient data
-      macro_w = new double*[num_coefficients];
-      for(unsigned i=0; i<num_coefficients; i++)
-      {
-        unsigned dim = 2*dimensions[i+rank];
-        macro_w[i] = new double[dim];
-        memset(macro_w[i], 0, sizeof(double)*dim);
+        w_values[i].resize(2*dimensions[rank + i], 1.0);
+        w[i] = &w_values[i][0];
       }
     }
 
     ~ufc_data()
     {
       for(unsigned i=0; i<num_arguments; i++)
+      {
         delete dofmaps[i];
-
-      for(unsigned i=0; i<num_arguments; i++)
         delete elements[i];
+      }
 
-      delete [] dimensions;
-
-      for(unsigned i=0; i<form.num_cell_domains(); i++)
-        delete cell_integrals[i];
-
-      for(unsigned i=0; i<form.num_exterior_facet_domains(); i++)
-        delete exterior_facet_integrals[i];
-
-      for(unsigned i=0; i<form.num_interior_facet_domains(); i++)
-        delete interior_facet_integrals[i];
+      delete_integrals(cell_integrals);
+      delete_integrals(exterior_facet_integrals);
+      delete_integrals(interior_facet_integrals);
+      delete_integrals(point_integrals);
+      delete_integrals(custom_integrals);
+    }
 
-      for(unsigned i=0; i<num_coefficients; i++)
-        delete [] w[i];
-      delete [] w;
+    /// Return coefficients in the form expected by tabulate_tensor
+    const double * const * coefficients() const
+    { return w.empty() ? 0 : &w[0]; }
 
+    /// Copy given coefficient values (one vector per coefficient, of
+    /// the dimension of the element or, for macro elements, twice that)
+    void set_coefficients(const std::vector< std::vector<double> >& values, bool macro)
+    {
+      if(values.size() != num_coefficients)
+        throw std::runtime_error("Wrong number of coefficients");
       for(unsigned i=0; i<num_coefficients; i++)
-        delete [] macro_w[i];
-      delete [] macro_w;
+      {
+        const std::size_t dim = (macro ? 2 : 1)*dimensions[rank + i];
+        if(values[i].size() != dim)
+          throw std::runtime_error("Wrong coefficient dimension.");
+        std::copy(values[i].begin(), values[i].end(), w_values[i].begin());
+      }
+    }
 
-      delete [] A;
-      delete [] macro_A;
+    /// Return element tensor as rows (a single row for rank 0 and a
+    /// column for rank 1), for elements or macro elements
+    std::vector< std::vector<double> > tensor(bool macro) const
+    {
+      if(rank > 2)
+        throw std::runtime_error("rank != 0,1,2 not implemented");
+      const std::size_t m = macro ? 2 : 1;
+      const std::size_t dim0 = rank > 0 ? m*dimensions[0] : 1;
+      const std::size_t dim1 = rank > 1 ? m*dimensions[1] : 1;
+      std::vector< std::vector<double> > rows(dim0);
+      for(std::size_t i=0; i<dim0; i++)
+        rows[i].assign(A.begin() + i*dim1, A.begin() + (i + 1)*dim1);
+      return rows;
     }
 
     const ufc::form & form;
 
-    vector< ufc::dofmap * > dofmaps;
-    vector< ufc::finite_element * > elements;
+    std::vector< ufc::dofmap * > dofmaps;
+    std::vector< ufc::finite_element * > elements;
 
-    vector< ufc::cell_integral *> cell_integrals;
-    vector< ufc::exterior_facet_integral *> exterior_facet_integrals;
-    vector< ufc::interior_facet_integral *> interior_facet_integrals;
+    std::vector< ufc::cell_integral *> cell_integrals;
+    std::vector< ufc::exterior_facet_integral *> exterior_facet_integrals;
+    std::vector< ufc::interior_facet_integral *> interior_facet_integrals;
+    std::vector< ufc::point_integral *> point_integrals;
+    std::vector< ufc::custom_integral *> custom_integrals;
+
+    std::vector<int> cell_subdomain_ids;
+    std::vector<int> exterior_facet_subdomain_ids;
+    std::vector<int> interior_facet_subdomain_ids;
+    std::vector<int> point_subdomain_ids;
+    std::vector<int> custom_subdomain_ids;
 
     unsigned rank;
     unsigned num_coefficients;
     unsigned num_arguments;
-    unsigned A_size;
 
-    unsigned * dimensions;
-    double *  A;
-    double *  macro_A;
-    double ** w;
-    double ** macro_w;
+    std::vector<std::size_t> dimensions;
+    std::vector<double> A;
+    std::vector< std::vector<double> > w_values;
+    std::vector<double *> w;
 
+  private:
 
-    void print_tensor()
+    template <typename T>
+    void create_integrals(std::vector<T*>& integrals,
+                          std::vector<int>& subdomain_ids,
+                          std::size_t num_domains,
+                          T* (ufc::form::*create)(std::size_t) const,
+                          T* (ufc::form::*create_default)() const)
     {
-      int dim0 = 1;
-      int dim1 = 1;
-
-      if(rank == 1)
+      for(std::size_t i=0; i<num_domains; i++)
       {
-          dim1 = dimensions[0];
+        T* integral = (form.*create)(i);
+        if(integral)
+        {
+          integrals.push_back(integral);
+          subdomain_ids.push_back(static_cast<int>(i));
+        }
       }
-      if(rank == 2)
+      T* integral = (form.*create_default)();
+      if(integral)
       {
-          dim0 = dimensions[0];
-          dim1 = dimensions[1];
+        integrals.push_back(integral);
+        subdomain_ids.push_back(-1);
       }
+    }
 
-      cout << "[" << endl;
-      int k=0;
-      for(int ii=0; ii<dim0; ii++)
-      {
-        for(int jj=0; jj<dim1; jj++)
-        {
-          cout << A[k++] << ", ";
-        }
-        cout << endl;
-      }
-      cout << "]" << endl;
-      cout << endl;
+    template <typename T>
+    void delete_integrals(std::vector<T*>& integrals)
+    {
+      for(std::size_t i=0; i<integrals.size(); i++)
+        delete integrals[i];
     }
+
   };
 
 }
 
 #endif
-
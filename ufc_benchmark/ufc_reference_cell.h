@@ -8,285 +8,110 @@
 
 #include "ufc.h"
 #include <cstddef>
+#include <vector>
 #include <stdexcept>
 
 namespace ufc
 {
 
-    /// Description of a reference cell, for debugging and testing UFC code.
-    class reference_cell: public ufc::cell
+    /// Vertex coordinates of a reference cell, for debugging and
+    /// benchmarking UFC code. The coordinates are stored as expected
+    /// by tabulate_tensor (the gdim coordinates of each vertex in
+    /// turn), with zeros for geometric dimensions above the
+    /// topological dimension.
+    class reference_cell
     {
     public:
 
         /// Constructor
-        reference_cell(ufc::shape s)
+        reference_cell(ufc::shape s, std::size_t gdim=0):
+            cell_shape(s)
         {
-            cell_shape = s;
-
-            num_entities[0] = 0;
-            num_entities[1] = 0;
-            num_entities[2] = 0;
-            num_entities[3] = 0;
-
-            // Get topological dimension and number of entities in a cell of this type.
+            // Get topological dimension and number of vertices and facets
             switch(s)
             {
-            case interval:      topological_dimension = 1; num_entities[0] = 2; num_entities[1] = 1;  break;
-            case triangle:      topological_dimension = 2; num_entities[0] = 3; num_entities[1] = 3;  num_entities[2] = 1; break;
-            case quadrilateral: topological_dimension = 2; num_entities[0] = 4; num_entities[1] = 4;  num_entities[2] = 1; break;
-            case tetrahedron:   topological_dimension = 3; num_entities[0] = 4; num_entities[1] = 6;  num_entities[2] = 4; num_entities[3] = 1; break;
-            case hexahedron:    topological_dimension = 3; num_entities[0] = 8; num_entities[1] = 12; num_entities[2] = 6; num_entities[3] = 1; break;
+            case interval:      topological_dimension = 1; num_vertices = 2; num_facets = 2; break;
+            case triangle:      topological_dimension = 2; num_vertices = 3; num_facets = 3; break;
+            case quadrilateral: topological_dimension = 2; num_vertices = 4; num_facets = 4; break;
+            case tetrahedron:   topological_dimension = 3; num_vertices = 4; num_facets = 4; break;
+            case hexahedron:    topological_dimension = 3; num_vertices = 8; num_facets = 6; break;
             default: throw std::runtime_error("Invalid shape.");
             }
-
-            // Assume same geometric dimension.
-            geometric_dimension = topological_dimension;
-
-            // Fill global indices like we had a single-cell mesh.
-            entity_indices = new std::size_t*[topological_dimension+1];
-            for(std::size_t i = 0; i <= topological_dimension; i++)
-            {
-                entity_indices[i] = new std::size_t[num_entities[i]];
-                for(std::size_t j = 0; j < num_entities[i]; j++)
-                {
-                    entity_indices[i][j] = j;
-                }
-            }
-
-            // Allocate an empty array of vertex coordinates.
-            coordinates = new double*[num_entities[0]];
-            for(std::size_t i = 0; i < num_entities[0]; i++)
-            {
-                coordinates[i] = new double[geometric_dimension];
-                for(std::size_t j = 0; j < geometric_dimension; j++)
-                {
-                    coordinates[i][j] = 0.0;
-                }
-            }
-
-            // Fill coordinates with reference cell definition.
-            switch(s)
-            {
-            case interval:
-                coordinates[0][0] = 0.0;
-                coordinates[1][0] = 1.0;
-                break;
-
-            case triangle:
-                coordinates[0][0] = 0.0;
-                coordinates[0][1] = 0.0;
-
-                coordinates[1][0] = 1.0;
-                coordinates[1][1] = 0.0;
-
-                coordinates[2][0] = 0.0;
-                coordinates[2][1] = 1.0;
-                break;
-
-            case quadrilateral:
-                coordinates[0][0] = 0.0;
-                coordinates[0][1] = 0.0;
-
-                coordinates[1][0] = 1.0;
-                coordinates[1][1] = 0.0;
-
-                coordinates[2][0] = 1.0;
-                coordinates[2][1] = 1.0;
-
-                coordinates[3][0] = 0.0;
-                coordinates[3][1] = 1.0;
-                break;
-
-            case tetrahedron:
-                coordinates[0][0] = 0.0;
-                coordinates[0][1] = 0.0;
-                coordinates[0][2] = 0.0;
-
-                coordinates[1][0] = 1.0;
-                coordinates[1][1] = 0.0;
-                coordinates[1][2] = 0.0;
-
-                coordinates[2][0] = 0.0;
-                coordinates[2][1] = 1.0;
-                coordinates[2][2] = 0.0;
-
-                coordinates[3][0] = 0.0;
-                coordinates[3][1] = 0.0;
-                coordinates[3][2] = 1.0;
-                break;
-
-            case hexahedron:
-                coordinates[0][0] = 0.0;
-                coordinates[0][1] = 0.0;
-                coordinates[0][2] = 0.0;
-
-                coordinates[1][0] = 1.0;
-                coordinates[1][1] = 0.0;
-                coordinates[1][2] = 0.0;
-
-                coordinates[2][0] = 1.0;
-                coordinates[2][1] = 1.0;
-                coordinates[2][2] = 0.0;
-
-                coordinates[3][0] = 0.0;
-                coordinates[3][1] = 1.0;
-                coordinates[3][2] = 0.0;
-
-                coordinates[4][0] = 0.0;
-                coordinates[4][1] = 0.0;
-                coordinates[4][2] = 1.0;
-
-                coordinates[5][0] = 1.0;
-                coordinates[5][1] = 0.0;
-                coordinates[5][2] = 1.0;
-
-                coordinates[6][0] = 1.0;
-                coordinates[6][1] = 1.0;
-                coordinates[6][2] = 1.0;
-
-                coordinates[7][0] = 0.0;
-                coordinates[7][1] = 1.0;
-                coordinates[7][2] = 1.0;
-                break;
-            }
-        }
-
-        /// Destructor
-        virtual ~reference_cell()
-        {
-            for(std::size_t i = 0; i <= topological_dimension; i++)
-            {
-                delete [] entity_indices[i];
-            }
-            delete [] entity_indices;
-
-            for(std::size_t i = 0; i < num_entities[0]; i++)
-            {
-                delete [] coordinates[i];
-            }
-            delete [] coordinates;
+            geometric_dimension = gdim < topological_dimension ? topological_dimension : gdim;
+
+            // Fill coordinates with reference cell definition
+            static const double simplex[] = {0.0, 0.0, 0.0,
+                                             1.0, 0.0, 0.0,
+                                             0.0, 1.0, 0.0,
+                                             0.0, 0.0, 1.0};
+            static const double cube[] = {0.0, 0.0, 0.0,
+                                          1.0, 0.0, 0.0,
+                                          1.0, 1.0, 0.0,
+                                          0.0, 1.0, 0.0,
+                                          0.0, 0.0, 1.0,
+                                          1.0, 0.0, 1.0,
+                                          1.0, 1.0, 1.0,
+                                          0.0, 1.0, 1.0};
+            const double* x = is_simplex() ? simplex : cube;
+            vertex_coordinates.resize(num_vertices*geometric_dimension, 0.0);
+            for(std::size_t i = 0; i < num_vertices; i++)
+                for(std::size_t j = 0; j < topological_dimension; j++)
+                    vertex_coordinates[i*geometric_dimension + j] = x[3*i + j];
         }
 
-        /// The number of entities of a particular dimension
-        std::size_t num_entities[4];
+        /// Return true if the cell is a simplex
+        bool is_simplex() const
+        { return cell_shape != quadrilateral && cell_shape != hexahedron; }
 
-    };
-
-    /// Description of a reference cell, for debugging and testing UFC code.
-    class Cell: public ufc::cell
-    {
-    public:
-
-        /// Constructor
-        Cell(std::size_t top, std::size_t geo, std::vector< std::vector<double> > coords, std::vector< std::size_t> num_ents): ufc::cell(), num_entities(num_ents)
-        {
-            topological_dimension = top;
-            geometric_dimension   = geo;
-            num_entities[0] = coords.size();
-
-            // Fill global indices
-//            entity_indices = new std::size_t*[topological_dimension+1];
-//            for(std::size_t i = 0; i <= topological_dimension; i++)
-//            {
-//                entity_indices[i] = new std::size_t[num_entities[i]];
-//                for(std::size_t j = 0; j < num_entities[i]; j++)
-//                {
-//                    entity_indices[i][j] = j;
-//                }
-//            }
-
-            for(std::size_t i = 0; i < num_ents.size(); i++)
-              num_entities[i] = num_ents[i];
-
-            // Allocate an empty array of vertex coordinates.
-            coordinates = new double*[coords.size()];
-            for(std::size_t i = 0; i < coords.size(); i++)
-            {
-                coordinates[i] = new double[geometric_dimension];
-                for(std::size_t j = 0; j < geometric_dimension; j++)
-                {
-                    coordinates[i][j] = coords[i][j];
-                }
-            }
-
-        }
-
-        /// Destructor
-        virtual ~Cell()
-        {
-//            for(std::size_t i = 0; i <= topological_dimension; i++)
-//            {
-//                delete [] entity_indices[i];
-//            }
-//            delete [] entity_indices;
-
-            for(std::size_t i = 0; i < num_entities[0]; i++)
-            {
-                delete [] coordinates[i];
-            }
-            delete [] coordinates;
-        }
-
-        /// The number of entities of a particular dimension
-        std::vector<std::size_t> num_entities;
-    };
-
-
-    /// Consistent data for a mesh consisting of a single reference cell, for debugging and testing UFC code.
-    class reference_mesh: public ufc::mesh
-    {
-    public:
-
-        /// Constructor
-        reference_mesh(ufc::shape s):
-            c(s)
+        /// Return the vertex coordinates of a cell sharing facet_0 of
+        /// this cell, such that the shared facet is facet_1 of the
+        /// neighbour. The neighbour is the reflection of the vertex
+        /// opposite to the facet through the facet midpoint, with the
+        /// vertices renumbered (only implemented for simplices).
+        std::vector<double> neighbour(std::size_t facet_0, std::size_t facet_1) const
         {
-            topological_dimension = c.topological_dimension;
-            geometric_dimension   = c.geometric_dimension;
-
-            // Set global number of entities of each topological dimension to that of a single cell.
-            num_entities = new std::size_t[topological_dimension+1];
-            for(std::size_t i = 0; i <= topological_dimension; i++)
+            if(!is_simplex())
+                throw std::runtime_error("Neighbour cells are only implemented for simplices.");
+            if(facet_0 >= num_facets || facet_1 >= num_facets)
+                throw std::runtime_error("Invalid facet.");
+
+            const std::size_t gdim = geometric_dimension;
+            std::vector<double> x(vertex_coordinates);
+            for(std::size_t j = 0; j < gdim; j++)
             {
-                num_entities[i] = c.num_entities[i];
+                // Midpoint of facet (opposite to vertex facet_0)
+                double midpoint = 0.0;
+                for(std::size_t i = 0; i < num_vertices; i++)
+                    if(i != facet_0)
+                        midpoint += vertex_coordinates[i*gdim + j];
+                midpoint /= static_cast<double>(num_vertices - 1);
+
+                // Reflected vertex at position facet_1, opposite vertex
+                // of this cell at position facet_0
+                x[facet_0*gdim + j] = vertex_coordinates[facet_1*gdim + j];
+                x[facet_1*gdim + j] = 2.0*midpoint - vertex_coordinates[facet_0*gdim + j];
             }
+            return x;
         }
 
-        /// Destructor
-        virtual ~reference_mesh()
-        {
-            delete [] num_entities;
-        }
+        /// The cell shape
+        ufc::shape cell_shape;
 
-        /// A reference cell, the only cell in this mesh.
-        reference_cell c;
+        /// The topological dimension of the cell
+        std::size_t topological_dimension;
 
-    };
+        /// The geometric dimension of the cell
+        std::size_t geometric_dimension;
 
-    /// Consistent data for a mesh consisting of a single reference cell, for debugging and testing UFC code.
-    class Mesh: public ufc::mesh
-    {
-    public:
+        /// The number of vertices of the cell
+        std::size_t num_vertices;
 
-        /// Constructor
-        Mesh(std::size_t top, std::size_t geo, std::vector<std::size_t> ents)//: ufc::mesh()
-        {
-            topological_dimension = top;
-            geometric_dimension   = geo;
+        /// The number of facets of the cell
+        std::size_t num_facets;
 
-            // Set global number of entities of each topological dimension to that of a single cell.
-            num_entities = new std::size_t[topological_dimension+1];
-            for(std::size_t i = 0; i <= topological_dimension; i++)
-            {
-                num_entities[i] = ents[i];
-            }
-        }
+        /// The vertex coordinates of the cell
+        std::vector<double> vertex_coordinates;
 
-        /// Destructor
-        virtual ~Mesh()
-        {
-            delete [] num_entities;
-        }
     };
 
 }